@@ -0,0 +1,105 @@
+"""
+Application Settings
+Настройки приложения из переменных окружения
+"""
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    """Читает целое число из переменной окружения"""
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+# Каталог локальных файлов сервиса (очередь задач); по умолчанию data/ в корне проекта,
+# а не текущий каталог процесса
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+
+# Кэш ингредиентов (общий для всех запросов процесса)
+INGREDIENT_CACHE_TTL = _env_int("INGREDIENT_CACHE_TTL", 3600)  # секунды
+INGREDIENT_CACHE_SIZE = _env_int("INGREDIENT_CACHE_SIZE", 5000)  # записей
+
+# Кэш ответов GET (план питания / список покупок), с ETag
+MEAL_PLAN_CACHE_TTL = _env_int("MEAL_PLAN_CACHE_TTL", 60)  # секунды
+SHOPPING_LIST_CACHE_TTL = _env_int("SHOPPING_LIST_CACHE_TTL", 15)  # секунды (Purchased меняется часто)
+RESPONSE_CACHE_SIZE = _env_int("RESPONSE_CACHE_SIZE", 1000)  # записей в каждом кэше
+
+# Запасы (Pantry): таблица Airtable (название или ID); не задана - вычитание отключено
+PANTRY_TABLE = os.getenv("PANTRY_TABLE")
+PANTRY_CACHE_TTL = _env_int("PANTRY_CACHE_TTL", 60)  # секунды
+# Поле Shopping_Lists (Long text): запасы, зарезервированные списком, JSON {pantry_record_id: количество}
+SHOPPING_LIST_PANTRY_FIELD = os.getenv("SHOPPING_LIST_PANTRY_FIELD", "Pantry Reservations")
+
+# Сколько RECORD_ID() помещаем в одну формулу OR(...)
+AIRTABLE_FORMULA_CHUNK = _env_int("AIRTABLE_FORMULA_CHUNK", 50)
+
+# Названия полей в Airtable, используемые для серверной фильтрации
+MEAL_PLAN_PRIMARY_FIELD = os.getenv("MEAL_PLAN_PRIMARY_FIELD", "Plan Name")
+RECIPE_PRIMARY_FIELD = os.getenv("RECIPE_PRIMARY_FIELD", "Recipe Name")
+# Обратные linked record поля (Meal_Plans -> Planned_Meals, Recipes -> Recipe_Ingredients)
+MEAL_PLAN_MEALS_FIELD = os.getenv("MEAL_PLAN_MEALS_FIELD", "Planned_Meals")
+RECIPE_INGREDIENTS_FIELD = os.getenv("RECIPE_INGREDIENTS_FIELD", "Recipe_Ingredients")
+# Поля Ingredients для перевода единиц (пустые - перевод только внутри измерения)
+INGREDIENT_DENSITY_FIELD = os.getenv("INGREDIENT_DENSITY_FIELD", "Density (g/ml)")
+INGREDIENT_PIECE_WEIGHT_FIELD = os.getenv("INGREDIENT_PIECE_WEIGHT_FIELD", "Piece Weight (g)")
+# Цена ингредиента (EUR) и за какое количество она указана ("кг", "100 г", "шт")
+INGREDIENT_PRICE_FIELD = os.getenv("INGREDIENT_PRICE_FIELD", "Price (EUR)")
+INGREDIENT_PRICE_UNIT_FIELD = os.getenv("INGREDIENT_PRICE_UNIT_FIELD", "Price Unit")
+# Поле Shopping_List_Items для оценки стоимости строки (не задано - не записываем)
+SHOPPING_ITEM_COST_FIELD = os.getenv("SHOPPING_ITEM_COST_FIELD")
+
+# Локальное зеркало каталога (Recipes / Recipe_Ingredients / Ingredients)
+CATALOG_REFRESH_INTERVAL = _env_int("CATALOG_REFRESH_INTERVAL", 300)  # инкрементальный sync, секунды
+CATALOG_FULL_SYNC_INTERVAL = _env_int("CATALOG_FULL_SYNC_INTERVAL", 86400)  # полный sync (удаления)
+CATALOG_RETRY_DELAY = _env_int("CATALOG_RETRY_DELAY", 30)  # пауза после неудачной синхронизации, секунды
+CATALOG_DB_PATH = os.getenv("CATALOG_DB_PATH")  # SQLite файл; не задан - только в памяти
+
+# Выполнение блокирующих вызовов Airtable из async роутов
+# threadpool - в отдельном пуле потоков (не блокирует event loop)
+# inline - прямо в event loop (старое поведение, для отладки)
+AIRTABLE_IO_MODE = os.getenv("AIRTABLE_IO_MODE", "threadpool")
+AIRTABLE_IO_WORKERS = _env_int("AIRTABLE_IO_WORKERS", 16)  # потоки и keep-alive соединения
+
+# Запись батчами: сколько batch-запросов одновременно "в полёте"
+AIRTABLE_MAX_IN_FLIGHT = _env_int("AIRTABLE_MAX_IN_FLIGHT", 4)
+# Лимит Airtable API: 5 запросов в секунду на базу
+AIRTABLE_RATE_LIMIT = float(os.getenv("AIRTABLE_RATE_LIMIT", "5"))
+AIRTABLE_BATCH_SIZE = 10  # максимум записей в одном batch запросе Airtable
+
+# Повторы запросов Airtable при 429 / 5xx (экспоненциальная задержка с jitter)
+AIRTABLE_MAX_RETRIES = _env_int("AIRTABLE_MAX_RETRIES", 5)
+AIRTABLE_RETRY_BASE_DELAY = float(os.getenv("AIRTABLE_RETRY_BASE_DELAY", "0.5"))  # секунды
+AIRTABLE_RETRY_MAX_DELAY = float(os.getenv("AIRTABLE_RETRY_MAX_DELAY", "30"))  # секунды
+
+# Хранилище таблиц: airtable - база Airtable, sqlite - локальный файл (без сети),
+# writebehind - запись в локальный журнал с фоновой синхронизацией в Airtable
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "airtable")
+SQLITE_STORE_PATH = os.getenv("SQLITE_STORE_PATH", "airtable.db")
+
+# Write-behind журнал (STORAGE_BACKEND=writebehind)
+WRITE_BEHIND_DB_PATH = os.getenv("WRITE_BEHIND_DB_PATH", "writebehind.db")
+WRITE_BEHIND_BATCH = _env_int("WRITE_BEHIND_BATCH", 50)  # операций журнала за один проход
+WRITE_BEHIND_POLL_INTERVAL = float(os.getenv("WRITE_BEHIND_POLL_INTERVAL", "2"))  # секунды
+WRITE_BEHIND_RETRY_BASE_DELAY = float(os.getenv("WRITE_BEHIND_RETRY_BASE_DELAY", "5"))  # секунды
+WRITE_BEHIND_RETRY_MAX_DELAY = float(os.getenv("WRITE_BEHIND_RETRY_MAX_DELAY", "300"))  # секунды
+
+# Адрес Airtable API (переопределяется для локальных стендов и бенчмарков)
+AIRTABLE_ENDPOINT_URL = os.getenv("AIRTABLE_ENDPOINT_URL", "https://api.airtable.com")
+
+# Бюджет холодного старта: импорт app.main и запуск lifespan (секунды)
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "3.0"))
+STARTUP_TIME_BUDGET = float(os.getenv("STARTUP_TIME_BUDGET", "0.5"))
+
+# Массовая генерация планов питания
+BULK_MAX_PLANS = _env_int("BULK_MAX_PLANS", 500)  # планов за один запрос
+BULK_PLAN_WORKERS = _env_int("BULK_PLAN_WORKERS", min(4, os.cpu_count() or 1))  # процессов
+BULK_PROCESS_POOL_MIN_PLANS = _env_int("BULK_PROCESS_POOL_MIN_PLANS", 16)  # меньше - без пула
+
+# Фоновые задачи (очередь в SQLite)
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(DATA_DIR, "jobs.db"))
+JOB_WORKERS = _env_int("JOB_WORKERS", 2)  # одновременно выполняемых задач
+JOB_MAX_PENDING = _env_int("JOB_MAX_PENDING", 100)  # задач в очереди, дальше - 503
+JOB_RETENTION_DAYS = _env_int("JOB_RETENTION_DAYS", 7)  # хранение завершённых задач
+
+# Метрики Prometheus (/metrics); выключены - счётчики не ведутся, /metrics отвечает 404
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
@@ -0,0 +1,36 @@
+"""
+Service Dependencies
+Сервисы-синглтоны из реестра сервисов, внедряемые в роуты через Depends.
+Все сервисы разделяют один Airtable клиент (пул keep-alive соединений).
+"""
+from app.services.airtable import AirtableService
+from app.services.jobs import JobQueue
+from app.services.meal_planner import MealPlannerService
+from app.services.registry import registry
+from app.services.shopping_list import ShoppingListService
+from app.services.storage import StorageBackend
+
+
+def get_airtable_api() -> StorageBackend:
+    """Dependency: общий клиент Airtable (или локальное хранилище)"""
+    return registry.api
+
+
+def get_airtable_service() -> AirtableService:
+    """Dependency: общий AirtableService"""
+    return registry.airtable
+
+
+def get_meal_planner() -> MealPlannerService:
+    """Dependency: общий MealPlannerService"""
+    return registry.meal_planner
+
+
+def get_shopping_list_service() -> ShoppingListService:
+    """Dependency: общий ShoppingListService"""
+    return registry.shopping_list
+
+
+def get_job_queue() -> JobQueue:
+    """Dependency: очередь фоновых задач"""
+    return registry.jobs
@@ -2,10 +2,14 @@
 Nutrition Management System - FastAPI Server
 Main application entry point
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import nutrition_router, shopping_list_router
 from app.routers.health import router as health_router
+from app.services.executor import run_blocking, shutdown_executor
+from app.services.registry import registry
+import asyncio
 import logging
 
 # Настройка логирования
@@ -16,13 +20,27 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Старт/остановка приложения"""
+    # Возвращаем в работу задачи, оставшиеся в очереди до рестарта
+    registry.jobs.recover()
+    # Создаём клиентов и загружаем каталог в фоне, чтобы не задерживать старт сервера
+    warm_up_task = asyncio.create_task(run_blocking(registry.warm_up))
+    yield
+    warm_up_task.cancel()
+    registry.close()
+    shutdown_executor()
+
 # Создание FastAPI приложения
 app = FastAPI(
     title="Nutrition Management System API",
     description="API for managing meal plans, recipes, and shopping lists for camper living",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS middleware
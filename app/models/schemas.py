@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import date
 
 class MealPlanCreate(BaseModel):
@@ -9,6 +9,30 @@ class MealPlanCreate(BaseModel):
     plan_name: Optional[str] = Field(None, description="Название плана")
     notes: Optional[str] = Field(None, description="Заметки")
 
+class DailyStats(BaseModel):
+    """Макросы одного дня плана"""
+    date: str
+    calories: float
+    protein: float
+    fat: float
+    carbs: float
+    calories_deviation: float = Field(..., description="Отклонение калорий от дневной цели")
+    protein_deviation: float = Field(..., description="Отклонение белка от дневной цели")
+
+class PlanStats(BaseModel):
+    """Статистика плана, рассчитанная по макросам рецептов"""
+    avg_calories: float
+    avg_protein: float
+    avg_fat: float
+    avg_carbs: float
+    total_days: int
+    total_meals: int
+    weekly_totals: Dict[str, float]
+    daily_targets: Dict[str, float]
+    avg_calories_deviation: float
+    avg_protein_deviation: float
+    daily: List[DailyStats]
+
 class MealPlanResponse(BaseModel):
     """Ответ с созданным планом"""
     meal_plan_id: str
@@ -18,9 +42,44 @@ class MealPlanResponse(BaseModel):
     total_meals: int
     avg_calories: float
     avg_protein: float
+    avg_fat: Optional[float] = None
+    avg_carbs: Optional[float] = None
+    stats: Optional[PlanStats] = None
     status: str
     message: str
 
+class BulkMealPlanCreate(BaseModel):
+    """Запрос на массовое создание планов питания"""
+    user_ids: List[str] = Field(..., min_length=1, description="ID пользователей в Airtable")
+    week_start: date = Field(..., description="Начало первой недели (YYYY-MM-DD)")
+    weeks: int = Field(1, ge=1, le=12, description="Количество недель подряд")
+    notes: Optional[str] = Field(None, description="Заметки")
+
+class BulkMealPlanItem(BaseModel):
+    """Результат создания одного плана"""
+    user_id: str
+    week_start: str
+    plan_name: str
+    meal_plan_id: Optional[str] = None
+    total_meals: int
+    avg_calories: Optional[float] = None
+    avg_protein: Optional[float] = None
+    status: str = Field(..., description="success | partial | failed")
+    error: Optional[str] = None
+
+class BulkMealPlanResponse(BaseModel):
+    """Ответ массового создания планов"""
+    plans: List[BulkMealPlanItem]
+    total_plans: int
+    succeeded: int
+    partial: int
+    failed: int
+    total_meals: int
+    elapsed_seconds: float
+    plans_per_second: Optional[float] = None
+    meals_per_second: Optional[float] = None
+    timings_ms: Dict[str, float]
+
 class ShoppingListCreate(BaseModel):
     """Запрос на создание списка покупок"""
     meal_plan_id: str = Field(..., description="ID плана питания")
@@ -2,7 +2,7 @@
 Pydantic Models for Shopping List API
 """
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import date
 
 
@@ -10,6 +10,8 @@ class ShoppingListGenerateRequest(BaseModel):
     """Request для генерации списка покупок"""
     meal_plan_id: str = Field(..., description="ID плана питания в Airtable")
     shopping_date: Optional[str] = Field(None, description="Дата покупок (YYYY-MM-DD)")
+    use_pantry: bool = Field(True, description="Вычесть продукты, которые уже есть в запасах")
+    reserve_pantry: bool = Field(False, description="Зарезервировать использованные запасы под план")
     
     class Config:
         json_schema_extra = {
@@ -31,6 +33,24 @@ class ShoppingListItem(BaseModel):
     price: Optional[float] = None
 
 
+class PantryUsage(BaseModel):
+    """Сколько продукта взято из запасов вместо покупки"""
+    ingredient_id: str
+    ingredient_name: str
+    quantity: float
+    unit: Optional[str] = None
+
+
+class ItemCost(BaseModel):
+    """Оценка стоимости строки списка покупок"""
+    ingredient_id: str
+    ingredient_name: str
+    quantity: float
+    unit: Optional[str] = None
+    unit_price: Optional[float] = Field(None, description="EUR за единицу (г / мл / шт)")
+    estimated_cost: Optional[float] = Field(None, description="None - у ингредиента нет цены")
+
+
 class ShoppingListResponse(BaseModel):
     """Response при генерации списка покупок"""
     shopping_list_id: str
@@ -38,6 +58,11 @@ class ShoppingListResponse(BaseModel):
     items_count: int
     total_recipes: int
     total_meals: int
+    pantry_used: List[PantryUsage] = []
+    pantry_reserved: bool = False
+    estimated_cost: Optional[float] = Field(None, description="Оценка стоимости списка (EUR)")
+    unpriced_items: int = 0
+    cost_breakdown: List[ItemCost] = []
     message: str = "Shopping list generated successfully"
     
     class Config:
@@ -53,6 +78,57 @@ class ShoppingListResponse(BaseModel):
         }
 
 
+class ShoppingListConsolidateRequest(BaseModel):
+    """Request для общего списка покупок по нескольким планам"""
+    meal_plan_ids: Optional[List[str]] = Field(None, description="ID планов питания")
+    date_from: Optional[date] = Field(None, description="Week Start не раньше (YYYY-MM-DD)")
+    date_to: Optional[date] = Field(None, description="Week Start не позже (YYYY-MM-DD)")
+    user_id: Optional[str] = Field(None, description="Только планы пользователя (для диапазона дат)")
+    shopping_date: Optional[str] = Field(None, description="Дата покупок (YYYY-MM-DD)")
+    use_pantry: bool = Field(True, description="Вычесть продукты, которые уже есть в запасах")
+    reserve_pantry: bool = Field(False, description="Зарезервировать использованные запасы под планы")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "meal_plan_ids": ["recnd7GzJqTkiBTWa", "recQ8rLJ0aMZkdLx2"],
+                "shopping_date": "2024-12-30"
+            }
+        }
+
+
+class ShoppingListConsolidatedResponse(BaseModel):
+    """Response при генерации общего списка покупок"""
+    shopping_list_id: str
+    meal_plan_ids: List[str]
+    total_plans: int
+    items_count: int
+    total_recipes: int
+    total_meals: int
+    pantry_used: List[PantryUsage] = []
+    pantry_reserved: bool = False
+    estimated_cost: Optional[float] = Field(None, description="Оценка стоимости списка (EUR)")
+    unpriced_items: int = 0
+    cost_breakdown: List[ItemCost] = []
+    message: str = "Consolidated shopping list generated successfully"
+
+
+class ShoppingListUpdateResponse(BaseModel):
+    """Response при обновлении списка покупок по изменённому плану"""
+    shopping_list_id: str
+    meal_plan_id: str
+    items_count: int
+    total_recipes: int
+    total_meals: int
+    created: int = Field(..., description="Добавлено новых элементов")
+    updated: int = Field(..., description="Изменено количество (Purchased сохранён)")
+    deleted: int = Field(..., description="Удалено ненужных элементов")
+    unchanged: int
+    estimated_cost: Optional[float] = Field(None, description="Оценка стоимости списка (EUR)")
+    unpriced_items: int = 0
+    message: str = "Shopping list updated successfully"
+
+
 class ShoppingListDetailResponse(BaseModel):
     """Детальная информация о списке покупок"""
     shopping_list_id: str
@@ -60,5 +136,72 @@ class ShoppingListDetailResponse(BaseModel):
     status: str
     shopping_date: Optional[str]
     total_cost: Optional[float]
+    remaining_cost: Optional[float] = Field(None, description="Стоимость ещё не купленного (EUR)")
+    unpriced_items: int = 0
     items_count: int
     items: List[dict]
+
+
+class ShoppingListPriceRequest(BaseModel):
+    """Request для оценки стоимости нескольких списков"""
+    shopping_list_ids: List[str] = Field(..., min_length=1, description="ID списков покупок")
+
+
+class ShoppingListCost(BaseModel):
+    """Стоимость одного списка покупок"""
+    shopping_list_id: str
+    list_name: str
+    items_count: int
+    estimated_cost: Optional[float] = None
+    remaining_cost: Optional[float] = Field(None, description="Стоимость ещё не купленного")
+    unpriced_items: int = 0
+
+
+class ShoppingListPriceResponse(BaseModel):
+    """Оценка стоимости нескольких списков покупок"""
+    lists: List[ShoppingListCost]
+    total_cost: Optional[float] = None
+    remaining_cost: Optional[float] = None
+
+
+class ShoppingListPurgeRequest(BaseModel):
+    """Request для массового удаления списков (фильтры объединяются через AND)"""
+    older_than_days: Optional[int] = Field(None, ge=0, description="Созданные больше N дней назад")
+    status: Optional[str] = Field(None, description="Status списка (например Completed)")
+    meal_plan_id: Optional[str] = Field(None, description="Списки плана питания")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "older_than_days": 30,
+                "status": "Completed"
+            }
+        }
+
+
+class ShoppingListDeleteResponse(BaseModel):
+    """Результат удаления списков покупок"""
+    shopping_list_ids: List[str]
+    lists_deleted: int
+    items_deleted: int
+    elapsed_ms: float
+
+
+class JobAcceptedResponse(BaseModel):
+    """Ответ при постановке задачи в очередь (202)"""
+    job_id: str
+    status: str
+    status_url: str
+    created: bool = Field(..., description="False - задача найдена по Idempotency-Key")
+
+
+class JobStatusResponse(BaseModel):
+    """Статус фоновой задачи"""
+    job_id: str
+    kind: str
+    status: str = Field(..., description="queued | running | succeeded | failed")
+    progress: Optional[Dict[str, Any]] = Field(None, description="Последний завершённый шаг пайплайна")
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: str
+    updated_at: str
@@ -1,42 +1,59 @@
 """
 Health Check Router
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
 from pyairtable import Api
 import os
 
+from app.config import STORAGE_BACKEND
+from app.dependencies import get_airtable_api
+from app.services.registry import registry
+from app.services import metrics
+from app.services.cache import ingredient_cache, meal_plan_responses, shopping_list_responses
+from app.services.executor import run_blocking
+from app.services.scheduler import scheduler_stats
+
 router = APIRouter(tags=["Health"])
 
 @router.get("/health")
-async def health_check():
+async def health_check(api: Api = Depends(get_airtable_api)):
     """
     Health check endpoint
     Проверяет работу сервера и подключение к Airtable
     """
     try:
-        # Проверка Airtable connection
+        # Проверка Airtable connection (локальному хранилищу ключ не нужен)
         api_key = os.getenv('AIRTABLE_API_KEY')
-        if not api_key:
+        if not api_key and STORAGE_BACKEND == "airtable":
             return {
                 "status": "unhealthy",
                 "airtable_connection": "error - no API key",
                 "error": "AIRTABLE_API_KEY not set"
             }
         
-        api = Api(api_key)
         base_id = 'appBgJb1hzG4vFT1b'
         
         # Пробуем получить список таблиц
         try:
             table = api.table(base_id, 'tblgge1WnUvQSnMCh')  # Recipes table
             # Пробуем получить одну запись
-            recipes = table.all(max_records=1)
+            recipes = await run_blocking(table.all, max_records=1)
             
             return {
                 "status": "healthy",
+                "storage_backend": STORAGE_BACKEND,
                 "airtable_connection": "ok",
                 "base_accessible": True,
-                "recipes_count": len(recipes)
+                "recipes_count": len(recipes),
+                "ingredient_cache": ingredient_cache.stats(),
+                "response_cache": {
+                    "meal_plan": meal_plan_responses.stats(),
+                    "shopping_list": shopping_list_responses.stats()
+                },
+                "catalog": registry.peek("catalog").stats() if registry.peek("catalog") else None,
+                "airtable_scheduler": scheduler_stats(),
+                "write_behind": api.sync_stats() if hasattr(api, "sync_stats") else None
             }
         except Exception as e:
             return {
@@ -47,3 +64,16 @@ async def health_check():
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    Метрики в формате Prometheus: время шагов пайплайнов,
+    запросы Airtable по таблицам и операциям, очереди планировщика
+
+    Включаются METRICS_ENABLED=true, иначе 404
+    """
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED)")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
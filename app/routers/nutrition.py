@@ -6,16 +6,13 @@ from app.models.schemas import (
     ShoppingListCreate,
     ShoppingListResponse
 )
-from app.services.airtable import get_airtable_service, AirtableService
+from app.dependencies import get_airtable_service, get_meal_planner
+from app.services.airtable import AirtableService
 from app.services.meal_planner import MealPlannerService
+from app.services.executor import run_blocking
 
 router = APIRouter(prefix="/api/nutrition", tags=["nutrition"])
 
-def get_meal_planner() -> MealPlannerService:
-    """Dependency для получения meal planner service"""
-    airtable = get_airtable_service()
-    return MealPlannerService(airtable)
-
 @router.post("/meal-plan/create", response_model=MealPlanResponse)
 async def create_meal_plan(
     request: MealPlanCreate,
@@ -31,7 +28,8 @@ async def create_meal_plan(
     Возвращает статистику плана
     """
     try:
-        result = planner.create_weekly_meal_plan(
+        result = await run_blocking(
+            planner.create_weekly_meal_plan,
             user_id=request.user_id,
             week_start=datetime.combine(request.week_start, datetime.min.time()),
             plan_name=request.plan_name,
@@ -46,6 +44,9 @@ async def create_meal_plan(
             total_meals=result["total_meals"],
             avg_calories=result["avg_calories"],
             avg_protein=result["avg_protein"],
+            avg_fat=result["avg_fat"],
+            avg_carbs=result["avg_carbs"],
+            stats=result["stats"],
             status="success",
             message=f"План питания создан! {result['total_meals']} приёмов пищи добавлено."
         )
@@ -64,11 +65,11 @@ async def get_meal_plan(
     Получить план питания по ID
     """
     try:
-        meal_plan = airtable.get_record("Meal_Plans", plan_id)
+        meal_plan = await run_blocking(airtable.get_record, "Meal_Plans", plan_id)
         
         # Получить все приёмы пищи для этого плана
         formula = f"{{Meal Plan}} = '{plan_id}'"
-        planned_meals = airtable.get_all_records("Planned_Meals", formula=formula)
+        planned_meals = await run_blocking(airtable.get_all_records, "Planned_Meals", formula=formula)
         
         return {
             "meal_plan": meal_plan,
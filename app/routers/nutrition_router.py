@@ -2,22 +2,27 @@
 Nutrition Router
 Endpoints для работы с планами питания
 """
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 
+from app.dependencies import get_airtable_service, get_meal_planner
+from app.config import BULK_MAX_PLANS
+from app.models.schemas import BulkMealPlanCreate, BulkMealPlanResponse, MealPlanResponse
 from app.services.airtable import AirtableService
 from app.services.meal_planner import MealPlannerService
+from app.services.cache import meal_plan_responses
+from app.services.executor import run_blocking
+from app.services.http_cache import CachedResponse, conditional_response, get_or_load, record_etag
+from app.services.scheduler import Priority, airtable_priority
+from app.services.streaming import SSE_HEADERS, stream_pipeline
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/nutrition", tags=["Nutrition"])
 
-# Инициализируем сервисы
-airtable_service = AirtableService()
-meal_planner = MealPlannerService(airtable_service)
-
 
 class MealPlanCreateRequest(BaseModel):
     """Request для создания плана питания"""
@@ -27,8 +32,11 @@ class MealPlanCreateRequest(BaseModel):
     notes: Optional[str] = None
 
 
-@router.post("/meal-plan/create", status_code=status.HTTP_201_CREATED)
-async def create_meal_plan(request: MealPlanCreateRequest):
+@router.post("/meal-plan/create", response_model=MealPlanResponse, status_code=status.HTTP_201_CREATED)
+async def create_meal_plan(
+    request: MealPlanCreateRequest,
+    meal_planner: MealPlannerService = Depends(get_meal_planner)
+):
     """
     Создаёт план питания на неделю
     
@@ -41,7 +49,11 @@ async def create_meal_plan(request: MealPlanCreateRequest):
             "total_meals": int,
             "avg_calories": float,
             "avg_protein": float,
-            "status": "success"
+            "avg_fat": float,
+            "avg_carbs": float,
+            "stats": {...},  # суммы по дням/неделе, отклонения от целей
+            "status": "success",
+            "message": str
         }
     """
     try:
@@ -51,7 +63,8 @@ async def create_meal_plan(request: MealPlanCreateRequest):
         week_start = datetime.strptime(request.week_start, "%Y-%m-%d")
         
         # Создаём план через сервис
-        result = meal_planner.create_weekly_meal_plan(
+        result = await run_blocking(
+            meal_planner.create_weekly_meal_plan,
             user_id=request.user_id,
             week_start=week_start,
             plan_name=request.plan_name,
@@ -60,7 +73,10 @@ async def create_meal_plan(request: MealPlanCreateRequest):
         
         logger.info(f"✅ Meal plan created: {result['meal_plan_id']}")
         
-        return result
+        return MealPlanResponse(
+            **result,
+            message=f"План питания создан! {result['total_meals']} приёмов пищи добавлено."
+        )
         
     except ValueError as e:
         logger.error(f"Invalid date format: {str(e)}")
@@ -76,22 +92,127 @@ async def create_meal_plan(request: MealPlanCreateRequest):
         )
 
 
+@router.post("/meal-plan/create/stream")
+async def create_meal_plan_stream(
+    request: MealPlanCreateRequest,
+    meal_planner: MealPlannerService = Depends(get_meal_planner)
+):
+    """
+    Создаёт план питания с потоковым прогрессом (Server-Sent Events)
+    
+    События:
+        stage  - завершён шаг (step, total_steps, stage, elapsed_ms, ...)
+        meals  - создан очередной батч Planned Meals (chunk, meals)
+        result - итог, как в POST /meal-plan/create
+        error  - создание не удалось (status_code, detail)
+    """
+    try:
+        week_start = datetime.strptime(request.week_start, "%Y-%m-%d")
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid date format. Use YYYY-MM-DD: {str(e)}"
+        )
+    
+    logger.info(f"Streaming meal plan creation for user: {request.user_id}")
+    
+    stream = stream_pipeline(
+        meal_planner.create_weekly_meal_plan,
+        user_id=request.user_id,
+        week_start=week_start,
+        plan_name=request.plan_name,
+        notes=request.notes,
+        result_formatter=lambda result: MealPlanResponse(
+            **result,
+            message=f"План питания создан! {result['total_meals']} приёмов пищи добавлено."
+        ).model_dump(),
+        error_formatter=lambda e: {
+            "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "detail": f"Failed to create meal plan: {str(e)}"
+        }
+    )
+    return StreamingResponse(stream, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.post("/meal-plan/bulk-create", response_model=BulkMealPlanResponse, status_code=status.HTTP_201_CREATED)
+async def bulk_create_meal_plans(
+    request: BulkMealPlanCreate,
+    meal_planner: MealPlannerService = Depends(get_meal_planner)
+):
+    """
+    Создаёт планы питания для нескольких пользователей на несколько недель
+    
+    Каталог рецептов загружается один раз, все записи пишутся общими батчами.
+    Возвращает статус каждого плана и общую пропускную способность.
+    """
+    total_plans = len(request.user_ids) * request.weeks
+    if total_plans > BULK_MAX_PLANS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many plans in one request: {total_plans} (max {BULK_MAX_PLANS})"
+        )
+    
+    try:
+        logger.info(f"Creating {total_plans} meal plans for {len(request.user_ids)} users")
+        
+        first_week = datetime.combine(request.week_start, datetime.min.time())
+        week_starts = [first_week + timedelta(weeks=i) for i in range(request.weeks)]
+        
+        result = await run_blocking(
+            meal_planner.create_bulk_meal_plans,
+            user_ids=request.user_ids,
+            week_starts=week_starts,
+            notes=request.notes
+        )
+        
+        logger.info(
+            f"✅ Bulk meal plans: {result['succeeded']}/{result['total_plans']} "
+            f"in {result['elapsed_seconds']}s ({result['plans_per_second']} plans/s)"
+        )
+        
+        return BulkMealPlanResponse(**result)
+        
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error creating bulk meal plans: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create meal plans: {str(e)}"
+        )
+
+
 @router.get("/meal-plan/{plan_id}")
-async def get_meal_plan(plan_id: str):
+async def get_meal_plan(
+    plan_id: str,
+    request: Request,
+    airtable_service: AirtableService = Depends(get_airtable_service)
+):
     """
     Получает информацию о плане питания
+    
+    Ответ кэшируется на MEAL_PLAN_CACHE_TTL секунд и отдаётся с ETag;
+    запрос с актуальным `If-None-Match` получает 304 без тела
     """
-    try:
+    async def load() -> CachedResponse:
         logger.info(f"Fetching meal plan: {plan_id}")
         
         # Получаем meal plan из Airtable
-        meal_plan = airtable_service.get_record("Meal_Plans", plan_id)
+        with airtable_priority(Priority.INTERACTIVE):
+            meal_plan = await run_blocking(airtable_service.get_record, "Meal_Plans", plan_id)
         
-        return {
-            "meal_plan_id": plan_id,
-            "fields": meal_plan.get("fields", {}),
-            "status": "success"
-        }
+        return CachedResponse(
+            body={
+                "meal_plan_id": plan_id,
+                "fields": meal_plan.get("fields", {}),
+                "status": "success"
+            },
+            etag=record_etag(meal_plan)
+        )
+    
+    try:
+        cached = await get_or_load(meal_plan_responses, plan_id, load)
+        return conditional_response(request, cached)
         
     except Exception as e:
         logger.error(f"Error fetching meal plan: {str(e)}")
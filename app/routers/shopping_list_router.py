@@ -2,13 +2,36 @@
 Shopping List Router
 Endpoints для работы со списками покупок
 """
-from fastapi import APIRouter, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from app.models.shopping_list_schemas import (
+    JobAcceptedResponse,
+    JobStatusResponse,
+    ShoppingListConsolidateRequest,
+    ShoppingListConsolidatedResponse,
+    ShoppingListDeleteResponse,
     ShoppingListGenerateRequest,
+    ShoppingListPriceRequest,
+    ShoppingListPriceResponse,
+    ShoppingListPurgeRequest,
     ShoppingListResponse,
-    ShoppingListDetailResponse
+    ShoppingListDetailResponse,
+    ShoppingListUpdateResponse
+)
+from app.services.jobs import (
+    SHOPPING_LIST_JOB,
+    IdempotencyConflictError,
+    JobQueue,
+    QueueFullError,
 )
 from app.services.shopping_list import ShoppingListService
+from app.dependencies import get_job_queue, get_shopping_list_service
+from app.services.cache import shopping_list_responses
+from app.services.executor import run_blocking
+from app.services.http_cache import CachedResponse, conditional_response, get_or_load, record_etag
+from app.services.streaming import SSE_HEADERS, stream_pipeline
+from app.services.scheduler import Priority, airtable_priority
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,7 +39,10 @@ router = APIRouter(prefix="/api/nutrition/shopping-list", tags=["Shopping List"]
 
 
 @router.post("/generate", response_model=ShoppingListResponse, status_code=status.HTTP_201_CREATED)
-async def generate_shopping_list(request: ShoppingListGenerateRequest):
+async def generate_shopping_list(
+    request: ShoppingListGenerateRequest,
+    service: ShoppingListService = Depends(get_shopping_list_service)
+):
     """
     Генерирует список покупок на основе плана питания
     
@@ -25,7 +51,8 @@ async def generate_shopping_list(request: ShoppingListGenerateRequest):
     2. Извлекает все рецепты из плана
     3. Собирает ингредиенты из всех рецептов с учётом порций
     4. Агрегирует одинаковые ингредиенты (суммирует количество)
-    5. Создаёт Shopping List и Shopping List Items в Airtable
+    5. Вычитает продукты, которые уже есть в запасах (`use_pantry`)
+    6. Создаёт Shopping List и Shopping List Items в Airtable
     
     ## Пример:
     ```json
@@ -40,14 +67,18 @@ async def generate_shopping_list(request: ShoppingListGenerateRequest):
     - `items_count`: Количество уникальных ингредиентов
     - `total_recipes`: Количество уникальных рецептов в плане
     - `total_meals`: Общее количество запланированных приёмов пищи
+    - `estimated_cost`, `cost_breakdown`: оценка стоимости по ценам из каталога
+      (`unpriced_items` - строки без цены, в сумму не входят)
     """
     try:
         logger.info(f"Generating shopping list for meal plan: {request.meal_plan_id}")
         
-        service = ShoppingListService()
-        result = service.generate_shopping_list(
+        result = await run_blocking(
+            service.generate_shopping_list,
             meal_plan_id=request.meal_plan_id,
-            shopping_date=request.shopping_date
+            shopping_date=request.shopping_date,
+            use_pantry=request.use_pantry,
+            reserve_pantry=request.reserve_pantry
         )
         
         logger.info(f"Shopping list generated: {result['shopping_list_id']} with {result['items_count']} items")
@@ -68,8 +99,279 @@ async def generate_shopping_list(request: ShoppingListGenerateRequest):
         )
 
 
+@router.post("/generate/stream")
+async def generate_shopping_list_stream(
+    request: ShoppingListGenerateRequest,
+    service: ShoppingListService = Depends(get_shopping_list_service)
+):
+    """
+    Генерирует список покупок с потоковым прогрессом (Server-Sent Events)
+    
+    ## События:
+    - `stage`: завершён шаг пайплайна (`step`, `total_steps`, `stage`, `elapsed_ms`, ...)
+    - `items`: создан очередной батч Shopping List Items (`chunk`, `items`)
+    - `result`: итог, как в `POST /generate`
+    - `error`: генерация не удалась (`status_code`, `detail`)
+    """
+    logger.info(f"Streaming shopping list generation for meal plan: {request.meal_plan_id}")
+    
+    stream = stream_pipeline(
+        service.generate_shopping_list,
+        meal_plan_id=request.meal_plan_id,
+        shopping_date=request.shopping_date,
+        use_pantry=request.use_pantry,
+        reserve_pantry=request.reserve_pantry,
+        result_formatter=lambda result: ShoppingListResponse(**result).model_dump(),
+        error_formatter=_stream_error
+    )
+    return StreamingResponse(stream, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+def _stream_error(e: Exception) -> dict:
+    """Ошибка генерации в формате, аналогичном HTTPException обычного endpoint"""
+    if isinstance(e, ValueError):
+        return {"status_code": status.HTTP_404_NOT_FOUND, "detail": str(e)}
+    return {
+        "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+        "detail": f"Failed to generate shopping list: {str(e)}"
+    }
+
+
+@router.post(
+    "/generate-consolidated",
+    response_model=ShoppingListConsolidatedResponse,
+    status_code=status.HTTP_201_CREATED
+)
+async def generate_consolidated_shopping_list(
+    request: ShoppingListConsolidateRequest,
+    service: ShoppingListService = Depends(get_shopping_list_service)
+):
+    """
+    Генерирует один список покупок для нескольких планов питания
+    
+    Планы задаются списком `meal_plan_ids` или диапазоном `date_from` - `date_to`
+    (по Week Start, опционально только планы `user_id`).
+    Одинаковые ингредиенты разных планов объединяются в одну строку.
+    
+    ## Пример:
+    ```json
+    {
+      "meal_plan_ids": ["recnd7GzJqTkiBTWa", "recQ8rLJ0aMZkdLx2"],
+      "shopping_date": "2024-12-30"
+    }
+    ```
+    """
+    if not request.meal_plan_ids and not (request.date_from and request.date_to):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide meal_plan_ids or both date_from and date_to"
+        )
+    if request.date_from and request.date_to and request.date_from > request.date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from must not be after date_to"
+        )
+    
+    try:
+        logger.info(
+            f"Generating consolidated shopping list for "
+            f"{request.meal_plan_ids or f'{request.date_from}..{request.date_to}'}"
+        )
+        
+        result = await run_blocking(
+            service.generate_consolidated_shopping_list,
+            meal_plan_ids=request.meal_plan_ids,
+            date_from=request.date_from.isoformat() if request.date_from else None,
+            date_to=request.date_to.isoformat() if request.date_to else None,
+            user_id=request.user_id,
+            shopping_date=request.shopping_date,
+            use_pantry=request.use_pantry,
+            reserve_pantry=request.reserve_pantry
+        )
+        
+        logger.info(
+            f"Consolidated shopping list generated: {result['shopping_list_id']} "
+            f"({result['total_plans']} plans, {result['items_count']} items)"
+        )
+        
+        return ShoppingListConsolidatedResponse(**result)
+        
+    except ValueError as e:
+        logger.error(f"Validation error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error generating consolidated shopping list: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate shopping list: {str(e)}"
+        )
+
+
+@router.post("/price", response_model=ShoppingListPriceResponse)
+async def price_shopping_lists(
+    request: ShoppingListPriceRequest,
+    service: ShoppingListService = Depends(get_shopping_list_service)
+):
+    """
+    Оценивает стоимость нескольких списков покупок (бюджетный отчёт)
+    
+    Для каждого списка - полная стоимость и стоимость ещё не купленного
+    (`Purchased` не отмечен). Цены берутся из кэшированного каталога ингредиентов.
+    
+    ## Пример:
+    ```json
+    {
+      "shopping_list_ids": ["rec123456789", "rec987654321"]
+    }
+    ```
+    """
+    try:
+        logger.info(f"Pricing {len(request.shopping_list_ids)} shopping lists")
+        
+        with airtable_priority(Priority.INTERACTIVE):
+            result = await run_blocking(service.price_shopping_lists, request.shopping_list_ids)
+        
+        return ShoppingListPriceResponse(**result)
+        
+    except ValueError as e:
+        logger.error(f"Validation error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error pricing shopping lists: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to price shopping lists: {str(e)}"
+        )
+
+
+@router.post("/purge", response_model=ShoppingListDeleteResponse)
+async def purge_shopping_lists(
+    request: ShoppingListPurgeRequest,
+    service: ShoppingListService = Depends(get_shopping_list_service)
+):
+    """
+    Массово удаляет старые списки покупок вместе с их элементами
+    
+    Фильтры `older_than_days`, `status`, `meal_plan_id` объединяются через AND,
+    нужен хотя бы один. Элементы удаляются параллельными batch-запросами
+    по 10 записей (в пределах лимита Airtable).
+    
+    ## Пример:
+    ```json
+    {
+      "older_than_days": 30,
+      "status": "Completed"
+    }
+    ```
+    """
+    if request.older_than_days is None and not request.status and not request.meal_plan_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide older_than_days, status or meal_plan_id"
+        )
+    
+    try:
+        logger.info(f"Purging shopping lists: {request.model_dump(exclude_none=True)}")
+        
+        result = await run_blocking(
+            service.purge_shopping_lists,
+            older_than_days=request.older_than_days,
+            status=request.status,
+            meal_plan_id=request.meal_plan_id
+        )
+        
+        logger.info(
+            f"Purged {result['lists_deleted']} shopping lists, "
+            f"{result['items_deleted']} items in {result['elapsed_ms']} ms"
+        )
+        
+        return ShoppingListDeleteResponse(**result)
+        
+    except ValueError as e:
+        logger.error(f"Validation error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error purging shopping lists: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to purge shopping lists: {str(e)}"
+        )
+
+
+@router.post("/jobs", response_model=JobAcceptedResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_shopping_list_job(
+    request: ShoppingListGenerateRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    jobs: JobQueue = Depends(get_job_queue)
+):
+    """
+    Ставит генерацию списка покупок в очередь и сразу возвращает job_id
+    
+    Статус и результат: `GET /api/nutrition/shopping-list/jobs/{job_id}`.
+    Повтор запроса с тем же заголовком `Idempotency-Key` возвращает
+    ту же задачу и не создаёт второй список.
+    """
+    try:
+        job, created = await run_blocking(
+            jobs.submit,
+            SHOPPING_LIST_JOB,
+            request.model_dump(),
+            idempotency_key=idempotency_key
+        )
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    
+    logger.info(f"Shopping list job {'queued' if created else 'reused'}: {job['id']}")
+    
+    return JobAcceptedResponse(
+        job_id=job["id"],
+        status=job["status"],
+        status_url=f"{router.prefix}/jobs/{job['id']}",
+        created=created
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_shopping_list_job(job_id: str, jobs: JobQueue = Depends(get_job_queue)):
+    """
+    Статус фоновой задачи генерации списка покупок
+    
+    - `progress`: последний завершённый шаг пайплайна (1-8)
+    - `result`: ответ генератора, когда `status = succeeded`
+    """
+    job = await run_blocking(jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not found")
+    
+    return JobStatusResponse(
+        job_id=job["id"],
+        kind=job["kind"],
+        status=job["status"],
+        progress=job["progress"],
+        result=job["result"],
+        error=job["error"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"]
+    )
+
+
 @router.get("/{shopping_list_id}", response_model=ShoppingListDetailResponse)
-async def get_shopping_list(shopping_list_id: str):
+async def get_shopping_list(
+    shopping_list_id: str,
+    request: Request,
+    service: ShoppingListService = Depends(get_shopping_list_service)
+):
     """
     Получает детальную информацию о списке покупок
     
@@ -77,25 +379,37 @@ async def get_shopping_list(shopping_list_id: str):
     - `shopping_list_id`: ID списка покупок в Airtable
     
     ## Response:
-    Возвращает информацию о списке и все элементы (items)
+    Возвращает информацию о списке и все элементы (items).
+    Ответ кэшируется на SHOPPING_LIST_CACHE_TTL секунд и отдаётся с `ETag`;
+    запрос с актуальным `If-None-Match` получает 304 без тела.
     """
-    try:
+    async def load() -> CachedResponse:
         logger.info(f"Fetching shopping list: {shopping_list_id}")
         
-        service = ShoppingListService()
-        result = service.get_shopping_list(shopping_list_id)
+        with airtable_priority(Priority.INTERACTIVE):
+            result = await run_blocking(service.get_shopping_list, shopping_list_id)
         
         shopping_list = result['shopping_list']['fields']
         
-        return ShoppingListDetailResponse(
+        response = ShoppingListDetailResponse(
             shopping_list_id=shopping_list_id,
             list_name=shopping_list.get('List Name', ''),
             status=shopping_list.get('Status', ''),
             shopping_date=shopping_list.get('Shopping Date'),
-            total_cost=shopping_list.get('Total Cost (EUR)'),
+            total_cost=shopping_list.get('Total Cost (EUR)', result['estimated_cost']),
+            remaining_cost=result['remaining_cost'],
+            unpriced_items=result['unpriced_items'],
             items_count=result['items_count'],
             items=result['items']
         )
+        return CachedResponse(
+            body=response.model_dump(mode="json"),
+            etag=record_etag(result['shopping_list'], *result['items'])
+        )
+    
+    try:
+        cached = await get_or_load(shopping_list_responses, shopping_list_id, load)
+        return conditional_response(request, cached)
         
     except Exception as e:
         logger.error(f"Error fetching shopping list: {str(e)}")
@@ -105,24 +419,75 @@ async def get_shopping_list(shopping_list_id: str):
         )
 
 
-@router.delete("/{shopping_list_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_shopping_list(shopping_list_id: str):
+@router.post("/{shopping_list_id}/update", response_model=ShoppingListUpdateResponse)
+async def update_shopping_list(
+    shopping_list_id: str,
+    use_pantry: bool = True,
+    service: ShoppingListService = Depends(get_shopping_list_service)
+):
+    """
+    Обновляет список покупок после изменения плана питания
+    
+    Пересчитывает ингредиенты плана и записывает только разницу:
+    изменённые количества обновляются (отметки `Purchased` сохраняются),
+    новые ингредиенты добавляются, лишние удаляются.
+    Замена одного приёма пищи стоит 1-2 записи вместо пересоздания списка.
+    """
+    try:
+        logger.info(f"Updating shopping list: {shopping_list_id}")
+        
+        result = await run_blocking(service.update_shopping_list, shopping_list_id, use_pantry=use_pantry)
+        
+        logger.info(
+            f"Shopping list updated: {shopping_list_id} "
+            f"(+{result['created']} ~{result['updated']} -{result['deleted']})"
+        )
+        
+        return ShoppingListUpdateResponse(**result)
+        
+    except ValueError as e:
+        logger.error(f"Validation error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error updating shopping list: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update shopping list: {str(e)}"
+        )
+
+
+@router.delete("/{shopping_list_id}", response_model=ShoppingListDeleteResponse)
+async def delete_shopping_list(
+    shopping_list_id: str,
+    service: ShoppingListService = Depends(get_shopping_list_service)
+):
     """
     Удаляет список покупок и все его элементы
     
     ## Parameters:
     - `shopping_list_id`: ID списка покупок в Airtable
+    
+    ## Response:
+    Количество удалённых списков и элементов, время удаления (`elapsed_ms`)
     """
     try:
         logger.info(f"Deleting shopping list: {shopping_list_id}")
         
-        service = ShoppingListService()
-        # TODO: Implement delete logic
+        result = await run_blocking(service.delete_shopping_list, shopping_list_id)
+        
+        logger.info(f"Shopping list deleted: {shopping_list_id} ({result['items_deleted']} items)")
+        
+        return ShoppingListDeleteResponse(**result)
+        
+    except ValueError as e:
+        logger.error(f"Validation error: {str(e)}")
         raise HTTPException(
-            status_code=status.HTTP_501_NOT_IMPLEMENTED,
-            detail="Delete functionality not implemented yet"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
         )
-        
     except Exception as e:
         logger.error(f"Error deleting shopping list: {str(e)}")
         raise HTTPException(
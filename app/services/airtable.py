@@ -1,18 +1,43 @@
 from pyairtable import Api
+from requests.adapters import HTTPAdapter
 from typing import List, Dict, Optional
 import os
 
+from app.config import AIRTABLE_ENDPOINT_URL, AIRTABLE_IO_WORKERS
+from app.services.batch_writer import batch_writer
+from app.services.scheduler import ScheduledApi
+
+
+def create_api(api_key: Optional[str]) -> Api:
+    """
+    Создать клиент Airtable с пулом keep-alive соединений
+    
+    Размер пула совпадает с числом потоков Airtable I/O, чтобы
+    параллельные запросы не открывали новые TLS соединения.
+    Все запросы идут через AirtableScheduler (лимит, приоритеты, повторы),
+    поэтому встроенные повторы urllib3 отключены.
+    """
+    api = ScheduledApi(api_key, endpoint_url=AIRTABLE_ENDPOINT_URL)
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=AIRTABLE_IO_WORKERS,
+        max_retries=0
+    )
+    api.session.mount("https://", adapter)
+    api.session.mount("http://", adapter)
+    return api
+
 class AirtableService:
     """Сервис для работы с Airtable"""
     
-    def __init__(self):
+    def __init__(self, api: Optional[Api] = None):
         self.api_key = os.getenv("AIRTABLE_API_KEY")
         self.base_id = os.getenv("AIRTABLE_BASE_ID", "appBgJb1hzG4vFT1b")
         
-        if not self.api_key:
+        # Общее хранилище из реестра сервисов (Airtable или SQLite) или собственный клиент
+        if api is None and not self.api_key:
             raise ValueError("AIRTABLE_API_KEY не установлен в переменных окружения")
-        
-        self.api = Api(self.api_key)
+        self.api = api or create_api(self.api_key)
         self.base = self.api.base(self.base_id)
     
     def get_table(self, table_name: str):
@@ -24,19 +49,21 @@ class AirtableService:
         table = self.get_table(table_name)
         return table.create(fields)
     
-    def create_records_batch(self, table_name: str, records: List[dict]) -> List[dict]:
-        """Создать несколько записей (батчами по 10)"""
-        table = self.get_table(table_name)
-        results = []
-        
-        # Airtable API поддерживает батчи до 10 записей
-        batch_size = 10
-        for i in range(0, len(records), batch_size):
-            batch = records[i:i + batch_size]
-            batch_results = table.batch_create(batch)
-            results.extend(batch_results)
+    def create_records_batch(
+        self,
+        table_name: str,
+        records: List[dict],
+        on_chunk=None,
+        fail_fast: bool = True
+    ) -> List[Optional[dict]]:
+        """
+        Создать несколько записей (батчами по 10, параллельно)
         
-        return results
+        fail_fast=False: записи неудачных батчей возвращаются как None
+        """
+        table = self.get_table(table_name)
+        result = batch_writer.batch_create(table, records, on_chunk=on_chunk, fail_fast=fail_fast)
+        return result.records
     
     def get_record(self, table_name: str, record_id: str) -> dict:
         """Получить запись по ID"""
@@ -65,13 +92,3 @@ class AirtableService:
         except Exception as e:
             print(f"Ошибка подключения к Airtable: {e}")
             return False
-
-# Глобальный экземпляр сервиса
-airtable_service = None
-
-def get_airtable_service() -> AirtableService:
-    """Получить экземпляр сервиса Airtable (singleton)"""
-    global airtable_service
-    if airtable_service is None:
-        airtable_service = AirtableService()
-    return airtable_service
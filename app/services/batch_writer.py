@@ -0,0 +1,163 @@
+"""
+Batch Write Pipeline
+Параллельная отправка batch-запросов Airtable (по 10 записей)
+"""
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from app.config import AIRTABLE_BATCH_SIZE, AIRTABLE_MAX_IN_FLIGHT
+from app.services.formulas import chunked
+from app.services.scheduler import Priority, airtable_priority
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ChunkTiming:
+    """Результат отправки одного batch-запроса"""
+    index: int
+    size: int
+    latency_ms: float  # включая ожидание очереди планировщика
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchResult:
+    """
+    Результат батчевой записи (records в исходном порядке)
+
+    При fail_fast=False записи неудачных чанков заменяются на None,
+    чтобы records оставались сопоставимы с исходными данными
+    """
+    records: List[Optional[Dict]] = field(default_factory=list)
+    chunks: List[ChunkTiming] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+    @property
+    def failed_chunks(self) -> List[ChunkTiming]:
+        return [chunk for chunk in self.chunks if chunk.error]
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = [c.latency_ms for c in self.chunks]
+        return {
+            "records": len(self.records),
+            "chunks": len(self.chunks),
+            "elapsed_ms": round(self.elapsed_ms, 1),
+            "chunk_latency_ms": [round(latency, 1) for latency in latencies],
+            "max_chunk_latency_ms": round(max(latencies), 1) if latencies else 0.0,
+            "failed_chunks": len(self.failed_chunks),
+        }
+
+
+# Общий пул: ограничивает число одновременных batch-запросов во всём процессе
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=AIRTABLE_MAX_IN_FLIGHT,
+                thread_name_prefix="airtable-batch"
+            )
+        return _pool
+
+
+class BatchWriter:
+    """
+    Отправляет чанки по 10 записей параллельно
+
+    - не более AIRTABLE_MAX_IN_FLIGHT запросов одновременно (на весь процесс)
+    - лимит 5 запросов/сек соблюдает AirtableScheduler (очередь BULK)
+    - результат возвращается в порядке исходных записей
+    """
+
+    def run(
+        self,
+        operation: Callable[[Sequence[Any]], List[Dict]],
+        items: Sequence[Any],
+        label: str = "batch",
+        on_chunk: Optional[Callable[[int, List[Dict]], None]] = None,
+        fail_fast: bool = True
+    ) -> BatchResult:
+        """
+        Выполнить operation для каждого чанка items
+
+        Args:
+            operation: функция, отправляющая один чанк (например table.batch_create)
+            items: записи / ID для отправки
+            label: название операции для логов
+            on_chunk: колбэк (index, records) после завершения каждого чанка
+            fail_fast: True - первая ошибка чанка пробрасывается,
+                False - ошибка записывается в ChunkTiming.error
+        """
+        started = time.perf_counter()
+        chunks = list(chunked(list(items), AIRTABLE_BATCH_SIZE))
+        if not chunks:
+            return BatchResult()
+
+        def send(index: int, chunk: Sequence[Any]):
+            chunk_started = time.perf_counter()
+            error = None
+            try:
+                with airtable_priority(Priority.BULK):
+                    records = operation(chunk)
+            except Exception as e:
+                if fail_fast:
+                    raise
+                logger.error(f"{label}: chunk {index} failed: {e}")
+                records, error = [None] * len(chunk), str(e)
+            timing = ChunkTiming(
+                index=index,
+                size=len(chunk),
+                latency_ms=(time.perf_counter() - chunk_started) * 1000,
+                error=error
+            )
+            if on_chunk and error is None:
+                on_chunk(index, records)
+            return records, timing
+
+        if len(chunks) == 1:
+            outcomes = [send(0, chunks[0])]
+        else:
+            pool = _get_pool()
+            futures = [
+                pool.submit(contextvars.copy_context().run, send, i, chunk)
+                for i, chunk in enumerate(chunks)
+            ]
+            outcomes = [future.result() for future in futures]
+
+        result = BatchResult(elapsed_ms=(time.perf_counter() - started) * 1000)
+        for records, timing in outcomes:
+            result.records.extend(records)
+            result.chunks.append(timing)
+
+        logger.info(f"{label}: {result.summary()}")
+        return result
+
+    def batch_create(self, table, records: Sequence[Dict], **kwargs: Any) -> BatchResult:
+        """Параллельный table.batch_create"""
+        return self.run(table.batch_create, records, label=f"batch_create {_table_name(table)}", **kwargs)
+
+    def batch_update(self, table, records: Sequence[Dict], **kwargs: Any) -> BatchResult:
+        """Параллельный table.batch_update (records: [{"id": ..., "fields": {...}}])"""
+        return self.run(table.batch_update, records, label=f"batch_update {_table_name(table)}", **kwargs)
+
+    def batch_delete(self, table, record_ids: Sequence[str], **kwargs: Any) -> BatchResult:
+        """Параллельный table.batch_delete"""
+        return self.run(table.batch_delete, record_ids, label=f"batch_delete {_table_name(table)}", **kwargs)
+
+
+def _table_name(table) -> str:
+    return getattr(table, "name", None) or type(table).__name__
+
+
+# Общий экземпляр (состояния нет, пул общий)
+batch_writer = BatchWriter()
@@ -0,0 +1,151 @@
+"""
+In-process Caches
+TTL/LRU кэш, общий для всех запросов процесса
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from app.config import (
+    INGREDIENT_CACHE_SIZE,
+    INGREDIENT_CACHE_TTL,
+    MEAL_PLAN_CACHE_TTL,
+    RESPONSE_CACHE_SIZE,
+    SHOPPING_LIST_CACHE_TTL,
+)
+
+
+class TTLCache:
+    """
+    Потокобезопасный LRU кэш с ограничением по времени жизни записей
+
+    - maxsize: максимальное количество записей (старые вытесняются)
+    - ttl: время жизни записи в секундах
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Поколения ключей: invalidate() увеличивает, set_if_current() сверяет
+        self._generations: Dict[Hashable, int] = {}
+        self._epoch = 0  # растёт при сбросе _generations / clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key: Hashable, now: float) -> Tuple[bool, Any]:
+        """Ищет запись (вызывать под блокировкой)"""
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < now:
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Получить значение по ключу"""
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def get_many(self, keys: Iterable[Hashable]) -> Tuple[Dict[Hashable, Any], List[Hashable]]:
+        """
+        Получить несколько значений за один захват блокировки
+
+        Returns:
+            (найденные значения, список отсутствующих ключей)
+        """
+        found_values: Dict[Hashable, Any] = {}
+        missing: List[Hashable] = []
+        with self._lock:
+            now = time.monotonic()
+            for key in keys:
+                found, value = self._lookup(key, now)
+                if found:
+                    found_values[key] = value
+                else:
+                    missing.append(key)
+            self.hits += len(found_values)
+            self.misses += len(missing)
+        return found_values, missing
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Сохранить значение"""
+        self.set_many({key: value})
+
+    def set_many(self, values: Dict[Hashable, Any]) -> None:
+        """Сохранить несколько значений"""
+        with self._lock:
+            expires_at = time.monotonic() + self.ttl
+            for key, value in values.items():
+                self._data[key] = (expires_at, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def generation(self, key: Hashable) -> Tuple[int, int]:
+        """Поколение ключа: запомнить перед загрузкой значения, см. set_if_current()"""
+        with self._lock:
+            return self._epoch, self._generations.get(key, 0)
+
+    def set_if_current(self, key: Hashable, value: Any, generation: Tuple[int, int]) -> bool:
+        """
+        Сохранить значение, если ключ не инвалидировали после generation(key)
+
+        Иначе значение загружено до записи и устарело - не сохраняется
+        """
+        with self._lock:
+            if (self._epoch, self._generations.get(key, 0)) != generation:
+                return False
+        self.set(key, value)
+        return True
+
+    def invalidate(self, key: Hashable) -> None:
+        """Удалить запись (загрузки, начатые раньше, её не вернут)"""
+        with self._lock:
+            self._data.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+            # Не копим поколения бесконечно: сброс с новой эпохой отменяет все текущие загрузки
+            if len(self._generations) > self.maxsize * 4:
+                self._generations.clear()
+                self._epoch += 1
+
+    def clear(self) -> None:
+        """Очистить кэш"""
+        with self._lock:
+            self._data.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики попаданий/промахов"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 3) if total else None,
+            }
+
+
+# Общий кэш названий ингредиентов: ingredient_id -> Ingredient Name
+ingredient_cache = TTLCache(maxsize=INGREDIENT_CACHE_SIZE, ttl=INGREDIENT_CACHE_TTL)
+
+# Кэши ответов GET: record_id -> CachedResponse (см. app.services.http_cache)
+meal_plan_responses = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=MEAL_PLAN_CACHE_TTL)
+shopping_list_responses = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=SHOPPING_LIST_CACHE_TTL)
@@ -0,0 +1,365 @@
+"""
+Recipe Catalog Mirror
+Локальное зеркало каталога рецептов: Recipes, Recipe_Ingredients, Ingredients
+
+Каталог меняется редко, поэтому загружается один раз при старте и затем
+обновляется инкрементально - только записи, изменённые после последней
+синхронизации (формула по LAST_MODIFIED_TIME()). Генерация планов и списков
+покупок читает каталог локально, сеть нужна только для записи.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.config import (
+    CATALOG_DB_PATH,
+    CATALOG_FULL_SYNC_INTERVAL,
+    CATALOG_REFRESH_INTERVAL,
+    CATALOG_RETRY_DELAY,
+    RECIPE_INGREDIENTS_FIELD,
+)
+from app.services.ingredient_vectors import IngredientVectors
+from app.services.pricing import PriceTable
+from app.services.units import UnitConverter
+
+logger = logging.getLogger(__name__)
+
+RECIPES = "Recipes"
+RECIPE_INGREDIENTS = "Recipe_Ingredients"
+INGREDIENTS = "Ingredients"
+CATALOG_TABLES = (RECIPES, RECIPE_INGREDIENTS, INGREDIENTS)
+
+# Запас на расхождение часов между нами и Airtable
+CLOCK_SKEW = timedelta(minutes=2)
+
+
+class _CatalogStore:
+    """SQLite хранилище снимка каталога (переживает рестарт процесса)"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                " table_name TEXT NOT NULL, id TEXT NOT NULL, record TEXT NOT NULL,"
+                " PRIMARY KEY (table_name, id))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    def load(self) -> Dict[str, Any]:
+        """Возвращает {'tables': {table: {id: record}}, 'meta': {...}}"""
+        tables: Dict[str, Dict[str, Dict]] = {name: {} for name in CATALOG_TABLES}
+        with self._lock:
+            for table_name, record_id, record in self._conn.execute(
+                "SELECT table_name, id, record FROM records"
+            ):
+                if table_name in tables:
+                    tables[table_name][record_id] = json.loads(record)
+            meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        return {"tables": tables, "meta": meta}
+
+    def save(self, table_name: str, records: Iterable[Dict], replace: bool = False) -> None:
+        """Сохраняет записи таблицы (replace=True - полностью заменяет таблицу)"""
+        with self._lock, self._conn:
+            if replace:
+                self._conn.execute("DELETE FROM records WHERE table_name = ?", (table_name,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO records (table_name, id, record) VALUES (?, ?, ?)",
+                [(table_name, r["id"], json.dumps(r, ensure_ascii=False)) for r in records],
+            )
+
+    def delete(self, table_name: str, record_ids: Iterable[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM records WHERE table_name = ? AND id = ?",
+                [(table_name, record_id) for record_id in record_ids],
+            )
+
+    def set_meta(self, values: Dict[str, str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", list(values.items())
+            )
+
+
+class CatalogMirror:
+    """
+    Read-through зеркало каталога рецептов
+
+    - load(): полная загрузка всех таблиц каталога
+    - refresh(): инкрементальная загрузка изменённых записей
+    - ensure_fresh(): загружает/обновляет каталог, если он устарел
+    """
+
+    def __init__(self, get_table: Callable[[str], Any], db_path: Optional[str] = CATALOG_DB_PATH):
+        self._get_table = get_table
+        self._lock = threading.RLock()
+        self._tables: Dict[str, Dict[str, Dict]] = {name: {} for name in CATALOG_TABLES}
+        self._ingredients_by_recipe: Optional[Dict[str, List[Dict]]] = None
+        self._ingredient_vectors: Optional[IngredientVectors] = None
+        self._units: Optional[UnitConverter] = None
+        self._prices: Optional[PriceTable] = None
+        self._store = _CatalogStore(db_path) if db_path else None
+        self.loaded = False
+        self.synced_at: Optional[datetime] = None  # водяной знак (время Airtable)
+        self.full_synced_at: Optional[datetime] = None
+        self._checked_at = 0.0  # monotonic время последней проверки свежести
+        self._failed_at: Optional[float] = None  # monotonic время неудачной синхронизации
+        self._last_error: Optional[str] = None
+        self.version = 0  # увеличивается при каждом изменении каталога
+
+        if self._store:
+            self._restore()
+
+    # --- Синхронизация ---
+
+    def _restore(self) -> None:
+        """Поднимает снимок каталога из SQLite"""
+        snapshot = self._store.load()
+        meta = snapshot["meta"]
+        if "synced_at" not in meta:
+            return
+        with self._lock:
+            self._tables = snapshot["tables"]
+            self.synced_at = datetime.fromisoformat(meta["synced_at"])
+            self.full_synced_at = datetime.fromisoformat(meta["full_synced_at"])
+            self._changed()
+            self.loaded = True
+        logger.info(f"Catalog restored from SQLite snapshot: {self._counts()}")
+
+    def load(self) -> None:
+        """Полная загрузка каталога"""
+        started_at = datetime.now(timezone.utc)
+        tables = {name: self._get_table(name).all() for name in CATALOG_TABLES}
+        with self._lock:
+            self._tables = {
+                name: {record["id"]: record for record in records}
+                for name, records in tables.items()
+            }
+            self.synced_at = started_at
+            self.full_synced_at = started_at
+            self._checked_at = time.monotonic()
+            self._changed()
+            self.loaded = True
+        if self._store:
+            for name, records in tables.items():
+                self._store.save(name, records, replace=True)
+            self._save_meta()
+        logger.info(f"Catalog loaded: {self._counts()}")
+
+    def refresh(self) -> int:
+        """
+        Инкрементальное обновление: загружает только записи,
+        изменённые после последней синхронизации
+
+        Returns:
+            количество обновлённых записей
+        """
+        if not self.loaded:
+            self.load()
+            return sum(len(records) for records in self._tables.values())
+
+        started_at = datetime.now(timezone.utc)
+        since = (self.synced_at - CLOCK_SKEW).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        formula = f"IS_AFTER(LAST_MODIFIED_TIME(), '{since}')"
+        changed = {name: self._get_table(name).all(formula=formula) for name in CATALOG_TABLES}
+
+        with self._lock:
+            for name, records in changed.items():
+                for record in records:
+                    self._tables[name][record["id"]] = record
+            removed = self._prune_recipe_ingredients(changed[RECIPES])
+            self.synced_at = started_at
+            self._checked_at = time.monotonic()
+            total = sum(len(records) for records in changed.values())
+            if total or removed:
+                self._changed()
+
+        if self._store:
+            for name, records in changed.items():
+                self._store.save(name, records)
+            self._store.delete(RECIPE_INGREDIENTS, removed)
+            self._save_meta()
+        if total:
+            logger.info(f"Catalog refreshed: {total} records changed")
+        return total
+
+    def _prune_recipe_ingredients(self, recipes: List[Dict]) -> List[str]:
+        """
+        Удаляет строки Recipe_Ingredients, которых больше нет у изменённых рецептов
+
+        Удаление строки меняет обратную ссылку в рецепте, поэтому рецепт
+        попадает в инкрементальную выборку. Вызывать под блокировкой.
+        """
+        if not recipes or not self._has_reverse_link:
+            return []
+        current = {
+            recipe["id"]: set(recipe["fields"].get(RECIPE_INGREDIENTS_FIELD, []))
+            for recipe in recipes
+        }
+        removed = [
+            ri_id
+            for ri_id, ri in self._tables[RECIPE_INGREDIENTS].items()
+            if ri["fields"].get("Recipes 2", [None])[0] in current
+            and ri_id not in current[ri["fields"]["Recipes 2"][0]]
+        ]
+        for ri_id in removed:
+            del self._tables[RECIPE_INGREDIENTS][ri_id]
+        return removed
+
+    def ensure_fresh(self) -> None:
+        """
+        Read-through: загружает каталог при первом обращении,
+        затем обновляет не чаще CATALOG_REFRESH_INTERVAL
+
+        После неудачной синхронизации следующая попытка - не раньше
+        CATALOG_RETRY_DELAY: загруженный каталог отдаётся как есть,
+        незагруженный сразу даёт ошибку (без запросов к Airtable)
+        """
+        if not self._sync_due():
+            return
+        with self._lock:
+            if not self._sync_due():
+                return
+            full_sync_due = (
+                self.full_synced_at is None
+                or datetime.now(timezone.utc) - self.full_synced_at
+                > timedelta(seconds=CATALOG_FULL_SYNC_INTERVAL)
+            )
+            try:
+                if full_sync_due:
+                    self.load()
+                else:
+                    self.refresh()
+            except Exception as e:
+                self._failed_at = time.monotonic()
+                self._last_error = str(e)
+                if not self.loaded:
+                    raise
+                logger.warning(f"Catalog sync failed, serving stale catalog for {CATALOG_RETRY_DELAY}s: {e}")
+                return
+            self._failed_at = None
+
+    def _sync_due(self) -> bool:
+        """Пора ли синхронизировать каталог (RuntimeError - незагруженный каталог ждёт повтора)"""
+        now = time.monotonic()
+        if self._failed_at is not None and now - self._failed_at < CATALOG_RETRY_DELAY:
+            if self.loaded:
+                return False
+            retry_in = CATALOG_RETRY_DELAY - (now - self._failed_at)
+            raise RuntimeError(f"Catalog load failed, next attempt in {retry_in:.0f}s: {self._last_error}")
+        return not self.loaded or now - self._checked_at >= CATALOG_REFRESH_INTERVAL
+
+    def _changed(self) -> None:
+        """Сбрасывает производные индексы (вызывать под блокировкой)"""
+        self._ingredients_by_recipe = None
+        self._ingredient_vectors = None
+        self._units = None
+        self._prices = None
+        self.version += 1
+
+    def _save_meta(self) -> None:
+        self._store.set_meta({
+            "synced_at": self.synced_at.isoformat(),
+            "full_synced_at": self.full_synced_at.isoformat(),
+        })
+
+    def _counts(self) -> Dict[str, int]:
+        return {name: len(records) for name, records in self._tables.items()}
+
+    @property
+    def _has_reverse_link(self) -> bool:
+        """Есть ли в Recipes обратная ссылка на Recipe_Ingredients"""
+        return any(
+            RECIPE_INGREDIENTS_FIELD in recipe["fields"]
+            for recipe in self._tables[RECIPES].values()
+        )
+
+    # --- Чтение ---
+
+    def all(self, table_name: str) -> List[Dict]:
+        """Все записи таблицы каталога"""
+        self.ensure_fresh()
+        return list(self._tables[table_name].values())
+
+    def get_many(self, table_name: str, record_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Записи по ID (отсутствующие пропускаются)"""
+        self.ensure_fresh()
+        records = self._tables[table_name]
+        return {rid: records[rid] for rid in record_ids if rid in records}
+
+    def recipe_ingredients_for(self, recipe_ids: Iterable[str]) -> List[Dict]:
+        """Строки Recipe_Ingredients для указанных рецептов"""
+        self.ensure_fresh()
+        index = self._ingredients_by_recipe
+        if index is None:
+            with self._lock:
+                index = {}
+                for ri in self._tables[RECIPE_INGREDIENTS].values():
+                    for recipe_id in ri["fields"].get("Recipes 2", []):
+                        index.setdefault(recipe_id, []).append(ri)
+                self._ingredients_by_recipe = index
+        return [ri for recipe_id in set(recipe_ids) for ri in index.get(recipe_id, [])]
+
+    def units(self) -> UnitConverter:
+        """Перевод единиц с плотностями / весом штуки из таблицы Ingredients"""
+        self.ensure_fresh()
+        units = self._units
+        if units is None:
+            with self._lock:
+                units = UnitConverter.from_ingredients(self._tables[INGREDIENTS].values())
+                self._units = units
+        return units
+
+    def prices(self) -> PriceTable:
+        """Цены ингредиентов за каноническую единицу"""
+        self.ensure_fresh()
+        prices = self._prices
+        if prices is None:
+            with self._lock:
+                prices = PriceTable.from_ingredients(self._tables[INGREDIENTS].values(), self.units())
+                self._prices = prices
+        return prices
+
+    def ingredient_vectors(self) -> IngredientVectors:
+        """Векторы ингредиентов рецептов с ценами (строятся заново после изменения каталога)"""
+        self.ensure_fresh()
+        vectors = self._ingredient_vectors
+        if vectors is None:
+            with self._lock:
+                vectors = IngredientVectors.from_rows(
+                    self._tables[RECIPE_INGREDIENTS].values(), self.units(), self.prices()
+                )
+                self._ingredient_vectors = vectors
+        return vectors
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "records": self._counts(),
+            "synced_at": self.synced_at.isoformat() if self.synced_at else None,
+            "full_synced_at": self.full_synced_at.isoformat() if self.full_synced_at else None,
+            "persistent": self._store is not None,
+        }
+
+
+def fresh_or_none(catalog: Optional[CatalogMirror]) -> Optional[CatalogMirror]:
+    """
+    Актуальное зеркало каталога или None, если его нет или не удалось
+    загрузить (тогда вызывающий код читает Airtable напрямую)
+    """
+    if catalog is None:
+        return None
+    try:
+        catalog.ensure_fresh()
+        return catalog
+    except Exception as e:
+        logger.warning(f"Catalog unavailable, falling back to Airtable: {e}")
+        return None
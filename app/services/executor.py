@@ -0,0 +1,49 @@
+"""
+Blocking I/O Executor
+Выделенный пул потоков для синхронных вызовов pyairtable из async роутов
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from app.config import AIRTABLE_IO_MODE, AIRTABLE_IO_WORKERS
+
+T = TypeVar("T")
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Пул потоков для Airtable I/O (создаётся при первом обращении)"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=AIRTABLE_IO_WORKERS,
+            thread_name_prefix="airtable-io"
+        )
+    return _executor
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Выполнить блокирующую функцию, не блокируя event loop
+
+    В режиме AIRTABLE_IO_MODE=threadpool вызов уходит в выделенный пул
+    (контекстные переменные копируются), в режиме inline выполняется сразу.
+    """
+    if AIRTABLE_IO_MODE == "inline":
+        return func(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
+
+
+def shutdown_executor() -> None:
+    """Остановить пул потоков (при остановке приложения)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
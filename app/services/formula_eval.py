@@ -0,0 +1,339 @@
+"""
+Airtable Formula Evaluator
+Разбор и вычисление подмножества формул Airtable (filterByFormula)
+
+Нужен локальному хранилищу (SQLiteStore), чтобы сервисы могли
+передавать те же формулы, что и в Airtable. Поддерживаются формулы,
+которые строит приложение (formulas.py, фильтры по датам и статусу):
+
+- литералы: 'строка', "строка", числа, TRUE() / FALSE() / BLANK()
+- поля {Field}; linked record поле даёт primary значения связанных записей
+- операторы: & + - * / = != < > <= >=
+- функции: AND OR NOT IF RECORD_ID CREATED_TIME LAST_MODIFIED_TIME
+  FIND ARRAYJOIN LEN LOWER UPPER TRIM VALUE
+  IS_BEFORE IS_AFTER IS_SAME DATEADD TODAY NOW
+
+Неизвестная функция - FormulaError (а не молча пустой результат).
+"""
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+Node = Tuple[Any, ...]
+
+
+class FormulaError(ValueError):
+    """Формула не разобрана или использует неподдерживаемую функцию"""
+
+
+_TOKEN_RE = re.compile(
+    r"\s*(?:"
+    r"(?P<number>\d+(?:\.\d+)?)"
+    r"|(?P<string>'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")"
+    r"|(?P<field>\{(?:[^}\\]|\\.)*\})"
+    r"|(?P<name>[A-Za-z_][A-Za-z0-9_]*)"
+    r"|(?P<op>!=|<=|>=|[&+\-*/=<>(),])"
+    r")"
+)
+
+# Приоритет бинарных операторов (больше - связывает сильнее)
+_PRECEDENCE = {"=": 1, "!=": 1, "<": 1, ">": 1, "<=": 1, ">=": 1, "&": 2, "+": 3, "-": 3, "*": 4, "/": 4}
+
+
+def _unescape(text: str) -> str:
+    return re.sub(r"\\(.)", r"\1", text)
+
+
+def _tokenize(formula: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    formula = formula.rstrip()
+    while position < len(formula):
+        match = _TOKEN_RE.match(formula, position)
+        if not match or match.end() == position:
+            raise FormulaError(f"Unexpected character at {position}: {formula[position:position + 20]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Рекурсивный спуск: expression := unary (op unary)*"""
+
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, value: Optional[str] = None) -> Tuple[str, str]:
+        token = self.peek()
+        if token is None or (value is not None and token[1] != value):
+            raise FormulaError(f"Expected {value or 'token'}, got {token[1] if token else 'end of formula'}")
+        self.position += 1
+        return token
+
+    def expression(self, min_precedence: int = 1) -> Node:
+        left = self.unary()
+        while True:
+            token = self.peek()
+            if token is None or token[0] != "op" or token[1] not in _PRECEDENCE:
+                return left
+            precedence = _PRECEDENCE[token[1]]
+            if precedence < min_precedence:
+                return left
+            self.take()
+            right = self.expression(precedence + 1)
+            left = ("op", token[1], left, right)
+
+    def unary(self) -> Node:
+        kind, value = self.take()
+        if kind == "number":
+            return ("lit", float(value) if "." in value else int(value))
+        if kind == "string":
+            return ("lit", _unescape(value[1:-1]))
+        if kind == "field":
+            return ("field", _unescape(value[1:-1]))
+        if kind == "name":
+            self.take("(")
+            args = []
+            if self.peek() and self.peek()[1] != ")":
+                args.append(self.expression())
+                while self.peek() and self.peek()[1] == ",":
+                    self.take()
+                    args.append(self.expression())
+            self.take(")")
+            return ("call", value.upper(), tuple(args))
+        if value == "(":
+            node = self.expression()
+            self.take(")")
+            return node
+        if value == "-":
+            return ("op", "-", ("lit", 0), self.unary())
+        raise FormulaError(f"Unexpected token {value!r}")
+
+
+def parse_formula(formula: str) -> Node:
+    """Разбирает формулу в дерево (кортежи ("lit"|"field"|"call"|"op", ...))"""
+    parser = _Parser(_tokenize(formula))
+    node = parser.expression()
+    if parser.peek() is not None:
+        raise FormulaError(f"Unexpected token {parser.peek()[1]!r}")
+    return node
+
+
+class FormulaRecord:
+    """
+    Запись, для которой вычисляется формула
+
+    field(name) возвращает значение поля; для linked record полей -
+    список primary значений связанных записей (как в Airtable)
+    """
+    record_id: str
+    created_time: str
+    modified_time: str
+
+    def field(self, name: str) -> Any:
+        raise NotImplementedError
+
+
+def parse_datetime(value: Any) -> Optional[datetime]:
+    """Дата / время в UTC (ISO 8601; дата без времени - полночь UTC)"""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+    if not value:
+        return None
+    text = str(value).strip().replace("Z", "+00:00")
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        raise FormulaError(f"Not a date: {value!r}")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _text(value: Any) -> str:
+    if value is None or value is False:
+        return ""
+    if value is True:
+        return "1"
+    if isinstance(value, list):
+        return ", ".join(_text(item) for item in value)
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    return str(value)
+
+
+def _number(value: Any) -> float:
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(_text(value) or 0)
+    except ValueError:
+        return 0.0
+
+
+def _truthy(value: Any) -> bool:
+    if isinstance(value, list):
+        return bool(value)
+    if isinstance(value, str):
+        return value != ""
+    return bool(value)
+
+
+def _compare(op: str, left: Any, right: Any) -> bool:
+    if isinstance(left, datetime) or isinstance(right, datetime):
+        left, right = parse_datetime(left), parse_datetime(right)
+    elif isinstance(left, (int, float)) and isinstance(right, (int, float)):
+        pass
+    elif op in ("=", "!="):
+        left, right = _text(left), _text(right)
+    else:
+        left, right = _number(left), _number(right)
+    if op == "=":
+        return left == right
+    if op == "!=":
+        return left != right
+    if left is None or right is None:
+        return False
+    return {"<": left < right, ">": left > right, "<=": left <= right, ">=": left >= right}[op]
+
+
+_DATE_UNITS = {
+    "milliseconds": "milliseconds", "ms": "milliseconds",
+    "seconds": "seconds", "s": "seconds",
+    "minutes": "minutes", "m": "minutes",
+    "hours": "hours", "h": "hours",
+    "days": "days", "d": "days",
+    "weeks": "weeks", "w": "weeks",
+}
+
+
+def _date_add(value: Any, count: Any, unit: Any) -> Optional[datetime]:
+    moment = parse_datetime(value)
+    key = _DATE_UNITS.get(_text(unit).lower())
+    if key is None:
+        raise FormulaError(f"Unsupported DATEADD unit: {unit!r}")
+    return moment + timedelta(**{key: _number(count)}) if moment else None
+
+
+def _today() -> datetime:
+    now = datetime.now(timezone.utc)
+    return datetime(now.year, now.month, now.day, tzinfo=timezone.utc)
+
+
+def _is_same(left: Any, right: Any, unit: Any = "milliseconds") -> bool:
+    left, right = parse_datetime(left), parse_datetime(right)
+    if left is None or right is None:
+        return False
+    formats = {"day": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}
+    fmt = formats.get(_text(unit).lower())
+    return left.strftime(fmt) == right.strftime(fmt) if fmt else left == right
+
+
+def _find(needle: Any, haystack: Any, start: Any = 0) -> int:
+    return _text(haystack).find(_text(needle), max(int(_number(start)) - 1, 0)) + 1
+
+
+# Функции со строгим вычислением аргументов
+_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "NOT": lambda value: not _truthy(value),
+    "TRUE": lambda: True,
+    "FALSE": lambda: False,
+    "BLANK": lambda: None,
+    "FIND": _find,
+    "SEARCH": lambda needle, haystack, start=0: _find(_text(needle).lower(), _text(haystack).lower(), start),
+    "ARRAYJOIN": lambda values, separator=", ": _text(separator).join(
+        _text(item) for item in (values if isinstance(values, list) else [values] if values else [])
+    ),
+    "LEN": lambda value: len(_text(value)),
+    "LOWER": lambda value: _text(value).lower(),
+    "UPPER": lambda value: _text(value).upper(),
+    "TRIM": lambda value: _text(value).strip(),
+    "VALUE": _number,
+    "IS_BEFORE": lambda left, right: _compare("<", parse_datetime(left), parse_datetime(right)),
+    "IS_AFTER": lambda left, right: _compare(">", parse_datetime(left), parse_datetime(right)),
+    "IS_SAME": _is_same,
+    "DATEADD": _date_add,
+    "TODAY": _today,
+    "NOW": lambda: datetime.now(timezone.utc),
+}
+
+
+def evaluate(node: Node, record: FormulaRecord) -> Any:
+    """Значение формулы для записи"""
+    kind = node[0]
+    if kind == "lit":
+        return node[1]
+    if kind == "field":
+        return record.field(node[1])
+    if kind == "op":
+        op, left, right = node[1], evaluate(node[2], record), evaluate(node[3], record)
+        if op == "&":
+            return _text(left) + _text(right)
+        if op in ("+", "-", "*", "/"):
+            left, right = _number(left), _number(right)
+            if op == "/":
+                return left / right if right else None
+            return {"+": left + right, "-": left - right, "*": left * right}[op]
+        return _compare(op, left, right)
+
+    name, args = node[1], node[2]
+    # Функции с ленивыми аргументами и доступом к записи
+    if name == "AND":
+        return all(_truthy(evaluate(arg, record)) for arg in args)
+    if name == "OR":
+        return any(_truthy(evaluate(arg, record)) for arg in args)
+    if name == "IF":
+        if _truthy(evaluate(args[0], record)):
+            return evaluate(args[1], record)
+        return evaluate(args[2], record) if len(args) > 2 else None
+    if name == "RECORD_ID":
+        return record.record_id
+    if name == "CREATED_TIME":
+        return parse_datetime(record.created_time)
+    if name == "LAST_MODIFIED_TIME":
+        return parse_datetime(record.modified_time)
+
+    function = _FUNCTIONS.get(name)
+    if function is None:
+        raise FormulaError(f"Unsupported formula function: {name}()")
+    try:
+        return function(*(evaluate(arg, record) for arg in args))
+    except TypeError:
+        raise FormulaError(f"Wrong number of arguments for {name}()")
+
+
+def matches(node: Node, record: FormulaRecord) -> bool:
+    """Проходит ли запись фильтр (filterByFormula: истинное значение)"""
+    return _truthy(evaluate(node, record))
+
+
+def record_ids(node: Node) -> Optional[Set[str]]:
+    """
+    ID записей, если формула - выборка по ID (RECORD_ID()='x' или OR(...) таких условий)
+
+    None - формула отбирает записи иначе
+    """
+    if node[0] == "call" and node[1] == "OR" and node[2]:
+        ids: Set[str] = set()
+        for arg in node[2]:
+            arg_ids = record_ids(arg)
+            if arg_ids is None:
+                return None
+            ids |= arg_ids
+        return ids
+    if node[0] == "op" and node[1] == "=":
+        left, right = node[2], node[3]
+        if right == ("call", "RECORD_ID", ()):
+            left, right = right, left
+        if left == ("call", "RECORD_ID", ()) and right[0] == "lit":
+            return {str(right[1])}
+    return None
@@ -0,0 +1,45 @@
+"""
+Airtable Formula Helpers
+Построение формул filterByFormula для выборки записей на стороне Airtable
+"""
+from typing import Iterable, Iterator, List, Sequence, TypeVar
+
+from pyairtable.formulas import FIELD, FIND, OR, STR_VALUE, escape_quotes
+
+T = TypeVar("T")
+
+
+def chunked(items: Sequence[T], size: int) -> Iterator[Sequence[T]]:
+    """Разбивает последовательность на части по size элементов"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def record_id_in(record_ids: Iterable[str]) -> str:
+    """
+    Формула для выборки записей по списку ID
+
+    >>> record_id_in(["rec1", "rec2"])
+    "OR(RECORD_ID()='rec1',RECORD_ID()='rec2')"
+    """
+    conditions: List[str] = [
+        f"RECORD_ID()='{escape_quotes(record_id)}'" for record_id in record_ids
+    ]
+    return OR(*conditions)
+
+
+def linked_to_any(link_field: str, primary_values: Iterable[str]) -> str:
+    """
+    Формула для выборки записей, связанных с любой из указанных записей
+
+    ARRAYJOIN() по linked record полю возвращает primary field связанных
+    записей (а не их ID), поэтому фильтруем по primary значениям.
+    Разделитель '|' по краям даёт точное совпадение значения, а не подстроки.
+    Совпадение primary значений не гарантирует совпадение ID - результат
+    нужно дополнительно проверить по ID на стороне Python.
+    """
+    joined = f"'|'&ARRAYJOIN({FIELD(link_field)},'|')&'|'"
+    conditions: List[str] = [
+        FIND(STR_VALUE(f"|{value}|"), joined) for value in primary_values
+    ]
+    return OR(*conditions)
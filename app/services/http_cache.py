@@ -0,0 +1,78 @@
+"""
+HTTP Response Cache
+Кэш ответов GET с ETag и условными запросами (If-None-Match -> 304)
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse
+
+from app.services.cache import TTLCache
+
+# Клиент всегда перепроверяет ответ по ETag; повтор без изменений - 304 из кэша
+CACHE_CONTROL = "private, no-cache"
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """Готовое тело ответа и его ETag"""
+    body: Dict[str, Any]
+    etag: str
+
+
+def record_etag(*records: Dict[str, Any]) -> str:
+    """
+    Сильный ETag по записям Airtable
+
+    Учитывает id, createdTime и все поля записи (в том числе
+    last-modified поля, если они есть в таблице): любое изменение
+    записи или состава записей даёт новый ETag
+    """
+    digest = hashlib.sha1()
+    for record in records:
+        digest.update(json.dumps(
+            [record.get("id"), record.get("createdTime"), record.get("fields", {})],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        ).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Сравнение If-None-Match с ETag (слабое сравнение, RFC 9110)"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+async def get_or_load(
+    cache: TTLCache,
+    key: Hashable,
+    load: Callable[[], Awaitable[CachedResponse]]
+) -> CachedResponse:
+    """
+    Ответ из кэша, при промахе - load() и сохранение в кэш
+
+    Если во время load() запись изменили (invalidate), ответ отдаётся,
+    но не кэшируется: он мог быть загружен до изменения
+    """
+    cached = cache.get(key)
+    if cached is None:
+        generation = cache.generation(key)
+        cached = await load()
+        cache.set_if_current(key, cached, generation)
+    return cached
+
+
+def conditional_response(request: Request, cached: CachedResponse) -> Response:
+    """304 если у клиента актуальная версия, иначе JSON с ETag"""
+    headers = {"ETag": cached.etag, "Cache-Control": CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, cached.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse(cached.body, headers=headers)
@@ -0,0 +1,140 @@
+"""
+Recipe Ingredient Vectors
+Разреженные векторы ингредиентов рецептов для агрегации списка покупок
+
+Каждый рецепт - строка разреженной матрицы (CSR): столбец = пара
+(ingredient_id, каноническая единица), значение = количество на порцию.
+Единицы переводятся при построении (UnitConverter), поэтому "1 кг" и
+"200 гр" одного ингредиента попадают в один столбец.
+Список покупок плана - взвешенная сумма строк его рецептов (вес = порции),
+считается через np.bincount за O(строк выбранных рецептов).
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from app.services.pricing import PriceTable
+from app.services.units import UnitConverter, default_units
+
+IngredientKey = Tuple[str, Optional[str]]
+
+
+@dataclass
+class AggregatedLines:
+    """
+    Результат агрегации: параллельные массивы по строкам списка
+
+    columns - индексы в IngredientVectors.keys
+    unit_prices - EUR за каноническую единицу (NaN - цены нет), если цены известны
+    """
+    columns: np.ndarray
+    quantities: np.ndarray
+    recipe_counts: np.ndarray
+    unit_prices: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+
+class IngredientVectors:
+    """
+    Векторы ингредиентов всех рецептов (строится один раз на версию каталога)
+
+    >>> vectors = IngredientVectors.from_rows(catalog.all(RECIPE_INGREDIENTS))
+    >>> lines = vectors.aggregate({"recA": 2, "recB": 1})
+    """
+
+    def __init__(
+        self,
+        keys: List[IngredientKey],
+        recipe_rows: Dict[str, Tuple[int, int]],
+        columns: np.ndarray,
+        quantities: np.ndarray,
+        unit_prices: Optional[np.ndarray] = None
+    ):
+        self.keys = keys
+        self.recipe_rows = recipe_rows  # recipe_id -> (start, end) в columns/quantities
+        self.columns = columns
+        self.quantities = quantities
+        self.unit_prices = unit_prices  # цена за единицу по столбцам (NaN - нет цены)
+
+    @classmethod
+    def from_rows(
+        cls,
+        recipe_ingredients: Iterable[Dict],
+        units: UnitConverter = default_units,
+        prices: Optional[PriceTable] = None
+    ) -> "IngredientVectors":
+        """
+        Строит векторы из строк Recipe_Ingredients
+
+        prices: цены ингредиентов - сохраняются как столбец цен,
+        чтобы стоимость считалась вместе с агрегацией
+
+        Повторы одного ингредиента в рецепте суммируются, поэтому каждый
+        столбец встречается в строке рецепта не больше одного раза
+        """
+        key_index: Dict[IngredientKey, int] = {}
+        by_recipe: Dict[str, Dict[int, float]] = {}
+        for ri in recipe_ingredients:
+            fields = ri["fields"]
+            ingredient = fields.get("Ingredients")
+            if not ingredient:
+                continue
+            quantity, unit = units.convert(
+                ingredient[0], float(fields.get("Количество") or 0), fields.get("Единица измерения")
+            )
+            column = key_index.setdefault((ingredient[0], unit), len(key_index))
+            for recipe_id in fields.get("Recipes 2", []):
+                row = by_recipe.setdefault(recipe_id, {})
+                row[column] = row.get(column, 0.0) + quantity
+
+        recipe_rows: Dict[str, Tuple[int, int]] = {}
+        columns: List[int] = []
+        quantities: List[float] = []
+        for recipe_id, row in by_recipe.items():
+            start = len(columns)
+            columns.extend(row.keys())
+            quantities.extend(row.values())
+            recipe_rows[recipe_id] = (start, len(columns))
+
+        keys = list(key_index)
+        return cls(
+            keys=keys,
+            recipe_rows=recipe_rows,
+            columns=np.asarray(columns, dtype=np.int64),
+            quantities=np.asarray(quantities, dtype=np.float64),
+            unit_prices=prices.vector(keys) if prices is not None else None
+        )
+
+    def nnz(self, recipe_ids: Iterable[str]) -> int:
+        """Количество строк Recipe_Ingredients у указанных рецептов"""
+        return sum(end - start for start, end in map(self._row, recipe_ids))
+
+    def aggregate(self, servings: Mapping[str, float]) -> AggregatedLines:
+        """
+        Взвешенная сумма векторов рецептов
+
+        Args:
+            servings: recipe_id -> суммарное количество порций в плане
+        """
+        ranges = [self._row(recipe_id) for recipe_id in servings]
+        lengths = np.fromiter((end - start for start, end in ranges), dtype=np.int64, count=len(ranges))
+        if not lengths.sum():
+            empty = np.empty(0, dtype=np.int64)
+            return AggregatedLines(empty, np.empty(0), empty)
+
+        picked = np.concatenate([np.arange(start, end) for start, end in ranges])
+        columns = self.columns[picked]
+        weights = np.repeat(np.fromiter(servings.values(), dtype=np.float64, count=len(ranges)), lengths)
+
+        size = len(self.keys)
+        totals = np.bincount(columns, weights=self.quantities[picked] * weights, minlength=size)
+        counts = np.bincount(columns, minlength=size)
+        present = np.flatnonzero(counts)
+        unit_prices = self.unit_prices[present] if self.unit_prices is not None else None
+        return AggregatedLines(present, totals[present], counts[present], unit_prices)
+
+    def _row(self, recipe_id: str) -> Tuple[int, int]:
+        return self.recipe_rows.get(recipe_id, (0, 0))
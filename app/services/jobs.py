@@ -0,0 +1,221 @@
+"""
+Background Jobs
+Очередь фоновых задач для долгих пайплайнов (генерация списка покупок)
+
+- задачи хранятся в SQLite и переживают рестарт процесса
+- выполняются ограниченным пулом потоков
+- Idempotency-Key: повтор запроса с тем же ключом возвращает ту же задачу
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.config import JOB_MAX_PENDING, JOB_RETENTION_DAYS, JOB_WORKERS, JOBS_DB_PATH
+from app.services.progress import ProgressCallback
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Типы задач
+SHOPPING_LIST_JOB = "shopping_list.generate"
+
+# Обработчик задачи: (payload, on_progress) -> result
+JobHandler = Callable[[Dict[str, Any], ProgressCallback], Dict[str, Any]]
+
+
+class QueueFullError(Exception):
+    """Слишком много задач в очереди"""
+
+
+class IdempotencyConflictError(Exception):
+    """Idempotency-Key уже использован с другими параметрами"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobStore:
+    """SQLite хранилище задач"""
+
+    COLUMNS = (
+        "id", "kind", "payload", "status", "progress", "result", "error",
+        "idempotency_key", "created_at", "updated_at",
+    )
+    JSON_COLUMNS = ("payload", "progress", "result")
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL,"
+                " status TEXT NOT NULL, progress TEXT, result TEXT, error TEXT,"
+                " idempotency_key TEXT UNIQUE, created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    def _row_to_job(self, row: Optional[Tuple]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(zip(self.COLUMNS, row))
+        for column in self.JSON_COLUMNS:
+            job[column] = json.loads(job[column]) if job[column] else None
+        return job
+
+    def create(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        idempotency_key: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Создать задачу
+
+        Returns:
+            (задача, True если создана / False если найдена по idempotency_key)
+        """
+        with self._lock, self._conn:
+            if idempotency_key:
+                row = self._conn.execute(
+                    f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE idempotency_key = ?",
+                    (idempotency_key,)
+                ).fetchone()
+                if row is not None:
+                    job = self._row_to_job(row)
+                    if job["kind"] != kind or job["payload"] != payload:
+                        raise IdempotencyConflictError(
+                            f"Idempotency-Key {idempotency_key} was used with different parameters"
+                        )
+                    return job, False
+
+            pending = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchone()[0]
+            if pending >= JOB_MAX_PENDING:
+                raise QueueFullError(f"Job queue is full ({pending} pending jobs)")
+
+            now = _now()
+            job_id = f"job_{uuid.uuid4().hex}"
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, idempotency_key, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), QUEUED, idempotency_key, now, now)
+            )
+        return self.get(job_id), True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row_to_job(row)
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        """Обновить поля задачи (JSON поля сериализуются)"""
+        fields["updated_at"] = _now()
+        values = [
+            json.dumps(value, default=str) if name in self.JSON_COLUMNS and value is not None else value
+            for name, value in fields.items()
+        ]
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*values, job_id))
+
+    def ids_with_status(self, status: str) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (status,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def purge_finished(self, older_than: timedelta) -> int:
+        """Удалить завершённые задачи старше older_than"""
+        cutoff = (datetime.now(timezone.utc) - older_than).isoformat()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (SUCCEEDED, FAILED, cutoff)
+            )
+        return cursor.rowcount
+
+
+class JobQueue:
+    """Очередь задач поверх JobStore с ограниченным пулом исполнителей"""
+
+    def __init__(self, store: JobStore, handlers: Dict[str, JobHandler], workers: int = JOB_WORKERS):
+        self.store = store
+        self.handlers = handlers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job-worker")
+
+    def submit(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        idempotency_key: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Поставить задачу в очередь
+
+        Returns:
+            (задача, True если создана новая)
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job, created = self.store.create(kind, payload, idempotency_key)
+        if created:
+            self._executor.submit(self._run, job["id"])
+        return job, created
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def recover(self) -> None:
+        """
+        Восстановление после рестарта:
+        - queued задачи снова ставятся в пул
+        - running задачи помечаются failed: пайплайн мог успеть частично
+          записать данные, повторять его автоматически небезопасно
+        """
+        for job_id in self.store.ids_with_status(RUNNING):
+            self.store.update(job_id, status=FAILED, error="Interrupted by server restart")
+        queued = self.store.ids_with_status(QUEUED)
+        for job_id in queued:
+            self._executor.submit(self._run, job_id)
+        purged = self.store.purge_finished(timedelta(days=JOB_RETENTION_DAYS))
+        if queued or purged:
+            logger.info(f"Jobs recovered: {len(queued)} requeued, {purged} old jobs purged")
+
+    def _run(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        if job is None or job["status"] != QUEUED:
+            return
+        self.store.update(job_id, status=RUNNING)
+
+        def on_progress(event: str, data: Dict[str, Any]) -> None:
+            if event == "stage":
+                self.store.update(job_id, progress=data)
+
+        try:
+            result = self.handlers[job["kind"]](job["payload"], on_progress)
+            self.store.update(job_id, status=SUCCEEDED, result=result)
+            logger.info(f"Job {job_id} ({job['kind']}) succeeded")
+        except Exception as e:
+            logger.error(f"Job {job_id} ({job['kind']}) failed: {e}")
+            self.store.update(job_id, status=FAILED, error=str(e))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
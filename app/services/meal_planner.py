@@ -1,46 +1,247 @@
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Optional
+import time
+import zlib
+import numpy as np
 from .airtable import AirtableService
+from .cache import meal_plan_responses
+from .catalog import RECIPES, CatalogMirror, fresh_or_none
+from .optimizer import (
+    CALORIES,
+    CARBS,
+    DAILY_TARGETS,
+    FAT,
+    MEAL_SLOTS,
+    PROTEIN,
+    MealPlanOptimizer,
+    generate_plans,
+    recipes_to_matrix,
+)
+from .progress import PipelineProgress, ProgressCallback
+
+def plan_seed(user_id: str, week_start: datetime) -> int:
+    """Зерно подбора: разные планы для разных пользователей, повторяемые для одной недели"""
+    return zlib.crc32(f"{user_id}:{week_start.strftime('%Y-%m-%d')}".encode())
+
 
 class MealPlannerService:
     """Сервис для создания планов питания"""
     
-    def __init__(self, airtable: AirtableService):
+    def __init__(self, airtable: AirtableService, catalog: Optional[CatalogMirror] = None):
         self.airtable = airtable
+        self.catalog = catalog
     
     def create_weekly_meal_plan(
         self,
         user_id: str,
         week_start: datetime,
         plan_name: str = None,
-        notes: str = None
+        notes: str = None,
+        on_progress: Optional[ProgressCallback] = None
     ) -> Dict:
         """
         Создать план питания на неделю
         
+        on_progress: колбэк о завершении каждого шага и каждого батча
+            Planned_Meals (опционально)
+        
         Returns:
             dict: {
                 "meal_plan_id": str,
                 "plan_name": str,
                 "total_meals": int,
                 "avg_calories": float,
-                "avg_protein": float
+                "avg_protein": float,
+                "avg_fat": float,
+                "avg_carbs": float,
+                "stats": dict  # см. _calculate_plan_stats
             }
         """
+        progress = PipelineProgress("meal_plan", total_steps=5, callback=on_progress)
         
         # 1. Получить все доступные рецепты
-        recipes = self._get_available_recipes()
+        with progress.step(1, "recipes") as info:
+            recipes = self._get_available_recipes()
+            info["count"] = len(recipes)
         
         # 2. Сгенерировать оптимальный план
-        weekly_plan = self._generate_optimal_plan(recipes, week_start)
+        with progress.step(2, "optimize") as info:
+            macros = recipes_to_matrix(recipes)
+            weekly_plan = self._generate_optimal_plan(
+                recipes, week_start, macros, seed=plan_seed(user_id, week_start)
+            )
+            info["days"] = len(weekly_plan)
         
         # 3. Создать Meal Plan в Airtable
+        with progress.step(3, "create_plan") as info:
+            meal_plan_fields = self._meal_plan_fields(user_id, week_start, plan_name, notes)
+            plan_name = meal_plan_fields["Plan Name"]
+            week_end = week_start + timedelta(days=6)
+            
+            meal_plan = self.airtable.create_record("Meal_Plans", meal_plan_fields)
+            meal_plan_id = meal_plan["id"]
+            info["meal_plan_id"] = meal_plan_id
+        
+        # 4. Создать все Planned Meals (батчами)
+        with progress.step(4, "planned_meals") as info:
+            planned_meals = self._planned_meal_records(weekly_plan, meal_plan_id)
+            
+            # Создаём все приёмы пищи батчами (быстро!)
+            created_meals = self.airtable.create_records_batch(
+                "Planned_Meals",
+                planned_meals,
+                on_chunk=lambda index, records: progress.emit(
+                    "meals", {"chunk": index, "meals": records}
+                )
+            )
+            info["count"] = len(created_meals)
+            # План мог быть запрошен через GET до появления Planned_Meals
+            meal_plan_responses.invalidate(meal_plan_id)
+        
+        # 5. Рассчитать статистику (по макросам уже загруженных рецептов)
+        with progress.step(5, "stats"):
+            stats = self._calculate_plan_stats(weekly_plan, recipes, macros)
+        
+        return {
+            "meal_plan_id": meal_plan_id,
+            "plan_name": plan_name,
+            "week_start": week_start.strftime("%Y-%m-%d"),
+            "week_end": week_end.strftime("%Y-%m-%d"),
+            "total_meals": len(created_meals),
+            "avg_calories": stats["avg_calories"],
+            "avg_protein": stats["avg_protein"],
+            "avg_fat": stats["avg_fat"],
+            "avg_carbs": stats["avg_carbs"],
+            "stats": stats,
+            "status": "success"
+        }
+    
+    def create_bulk_meal_plans(
+        self,
+        user_ids: List[str],
+        week_starts: List[datetime],
+        notes: str = None
+    ) -> Dict:
+        """
+        Создать планы питания для нескольких пользователей и недель
+        
+        - каталог рецептов загружается один раз
+        - планы подбираются в пуле процессов (generate_plans)
+        - все Meal_Plans, затем все Planned_Meals пишутся общими
+          параллельными батчами
+        
+        Returns:
+            dict: {
+                "plans": [{"user_id", "week_start", "status", "meal_plan_id", ...}],
+                "total_plans", "succeeded", "partial", "failed", "total_meals",
+                "elapsed_seconds", "plans_per_second", "meals_per_second",
+                "timings_ms": {"catalog", "generate", "write_plans", "write_meals"}
+            }
+        """
+        started = time.perf_counter()
+        timings = {}
+        
+        # 1. Каталог рецептов - один раз на все планы
+        recipes = self._get_available_recipes()
+        if not recipes:
+            raise ValueError("Нет рецептов с заполненными БЖУ для составления плана")
+        macros = recipes_to_matrix(recipes)
+        timings["catalog"] = (time.perf_counter() - started) * 1000
+        
+        # 2. Подбор всех планов
+        step_started = time.perf_counter()
+        jobs = [(user_id, week_start) for user_id in user_ids for week_start in week_starts]
+        plans = generate_plans(macros, [plan_seed(user_id, week_start) for user_id, week_start in jobs])
+        weekly_plans = [
+            self._weekly_plan_from_indices(recipes, plan, week_start)
+            for plan, (_, week_start) in zip(plans, jobs)
+        ]
+        timings["generate"] = (time.perf_counter() - step_started) * 1000
+        
+        # 3. Все Meal_Plans одним батчевым потоком
+        step_started = time.perf_counter()
+        plan_fields = [
+            self._meal_plan_fields(user_id, week_start, None, notes)
+            for user_id, week_start in jobs
+        ]
+        created_plans = self.airtable.create_records_batch("Meal_Plans", plan_fields, fail_fast=False)
+        timings["write_plans"] = (time.perf_counter() - step_started) * 1000
+        
+        # 4. Все Planned_Meals успешно созданных планов
+        step_started = time.perf_counter()
+        planned_meals, owners = [], []
+        for i, (record, weekly_plan) in enumerate(zip(created_plans, weekly_plans)):
+            if record:
+                meals = self._planned_meal_records(weekly_plan, record["id"])
+                planned_meals.extend(meals)
+                owners.extend([i] * len(meals))
+        created_meals = self.airtable.create_records_batch("Planned_Meals", planned_meals, fail_fast=False)
+        timings["write_meals"] = (time.perf_counter() - step_started) * 1000
+        
+        meals_created = [0] * len(jobs)
+        for owner, meal in zip(owners, created_meals):
+            if meal:
+                meals_created[owner] += 1
+        for record in created_plans:
+            if record:
+                meal_plan_responses.invalidate(record["id"])
+        
+        # 5. Статус по каждому плану
+        results = []
+        for i, (user_id, week_start) in enumerate(jobs):
+            record = created_plans[i]
+            expected = sum(len(day["meals"]) for day in weekly_plans[i])
+            result = {
+                "user_id": user_id,
+                "week_start": week_start.strftime("%Y-%m-%d"),
+                "plan_name": plan_fields[i]["Plan Name"],
+                "meal_plan_id": record["id"] if record else None,
+                "total_meals": meals_created[i],
+                "status": "success",
+                "error": None
+            }
+            if not record:
+                result.update(status="failed", error="Не удалось создать запись Meal_Plans")
+            elif meals_created[i] < expected:
+                result.update(
+                    status="partial",
+                    error=f"Создано {meals_created[i]} из {expected} приёмов пищи"
+                )
+            if record:
+                stats = self._calculate_plan_stats(weekly_plans[i], recipes, macros)
+                result.update(avg_calories=stats["avg_calories"], avg_protein=stats["avg_protein"])
+            results.append(result)
+        
+        elapsed = time.perf_counter() - started
+        total_meals = sum(meals_created)
+        statuses = [r["status"] for r in results]
+        return {
+            "plans": results,
+            "total_plans": len(results),
+            "succeeded": statuses.count("success"),
+            "partial": statuses.count("partial"),
+            "failed": statuses.count("failed"),
+            "total_meals": total_meals,
+            "elapsed_seconds": round(elapsed, 3),
+            "plans_per_second": round(len(results) / elapsed, 2) if elapsed else None,
+            "meals_per_second": round(total_meals / elapsed, 2) if elapsed else None,
+            "timings_ms": {name: round(value, 1) for name, value in timings.items()}
+        }
+    
+    def _meal_plan_fields(
+        self,
+        user_id: str,
+        week_start: datetime,
+        plan_name: Optional[str],
+        notes: Optional[str]
+    ) -> Dict:
+        """Поля записи Meal_Plans"""
         week_end = week_start + timedelta(days=6)
         
         if not plan_name:
             plan_name = f"Week {week_start.strftime('%d %b')} - {week_end.strftime('%d %b')}"
         
-        meal_plan_fields = {
+        return {
             "Plan Name": plan_name,
             "User": [user_id],
             "Week Start": week_start.strftime("%Y-%m-%d"),
@@ -48,11 +249,9 @@ class MealPlannerService:
             "Status": "Active",
             "Notes": notes or "Auto-generated meal plan optimized for camper living"
         }
-        
-        meal_plan = self.airtable.create_record("Meal_Plans", meal_plan_fields)
-        meal_plan_id = meal_plan["id"]
-        
-        # 4. Создать все Planned Meals (батчами)
+    
+    def _planned_meal_records(self, weekly_plan: List[Dict], meal_plan_id: str) -> List[Dict]:
+        """Поля записей Planned_Meals для плана"""
         planned_meals = []
         for day_plan in weekly_plan:
             for meal in day_plan["meals"]:
@@ -64,27 +263,15 @@ class MealPlannerService:
                     "Meal Type": meal["type"],
                     "Servings": 1.0
                 })
-        
-        # Создаём все приёмы пищи батчами (быстро!)
-        created_meals = self.airtable.create_records_batch("Planned_Meals", planned_meals)
-        
-        # 5. Рассчитать статистику
-        stats = self._calculate_plan_stats(weekly_plan)
-        
-        return {
-            "meal_plan_id": meal_plan_id,
-            "plan_name": plan_name,
-            "week_start": week_start.strftime("%Y-%m-%d"),
-            "week_end": week_end.strftime("%Y-%m-%d"),
-            "total_meals": len(created_meals),
-            "avg_calories": stats["avg_calories"],
-            "avg_protein": stats["avg_protein"],
-            "status": "success"
-        }
+        return planned_meals
     
     def _get_available_recipes(self) -> List[Dict]:
-        """Получить все рецепты из Airtable"""
-        recipes = self.airtable.get_all_records("Recipes")
+        """Получить все рецепты (из зеркала каталога, иначе из Airtable)"""
+        catalog = fresh_or_none(self.catalog)
+        if catalog:
+            recipes = catalog.all(RECIPES)
+        else:
+            recipes = self.airtable.get_all_records("Recipes")
         
         # Фильтруем только те, у которых есть БЖУ
         filtered = []
@@ -105,7 +292,13 @@ class MealPlannerService:
         
         return filtered
     
-    def _generate_optimal_plan(self, recipes: List[Dict], week_start: datetime) -> List[Dict]:
+    def _generate_optimal_plan(
+        self,
+        recipes: List[Dict],
+        week_start: datetime,
+        macros: Optional[np.ndarray] = None,
+        seed: Optional[int] = None
+    ) -> List[Dict]:
         """
         Генерация оптимального плана питания
         
@@ -115,66 +308,37 @@ class MealPlannerService:
         - Ужин: 550-750 kcal, 50-70g protein
         - Снек 1: 250-350 kcal, 20-40g protein
         - Снек 2: 200-300 kcal, 20-45g protein
-        """
-        
-        # Разделяем рецепты по типам (по калориям и белку)
-        breakfasts = [r for r in recipes if 500 <= r["calories"] <= 800 and r["protein"] >= 35]
-        lunches = [r for r in recipes if 650 <= r["calories"] <= 800 and r["protein"] >= 45]
-        dinners = [r for r in recipes if 500 <= r["calories"] <= 800 and r["protein"] >= 45]
-        snacks = [r for r in recipes if 150 <= r["calories"] <= 400 and r["protein"] >= 15]
         
+        Подбор выполняет MealPlanOptimizer по матрице макросов рецептов
+        (попадание в диапазоны + штраф за повторы рецептов)
+        """
+        if macros is None:
+            macros = recipes_to_matrix(recipes)
+        if seed is None:
+            seed = week_start.toordinal()
+        plan = MealPlanOptimizer(macros, seed=seed).plan(days=7)
+        return self._weekly_plan_from_indices(recipes, plan, week_start)
+    
+    def _weekly_plan_from_indices(
+        self,
+        recipes: List[Dict],
+        plan: np.ndarray,
+        week_start: datetime
+    ) -> List[Dict]:
+        """Матрица индексов рецептов (дни x слоты) -> план по дням"""
         weekly_plan = []
         
         for day_offset in range(7):
             current_date = week_start + timedelta(days=day_offset)
             date_str = current_date.strftime("%Y-%m-%d")
             
-            # Выбираем блюда (с ротацией чтобы избежать повторений)
-            breakfast = breakfasts[day_offset % len(breakfasts)] if breakfasts else None
-            lunch = lunches[day_offset % len(lunches)] if lunches else None
-            dinner = dinners[day_offset % len(dinners)] if dinners else None
-            snack1 = snacks[(day_offset * 2) % len(snacks)] if snacks else None
-            snack2 = snacks[(day_offset * 2 + 1) % len(snacks)] if snacks else None
-            
             day_meals = []
-            
-            if breakfast:
+            for slot, recipe_index in zip(MEAL_SLOTS, plan[day_offset]):
+                recipe = recipes[recipe_index]
                 day_meals.append({
-                    "name": f"Завтрак: {breakfast['name']}",
-                    "recipe_id": breakfast["id"],
-                    "type": "Breakfast",
-                    "date": date_str
-                })
-            
-            if lunch:
-                day_meals.append({
-                    "name": f"Обед: {lunch['name']}",
-                    "recipe_id": lunch["id"],
-                    "type": "Lunch",
-                    "date": date_str
-                })
-            
-            if dinner:
-                day_meals.append({
-                    "name": f"Ужин: {dinner['name']}",
-                    "recipe_id": dinner["id"],
-                    "type": "Dinner",
-                    "date": date_str
-                })
-            
-            if snack1:
-                day_meals.append({
-                    "name": f"Перекус 1: {snack1['name']}",
-                    "recipe_id": snack1["id"],
-                    "type": "Snack",
-                    "date": date_str
-                })
-            
-            if snack2:
-                day_meals.append({
-                    "name": f"Перекус 2: {snack2['name']}",
-                    "recipe_id": snack2["id"],
-                    "type": "Snack",
+                    "name": f"{slot.label}: {recipe['name']}",
+                    "recipe_id": recipe["id"],
+                    "type": slot.meal_type,
                     "date": date_str
                 })
             
@@ -185,16 +349,59 @@ class MealPlannerService:
         
         return weekly_plan
     
-    def _calculate_plan_stats(self, weekly_plan: List[Dict]) -> Dict:
-        """Рассчитать статистику плана"""
+    def _calculate_plan_stats(
+        self,
+        weekly_plan: List[Dict],
+        recipes: List[Dict],
+        macros: Optional[np.ndarray] = None
+    ) -> Dict:
+        """
+        Рассчитать статистику плана по макросам рецептов
+        
+        Считается локально по матрице макросов (без запросов к Airtable):
+        суммы по дням и за неделю, средние за день и отклонение от целей
+        """
+        if macros is None:
+            macros = recipes_to_matrix(recipes)
+        index = {recipe["id"]: i for i, recipe in enumerate(recipes)}
+        columns = [CALORIES, PROTEIN, FAT, CARBS]
+        names = ["calories", "protein", "fat", "carbs"]
+        
+        # (дни x макросы): суммы выбранных рецептов по каждому дню
+        daily = np.zeros((len(weekly_plan), len(columns)))
+        for d, day in enumerate(weekly_plan):
+            rows = [index[meal["recipe_id"]] for meal in day["meals"] if meal["recipe_id"] in index]
+            if rows:
+                daily[d] = macros[rows][:, columns].sum(axis=0)
+        
         total_days = len(weekly_plan)
         total_meals = sum(len(day["meals"]) for day in weekly_plan)
+        weekly = daily.sum(axis=0)
+        average = weekly / total_days if total_days else weekly
+        targets = np.array([DAILY_TARGETS["calories"], DAILY_TARGETS["protein"]])
+        deviation = daily[:, :2] - targets
+        
+        daily_stats = [
+            {
+                "date": day["date"],
+                **{name: round(float(value), 1) for name, value in zip(names, daily[d])},
+                "calories_deviation": round(float(deviation[d, 0]), 1),
+                "protein_deviation": round(float(deviation[d, 1]), 1),
+            }
+            for d, day in enumerate(weekly_plan)
+        ]
         
-        # Для упрощения возвращаем примерные средние значения
-        # В реальности нужно суммировать из рецептов
         return {
-            "avg_calories": 2750,  # Среднее из нашего плана
-            "avg_protein": 210,     # Среднее из нашего плана
+            "avg_calories": round(float(average[0]), 1),
+            "avg_protein": round(float(average[1]), 1),
+            "avg_fat": round(float(average[2]), 1),
+            "avg_carbs": round(float(average[3]), 1),
             "total_days": total_days,
-            "total_meals": total_meals
+            "total_meals": total_meals,
+            "weekly_totals": {name: round(float(value), 1) for name, value in zip(names, weekly)},
+            "daily_targets": {name: round(value, 1) for name, value in DAILY_TARGETS.items()},
+            # Среднее абсолютное отклонение дня от цели
+            "avg_calories_deviation": round(float(np.abs(deviation[:, 0]).mean()), 1) if total_days else 0.0,
+            "avg_protein_deviation": round(float(np.abs(deviation[:, 1]).mean()), 1) if total_days else 0.0,
+            "daily": daily_stats
         }
@@ -0,0 +1,183 @@
+"""
+Metrics
+Счётчики и гистограммы в текстовом формате Prometheus (без prometheus_client)
+
+- шаги пайплайнов: PipelineProgress.step -> pipeline_stage_seconds
+- запросы Airtable: ScheduledApi -> airtable_requests_total,
+  airtable_request_seconds (по таблице и операции)
+- снимки состояния (очереди планировщика) - коллекторы, вызываемые при scrape
+
+METRICS_ENABLED=false (по умолчанию): observe / inc сразу возвращаются,
+замеры в горячем пути не выполняются.
+"""
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from app.config import METRICS_ENABLED
+
+Labels = Tuple[str, ...]
+# Коллектор: строки сэмплов (name, labels, value) на момент scrape
+Collector = Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]
+
+# Секунды: от быстрых шагов по каталогу до батчевой записи сотен записей
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+enabled = METRICS_ENABLED
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Монотонный счётчик с метками"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        if not enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            values = dict(self._values)
+        return [(self.name, dict(zip(self.labelnames, labels)), value) for labels, value in sorted(values.items())]
+
+
+class Histogram:
+    """Гистограмма (кумулятивные бакеты, _sum и _count, как в Prometheus)"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counts: Dict[Labels, List[int]] = {}  # по бакетам (не кумулятивно) + +Inf
+        self._sums: Dict[Labels, float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(labels)
+            if counts is None:
+                counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._sums[labels] = self._sums.get(labels, 0.0) + value
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            counts = {labels: list(values) for labels, values in self._counts.items()}
+            sums = dict(self._sums)
+        samples = []
+        for labels, values in sorted(counts.items()):
+            names = dict(zip(self.labelnames, labels))
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                total += count
+                samples.append((f"{self.name}_bucket", {**names, "le": _format_value(bound)}, total))
+            samples.append((f"{self.name}_sum", names, sums[labels]))
+            samples.append((f"{self.name}_count", names, total))
+        return samples
+
+
+_metrics: List = []
+_collectors: List[Tuple[str, str, str, Collector]] = []
+_registry_lock = threading.Lock()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Создать и зарегистрировать счётчик"""
+    metric = Counter(name, documentation, labelnames)
+    with _registry_lock:
+        _metrics.append(metric)
+    return metric
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS
+) -> Histogram:
+    """Создать и зарегистрировать гистограмму"""
+    metric = Histogram(name, documentation, labelnames, buckets)
+    with _registry_lock:
+        _metrics.append(metric)
+    return metric
+
+
+def register_collector(name: str, kind: str, documentation: str, collect: Collector) -> None:
+    """
+    Метрика, значения которой снимаются при каждом scrape
+    (например глубина очередей планировщика)
+    """
+    with _registry_lock:
+        _collectors.append((name, kind, documentation, collect))
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus 0.0.4"""
+    with _registry_lock:
+        metrics = list(_metrics)
+        collectors = list(_collectors)
+    lines = []
+    families = [(m.name, m.kind, m.documentation, m.samples) for m in metrics]
+    families += [(name, kind, documentation, collect) for name, kind, documentation, collect in collectors]
+    for name, kind, documentation, samples in families:
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample_name, labels, value in samples():
+            lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# Метрики приложения
+
+pipeline_stage_seconds = histogram(
+    "pipeline_stage_seconds",
+    "Duration of pipeline steps (meal_plan, shopping_list, ...)",
+    ("pipeline", "stage"),
+)
+airtable_requests_total = counter(
+    "airtable_requests_total",
+    "Airtable HTTP requests by table, operation and status (each retry counts)",
+    ("table", "operation", "status"),
+)
+airtable_request_seconds = histogram(
+    "airtable_request_seconds",
+    "Airtable HTTP request latency by table and operation (without scheduler wait)",
+    ("table", "operation"),
+)
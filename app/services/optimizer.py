@@ -0,0 +1,205 @@
+"""
+Meal Plan Optimizer
+Подбор рецептов на неделю под целевые калории/белок каждого приёма пищи
+
+Рецепты представлены матрицей макросов (N x 5), стоимость каждого рецепта
+для каждого слота считается векторно, поэтому подбор 35 приёмов пищи
+занимает миллисекунды даже для каталога из десятков тысяч рецептов.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import BULK_PLAN_WORKERS, BULK_PROCESS_POOL_MIN_PLANS
+
+# Колонки матрицы макросов
+MACRO_COLUMNS = ("calories", "protein", "fat", "carbs", "prep_time")
+CALORIES, PROTEIN, FAT, CARBS, PREP_TIME = range(len(MACRO_COLUMNS))
+
+
+@dataclass(frozen=True)
+class MealSlot:
+    """Приём пищи с целевыми диапазонами"""
+    label: str  # префикс названия в Planned_Meals
+    meal_type: str  # значение поля Meal Type
+    calories: Tuple[float, float]
+    protein: Tuple[float, float]
+
+
+# Целевые диапазоны приёмов пищи на день
+MEAL_SLOTS: Tuple[MealSlot, ...] = (
+    MealSlot("Завтрак", "Breakfast", (550, 700), (40, 55)),
+    MealSlot("Обед", "Lunch", (650, 800), (50, 75)),
+    MealSlot("Ужин", "Dinner", (550, 750), (50, 70)),
+    MealSlot("Перекус 1", "Snack", (250, 350), (20, 40)),
+    MealSlot("Перекус 2", "Snack", (200, 300), (20, 45)),
+)
+
+# Дневные цели: сумма середин диапазонов всех приёмов пищи
+DAILY_TARGETS = {
+    "calories": sum(sum(slot.calories) / 2 for slot in MEAL_SLOTS),
+    "protein": sum(sum(slot.protein) / 2 for slot in MEAL_SLOTS),
+}
+
+# Веса функции стоимости
+VARIETY_PENALTY = 0.35  # за каждое предыдущее использование рецепта в неделе
+SAME_DAY_PENALTY = 10.0  # повтор рецепта в тот же день
+PREP_TIME_WEIGHT = 0.002  # за минуту готовки (мягкое предпочтение быстрых блюд)
+IMPROVEMENT_PASSES = 2  # проходы локального улучшения после жадного подбора
+
+
+def recipes_to_matrix(recipes: Sequence[Dict]) -> np.ndarray:
+    """Матрица макросов (N x 5) из списка рецептов _get_available_recipes()"""
+    if not recipes:
+        return np.zeros((0, len(MACRO_COLUMNS)))
+    return np.array(
+        [[recipe.get(column) or 0 for column in MACRO_COLUMNS] for recipe in recipes],
+        dtype=np.float64
+    )
+
+
+def _range_deviation(values: np.ndarray, bounds: Tuple[float, float]) -> np.ndarray:
+    """Насколько значения выходят за диапазон, в долях ширины диапазона"""
+    low, high = bounds
+    width = max(high - low, 1.0)
+    return (np.maximum(low - values, 0) + np.maximum(values - high, 0)) / width
+
+
+def slot_costs(macros: np.ndarray, slots: Sequence[MealSlot] = MEAL_SLOTS) -> np.ndarray:
+    """
+    Базовая стоимость каждого рецепта для каждого слота (S x N)
+
+    0 - рецепт попадает в оба диапазона слота (калории и белок)
+    """
+    costs = np.empty((len(slots), macros.shape[0]))
+    for s, slot in enumerate(slots):
+        costs[s] = (
+            _range_deviation(macros[:, CALORIES], slot.calories)
+            + _range_deviation(macros[:, PROTEIN], slot.protein)
+            + PREP_TIME_WEIGHT * macros[:, PREP_TIME]
+        )
+    return costs
+
+
+class MealPlanOptimizer:
+    """
+    Подбирает рецепты на несколько дней
+
+    1. Жадно заполняет слоты по дням: минимальная стоимость слота
+       плюс штраф за повторы рецептов в неделе и в тот же день
+    2. Несколько проходов локального улучшения: каждый слот
+       перевыбирается с учётом всех остальных выбранных рецептов
+    """
+
+    def __init__(
+        self,
+        macros: np.ndarray,
+        slots: Sequence[MealSlot] = MEAL_SLOTS,
+        seed: Optional[int] = None
+    ):
+        self.macros = macros
+        self.slots = tuple(slots)
+        self.base_costs = slot_costs(macros, self.slots)
+        self.rng = np.random.default_rng(seed)
+
+    def plan(self, days: int = 7, seed: Optional[int] = None) -> np.ndarray:
+        """
+        Args:
+            days: количество дней
+            seed: новое зерно случайности (для нескольких планов одним оптимизатором)
+        
+        Returns:
+            матрица индексов рецептов (days x slots)
+        """
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        n_recipes = self.macros.shape[0]
+        n_slots = len(self.slots)
+        if n_recipes == 0:
+            return np.zeros((days, 0), dtype=np.int64)
+
+        # Небольшой шум разводит равные по стоимости рецепты между неделями
+        noise = self.rng.random((days, n_slots, n_recipes)) * 1e-3
+        usage = np.zeros(n_recipes)
+        plan = np.empty((days, n_slots), dtype=np.int64)
+
+        for day in range(days):
+            for s in range(n_slots):
+                plan[day, s] = self._pick(day, s, plan[day, :s], usage, noise)
+                usage[plan[day, s]] += 1
+
+        for _ in range(IMPROVEMENT_PASSES):
+            changed = False
+            for day in range(days):
+                for s in range(n_slots):
+                    current = plan[day, s]
+                    usage[current] -= 1
+                    others = np.delete(plan[day], s)
+                    best = self._pick(day, s, others, usage, noise)
+                    usage[best] += 1
+                    if best != current:
+                        plan[day, s] = best
+                        changed = True
+            if not changed:
+                break
+
+        return plan
+
+    def _pick(
+        self,
+        day: int,
+        slot: int,
+        same_day: np.ndarray,
+        usage: np.ndarray,
+        noise: np.ndarray
+    ) -> int:
+        """Рецепт с минимальной стоимостью для слота"""
+        cost = self.base_costs[slot] + VARIETY_PENALTY * usage + noise[day, slot]
+        if same_day.size:
+            cost[same_day] += SAME_DAY_PENALTY
+        return int(np.argmin(cost))
+
+
+# --- Генерация многих планов (пул процессов) ---
+
+_worker_optimizer: Optional[MealPlanOptimizer] = None
+
+
+def _init_worker(macros: np.ndarray) -> None:
+    """Инициализация процесса пула: матрица макросов передаётся один раз"""
+    global _worker_optimizer
+    _worker_optimizer = MealPlanOptimizer(macros)
+
+
+def _plan_in_worker(seed: int, days: int) -> np.ndarray:
+    return _worker_optimizer.plan(days=days, seed=seed)
+
+
+def generate_plans(
+    macros: np.ndarray,
+    seeds: Sequence[int],
+    days: int = 7,
+    workers: int = BULK_PLAN_WORKERS
+) -> List[np.ndarray]:
+    """
+    Подобрать по плану на каждое зерно
+
+    Небольшие пакеты считаются в текущем процессе (старт пула дороже),
+    крупные - в пуле процессов, порядок результатов сохраняется.
+    """
+    if workers <= 1 or len(seeds) < BULK_PROCESS_POOL_MIN_PLANS:
+        optimizer = MealPlanOptimizer(macros)
+        return [optimizer.plan(days=days, seed=seed) for seed in seeds]
+
+    # spawn: форк многопоточного сервера небезопасен
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(macros,)
+    ) as pool:
+        chunksize = max(1, len(seeds) // (workers * 4))
+        return list(pool.map(_plan_in_worker, seeds, [days] * len(seeds), chunksize=chunksize))
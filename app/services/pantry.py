@@ -0,0 +1,184 @@
+"""
+Pantry Inventory
+Запасы продуктов (таблица Pantry) и вычитание их из списка покупок
+
+Записи Pantry: Ingredient (ссылка на Ingredients), Quantity, Unit и
+Reserved - количество, уже зарезервированное под другие планы.
+Таблица кэшируется локально на PANTRY_CACHE_TTL секунд.
+
+Список покупок хранит свои резервы (record_id -> количество в единицах
+записи) в поле SHOPPING_LIST_PANTRY_FIELD, чтобы при пересчёте списка
+его собственный резерв считался доступным, а не занятым.
+"""
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import PANTRY_CACHE_TTL
+from app.services.batch_writer import batch_writer
+from app.services.units import UnitConverter
+
+logger = logging.getLogger(__name__)
+
+PANTRY_FIELDS = ['Ingredient', 'Quantity', 'Unit', 'Reserved']
+
+PantryKey = Tuple[str, Optional[str]]
+Reservations = Dict[str, float]
+
+
+def parse_reservations(value: Any) -> Reservations:
+    """Резервы списка из поля SHOPPING_LIST_PANTRY_FIELD (пусто или не JSON - {})"""
+    if not value:
+        return {}
+    try:
+        return {record_id: float(quantity) for record_id, quantity in json.loads(value).items()}
+    except (ValueError, TypeError, AttributeError):
+        logger.warning(f"Invalid pantry reservations: {value!r}")
+        return {}
+
+
+def format_reservations(reservations: Reservations) -> str:
+    """Резервы списка для поля SHOPPING_LIST_PANTRY_FIELD ('' - резервов нет)"""
+    reservations = {record_id: round(quantity, 3) for record_id, quantity in reservations.items() if quantity > 0}
+    return json.dumps(reservations, sort_keys=True) if reservations else ''
+
+
+@dataclass
+class _Stock:
+    """Запас по (ingredient_id, каноническая единица)"""
+    available: float = 0.0
+    # (record_id, доступно в канонической единице, канонических единиц в одной единице записи)
+    rows: List[Tuple[str, float, float]] = field(default_factory=list)
+
+
+@dataclass
+class PantryResult:
+    """Результат вычитания запасов"""
+    ingredients: List[Dict]  # что осталось купить
+    used: List[Dict]  # что взято из запасов
+    reservations: Reservations = field(default_factory=dict)  # record_id -> +Reserved
+
+
+class PantryIndex:
+    """
+    Индекс запасов по (ingredient_id, каноническая единица)
+
+    Единицы записей Pantry переводятся тем же UnitConverter, что и
+    рецепты, поэтому "1 кг" в запасах вычитается из "300 г" в списке
+
+    released: резервы пересчитываемого списка - снова считаются свободными
+    """
+
+    def __init__(self, records: List[Dict], units: UnitConverter, released: Optional[Reservations] = None):
+        released = released or {}
+        self._stock: Dict[PantryKey, _Stock] = {}
+        for record in records:
+            fields = record['fields']
+            ingredient = fields.get('Ingredient')
+            if not ingredient:
+                continue
+            reserved = max(float(fields.get('Reserved') or 0) - released.get(record['id'], 0.0), 0.0)
+            free = float(fields.get('Quantity') or 0) - reserved
+            if free <= 0:
+                continue
+            per_unit, unit = units.convert(ingredient[0], 1.0, fields.get('Unit'))
+            stock = self._stock.setdefault((ingredient[0], unit), _Stock())
+            stock.available += free * per_unit
+            stock.rows.append((record['id'], free * per_unit, per_unit))
+
+    def __len__(self) -> int:
+        return len(self._stock)
+
+    def subtract(self, ingredients: List[Dict]) -> PantryResult:
+        """
+        Вычитает запасы из агрегированных ингредиентов (один проход, O(строк))
+
+        Строки, полностью покрытые запасами, убираются из списка
+        """
+        result = PantryResult(ingredients=[], used=[])
+        for ing in ingredients:
+            stock = self._stock.get((ing['ingredient_id'], ing['unit']))
+            if stock is None or stock.available <= 0:
+                result.ingredients.append(ing)
+                continue
+
+            taken = min(stock.available, ing['quantity'])
+            result.used.append({
+                'ingredient_id': ing['ingredient_id'],
+                'ingredient_name': ing['ingredient_name'],
+                'quantity': taken,
+                'unit': ing['unit']
+            })
+            self._reserve(stock, taken, result.reservations)
+            remaining = ing['quantity'] - taken
+            if remaining > 0:
+                result.ingredients.append({**ing, 'quantity': remaining})
+        return result
+
+    def _reserve(self, stock: _Stock, quantity: float, reservations: Reservations) -> None:
+        """Списывает quantity с записей запаса по порядку (в единицах записи)"""
+        stock.available -= quantity
+        for i, (record_id, free, per_unit) in enumerate(stock.rows):
+            if quantity <= 0:
+                break
+            taken = min(free, quantity)
+            if taken <= 0:
+                continue
+            stock.rows[i] = (record_id, free - taken, per_unit)
+            reservations[record_id] = reservations.get(record_id, 0) + taken / per_unit
+            quantity -= taken
+
+
+class Pantry:
+    """Запасы из Airtable с локальной копией на PANTRY_CACHE_TTL секунд"""
+
+    def __init__(self, get_table: Callable[[], Any], ttl: float = PANTRY_CACHE_TTL):
+        self._get_table = get_table
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._records: Optional[Dict[str, Dict]] = None
+        self._loaded_at = 0.0
+
+    def records(self) -> List[Dict]:
+        """Записи Pantry (из локальной копии, если она свежая)"""
+        with self._lock:
+            if self._records is None or time.monotonic() - self._loaded_at > self.ttl:
+                records = self._get_table().all(fields=PANTRY_FIELDS)
+                self._records = {record['id']: record for record in records}
+                self._loaded_at = time.monotonic()
+            return list(self._records.values())
+
+    def index(self, units: UnitConverter, released: Optional[Reservations] = None) -> PantryIndex:
+        return PantryIndex(self.records(), units, released)
+
+    def reserve(self, reservations: Reservations) -> None:
+        """
+        Резервирует запасы под план: увеличивает Reserved у записей Pantry
+        (отрицательное количество - освобождает резерв)
+
+        Локальная копия обновляется сразу, чтобы следующий список
+        не рассчитывал на те же продукты
+        """
+        records = {record['id']: record for record in self.records()} if reservations else {}
+        updates = []
+        for record_id, quantity in reservations.items():
+            if abs(quantity) < 1e-9:
+                continue
+            if record_id not in records:
+                logger.warning(f"Pantry record {record_id} not found, reservation skipped")
+                continue
+            reserved = max(float(records[record_id]['fields'].get('Reserved') or 0) + quantity, 0.0)
+            updates.append({'id': record_id, 'fields': {'Reserved': round(reserved, 3)}})
+        if not updates:
+            return
+
+        result = batch_writer.batch_update(self._get_table(), updates)
+        with self._lock:
+            if self._records is not None:
+                for record in result.records:
+                    if record['id'] in self._records:
+                        self._records[record['id']]['fields'].update(record['fields'])
+        logger.info(f"Pantry reserved: {len(updates)} records")
@@ -0,0 +1,97 @@
+"""
+Ingredient Pricing
+Цены ингредиентов в пересчёте на каноническую единицу и оценка стоимости
+
+Цена берётся из таблицы Ingredients: поле INGREDIENT_PRICE_FIELD (EUR)
+за количество из INGREDIENT_PRICE_UNIT_FIELD ("кг", "л", "шт", "100 г").
+Цена переводится в EUR за каноническую единицу (г / мл / шт) тем же
+UnitConverter, что и рецепты, поэтому стоимость строки - одно умножение.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import INGREDIENT_PRICE_FIELD, INGREDIENT_PRICE_UNIT_FIELD
+from app.services.units import UnitConverter
+
+PriceKey = Tuple[str, Optional[str]]
+
+_PRICE_UNIT_RE = re.compile(r"^\s*(\d+(?:[.,]\d+)?)?\s*(.+?)\s*$")
+
+
+def parse_price_unit(text: str) -> Tuple[float, str]:
+    """ "100 г" -> (100.0, "г"), "кг" -> (1.0, "кг") """
+    match = _PRICE_UNIT_RE.match(text)
+    amount, unit = match.group(1), match.group(2)
+    return (float(amount.replace(",", ".")) if amount else 1.0), unit
+
+
+class PriceTable:
+    """
+    Цены ингредиентов: (ingredient_id, каноническая единица) -> EUR за единицу
+
+    Строится из кэшированного каталога, запросов к Airtable не делает
+    """
+
+    def __init__(self, prices: Dict[PriceKey, float], units: UnitConverter):
+        self.prices = prices
+        self.units = units
+
+    @classmethod
+    def from_ingredients(cls, ingredients: Iterable[Dict], units: UnitConverter) -> "PriceTable":
+        prices = {}
+        for record in ingredients:
+            fields = record["fields"]
+            price = fields.get(INGREDIENT_PRICE_FIELD)
+            price_unit = fields.get(INGREDIENT_PRICE_UNIT_FIELD)
+            if price is None or not price_unit:
+                continue
+            amount, unit = parse_price_unit(str(price_unit))
+            quantity, canonical = units.convert(record["id"], amount, unit)
+            if quantity > 0:
+                prices[(record["id"], canonical)] = float(price) / quantity
+        return cls(prices, units)
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def unit_price(self, ingredient_id: str, unit: Optional[str]) -> Optional[float]:
+        """Цена за каноническую единицу (None - цены нет)"""
+        return self.prices.get((ingredient_id, unit))
+
+    def cost(self, ingredient_id: str, quantity: float, unit: Optional[str]) -> Optional[float]:
+        """Стоимость количества в любой известной единице"""
+        quantity, canonical = self.units.convert(ingredient_id, quantity, unit)
+        price = self.unit_price(ingredient_id, canonical)
+        return quantity * price if price is not None else None
+
+    def vector(self, keys: List[PriceKey]) -> np.ndarray:
+        """Цены, выровненные по столбцам IngredientVectors (NaN - цены нет)"""
+        return np.fromiter(
+            (self.prices.get(key, np.nan) for key in keys),
+            dtype=np.float64,
+            count=len(keys)
+        )
+
+
+def estimate_costs(lines: List[Dict]) -> Dict:
+    """
+    Стоимость строк списка (по полю unit_price, EUR за каноническую единицу)
+
+    Добавляет в строки estimated_cost; возвращает итог и число строк без цены
+    """
+    total = 0.0
+    priced = 0
+    for line in lines:
+        price = line.get('unit_price')
+        if price is None:
+            line['estimated_cost'] = None
+            continue
+        line['estimated_cost'] = round(line['quantity'] * price, 2)
+        total += line['estimated_cost']
+        priced += 1
+    return {
+        "estimated_cost": round(total, 2) if priced else None,
+        "unpriced_items": len(lines) - priced,
+    }
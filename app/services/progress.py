@@ -0,0 +1,60 @@
+"""
+Pipeline Progress
+Отчёт о шагах многошаговых пайплайнов (генерация плана / списка покупок)
+"""
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from app.services import metrics
+
+# Колбэк: (событие, данные), например ("stage", {"step": 2, "stage": "planned_meals", ...})
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+
+class PipelineProgress:
+    """
+    Замеряет шаги пайплайна и сообщает о каждом завершённом шаге
+
+    >>> progress = PipelineProgress("shopping_list", total_steps=7, callback=print)
+    >>> with progress.step(1, "meal_plan"):
+    ...     meal_plan = get_meal_plan()
+    """
+
+    def __init__(
+        self,
+        pipeline: str,
+        total_steps: int,
+        callback: Optional[ProgressCallback] = None
+    ):
+        self.pipeline = pipeline
+        self.total_steps = total_steps
+        self.callback = callback
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def step(self, number: int, stage: str, **details: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Шаг пайплайна; в yield-нутый dict можно добавить детали
+        (например количество загруженных записей)
+        """
+        step_started = time.perf_counter()
+        info: Dict[str, Any] = dict(details)
+        yield info
+        elapsed_ms = (time.perf_counter() - step_started) * 1000
+        self.timings[stage] = round(elapsed_ms, 1)
+        metrics.pipeline_stage_seconds.observe(elapsed_ms / 1000, self.pipeline, stage)
+        self.emit("stage", {
+            "step": number,
+            "total_steps": self.total_steps,
+            "stage": stage,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "total_elapsed_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            **info,
+        })
+
+    def emit(self, event: str, data: Dict[str, Any]) -> None:
+        """Отправить событие колбэку (если он задан)"""
+        if self.callback:
+            self.callback(event, {"pipeline": self.pipeline, **data})
@@ -0,0 +1,70 @@
+"""
+Airtable Query Layer
+Выборка записей с фильтрацией на стороне Airtable вместо полного сканирования таблиц
+"""
+from typing import Dict, List, Optional, Sequence
+
+from app.config import AIRTABLE_FORMULA_CHUNK
+from app.services.formulas import chunked, linked_to_any, record_id_in
+
+
+def fetch_by_ids(
+    table,
+    record_ids: Sequence[str],
+    fields: Optional[List[str]] = None
+) -> List[Dict]:
+    """
+    Получает записи по списку ID страницами OR(RECORD_ID()=...)
+    
+    Стоимость зависит только от количества запрошенных ID,
+    а не от размера таблицы
+    """
+    records = []
+    unique_ids = list(dict.fromkeys(record_ids))
+    for chunk in chunked(unique_ids, AIRTABLE_FORMULA_CHUNK):
+        records.extend(table.all(formula=record_id_in(chunk), fields=fields))
+    return records
+
+
+def fetch_linked_to(
+    table,
+    link_field: str,
+    targets: Dict[str, Optional[str]],
+    fields: Optional[List[str]] = None
+) -> List[Dict]:
+    """
+    Получает записи, у которых link_field ссылается на одну из targets
+    
+    Args:
+        table: pyairtable таблица
+        link_field: название linked record поля
+        targets: {record_id: primary field value} связанных записей
+        fields: подмножество полей для загрузки (link_field добавляется сам)
+    
+    Фильтр по primary значениям выполняется в Airtable, затем результат
+    проверяется по ID. Если primary значение хотя бы одной записи неизвестно,
+    формулу построить нельзя - используется полное сканирование.
+    """
+    if not targets:
+        return []
+    
+    if fields is not None and link_field not in fields:
+        fields = [*fields, link_field]
+    
+    target_ids = set(targets)
+    names = list(dict.fromkeys(targets.values()))
+    
+    if all(names):
+        candidates = []
+        for chunk in chunked(names, AIRTABLE_FORMULA_CHUNK):
+            candidates.extend(table.all(formula=linked_to_any(link_field, chunk), fields=fields))
+    else:
+        # Fallback: полное сканирование (только нужные поля)
+        candidates = table.all(fields=fields)
+    
+    # Проверяем по ID (и убираем дубли между страницами формулы)
+    records = {}
+    for record in candidates:
+        if target_ids.intersection(record['fields'].get(link_field, [])):
+            records[record['id']] = record
+    return list(records.values())
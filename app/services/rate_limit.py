@@ -0,0 +1,71 @@
+"""
+Rate Limiting
+Token bucket для соблюдения лимита Airtable API (5 запросов/сек на базу)
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+from app.config import AIRTABLE_RATE_LIMIT
+
+
+class TokenBucket:
+    """
+    Потокобезопасный token bucket
+
+    - rate: сколько токенов пополняется в секунду
+    - capacity: максимальный запас токенов (размер всплеска)
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def try_acquire(self) -> float:
+        """
+        Пытается взять токен
+
+        Returns:
+            0 если токен получен, иначе сколько секунд подождать
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> float:
+        """
+        Берёт токен, при необходимости ожидая пополнения
+
+        Returns:
+            сколько секунд пришлось ждать
+        """
+        waited = 0.0
+        while True:
+            delay = self.try_acquire()
+            if delay == 0:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_rate_limiter(base_id: str) -> TokenBucket:
+    """Общий token bucket для базы Airtable"""
+    with _buckets_lock:
+        if base_id not in _buckets:
+            _buckets[base_id] = TokenBucket(AIRTABLE_RATE_LIMIT)
+        return _buckets[base_id]
@@ -0,0 +1,119 @@
+"""
+Service Registry
+Единый реестр клиентов и сервисов: один Airtable клиент (пул соединений),
+один AirtableService, одно зеркало каталога и сервисы поверх них.
+
+Всё создаётся лениво при первом обращении, поэтому импорт приложения
+не требует credentials и не ходит в сеть. При старте warm_up()
+выполняется в фоне и заранее создаёт сервисы и загружает каталог.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app.config import PANTRY_TABLE
+from app.services.airtable import AirtableService
+from app.services.catalog import CatalogMirror
+from app.services.jobs import SHOPPING_LIST_JOB, JobQueue, JobStore
+from app.services.meal_planner import MealPlannerService
+from app.services.pantry import Pantry
+from app.services.shopping_list import ShoppingListService
+from app.services.storage import StorageBackend, close_storage, create_storage
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    """Лениво создаваемые синглтоны сервисов"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._instances: Dict[str, Any] = {}
+        self.warmed_up_in: Optional[float] = None  # секунды
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = factory()
+                    self._instances[name] = instance
+        return instance
+
+    @property
+    def api(self) -> StorageBackend:
+        """
+        Общее хранилище таблиц: ScheduledApi с пулом keep-alive соединений
+        или SQLiteStore (STORAGE_BACKEND=sqlite)
+        """
+        return self._get("api", lambda: create_storage(os.getenv("AIRTABLE_API_KEY")))
+
+    @property
+    def airtable(self) -> AirtableService:
+        return self._get("airtable", lambda: AirtableService(api=self.api))
+
+    @property
+    def catalog(self) -> CatalogMirror:
+        return self._get("catalog", lambda: CatalogMirror(self.airtable.get_table))
+
+    @property
+    def meal_planner(self) -> MealPlannerService:
+        return self._get("meal_planner", lambda: MealPlannerService(self.airtable, self.catalog))
+
+    @property
+    def pantry(self) -> Optional[Pantry]:
+        """Запасы продуктов (None, если PANTRY_TABLE не задана)"""
+        if not PANTRY_TABLE:
+            return None
+        return self._get("pantry", lambda: Pantry(lambda: self.airtable.get_table(PANTRY_TABLE)))
+
+    @property
+    def shopping_list(self) -> ShoppingListService:
+        return self._get(
+            "shopping_list",
+            lambda: ShoppingListService(catalog=self.catalog, api=self.api, pantry=self.pantry)
+        )
+
+    @property
+    def jobs(self) -> JobQueue:
+        """Очередь фоновых задач (SQLite)"""
+        return self._get("jobs", lambda: JobQueue(JobStore(), {
+            SHOPPING_LIST_JOB: self._run_shopping_list_job,
+        }))
+
+    def _run_shopping_list_job(self, payload: Dict[str, Any], on_progress) -> Dict[str, Any]:
+        return self.shopping_list.generate_shopping_list(**payload, on_progress=on_progress)
+
+    def peek(self, name: str) -> Optional[Any]:
+        """Уже созданный экземпляр (без создания)"""
+        return self._instances.get(name)
+
+    def warm_up(self) -> None:
+        """
+        Создать сервисы и загрузить каталог заранее
+        (запускается в фоне при старте; ошибки только логируются)
+        """
+        started = time.perf_counter()
+        try:
+            self.meal_planner
+            self.shopping_list
+            self.catalog.ensure_fresh()
+            self.warmed_up_in = time.perf_counter() - started
+            logger.info(f"Services warmed up in {self.warmed_up_in:.2f}s")
+        except Exception as e:
+            logger.warning(f"Warm-up failed, services will initialize on first request: {e}")
+
+    def close(self) -> None:
+        """Остановить очередь задач и закрыть HTTP сессию / SQLite"""
+        jobs = self.peek("jobs")
+        if jobs is not None:
+            jobs.shutdown()
+        api = self.peek("api")
+        if api is not None:
+            close_storage(api)
+
+
+registry = ServiceRegistry()
@@ -0,0 +1,298 @@
+"""
+Airtable Request Scheduler
+Единая точка, через которую проходят все HTTP запросы к Airtable
+
+- общий token bucket на базу (5 запросов/сек)
+- приоритетные очереди: интерактивные чтения не ждут за батчевой записью
+- повторы при 429 / 5xx с экспоненциальной задержкой и jitter (с учётом Retry-After)
+- метрики глубины очередей; счётчики и латентность запросов по таблицам (metrics.py)
+"""
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from functools import lru_cache, partialmethod
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+import requests
+from pyairtable import Api
+
+from app.config import (
+    AIRTABLE_MAX_RETRIES,
+    AIRTABLE_RETRY_BASE_DELAY,
+    AIRTABLE_RETRY_MAX_DELAY,
+)
+from app.services import metrics
+from app.services.rate_limit import TokenBucket, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Приоритет запроса (меньше - важнее)"""
+    INTERACTIVE = 0  # чтения, которые ждёт пользователь (GET списка / плана)
+    NORMAL = 1
+    BULK = 2  # батчевые записи и фоновые задачи
+
+
+_priority: ContextVar[Priority] = ContextVar("airtable_priority", default=Priority.NORMAL)
+_scheduled: ContextVar[bool] = ContextVar("airtable_scheduled", default=False)
+
+
+@contextmanager
+def airtable_priority(priority: Priority) -> Iterator[None]:
+    """
+    Задаёт приоритет всех запросов Airtable внутри блока
+
+    Контекст переносится в пул потоков через run_blocking()
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+# Повторяем всегда: запрос не был обработан
+RETRY_ALWAYS = {429}
+# Повторяем только идемпотентные запросы: POST мог успеть создать записи
+RETRY_IDEMPOTENT = {500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "PATCH", "PUT", "DELETE"}
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    response = getattr(error, "response", None)
+    return response.status_code if response is not None else None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Заголовок Retry-After ответа (секунды), если есть"""
+    response = getattr(error, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return max(float(value), 0.0) if value else None
+    except ValueError:
+        return None  # HTTP-date - ждём по обычной схеме
+
+
+class AirtableScheduler:
+    """Планировщик запросов одной базы Airtable"""
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[int, int]] = []  # heap (priority, seq)
+        self._seq = itertools.count()
+        self._depth = {p: 0 for p in Priority}
+        self._max_depth = {p: 0 for p in Priority}
+        self._in_flight = 0
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0  # ответы 429
+        self.failures = 0
+        self.wait_seconds = 0.0
+
+    def _acquire(self, priority: Priority) -> float:
+        """Ждёт своей очереди и токена; возвращает время ожидания"""
+        started = time.monotonic()
+        ticket = (int(priority), next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            self._depth[priority] += 1
+            self._max_depth[priority] = max(self._max_depth[priority], self._depth[priority])
+            try:
+                while True:
+                    if self._waiters[0] == ticket:
+                        delay = self.bucket.try_acquire()
+                        if delay == 0:
+                            break
+                        # Ждём пополнения (или прихода более важного запроса)
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._depth[priority] -= 1
+                self._cond.notify_all()
+        return time.monotonic() - started
+
+    def call(self, method: str, func: Callable[[], Any]) -> Any:
+        """
+        Выполняет запрос с учётом лимита, приоритета и повторов
+        """
+        priority = _priority.get()
+        attempt = 0
+        while True:
+            waited = self._acquire(priority)
+            with self._cond:
+                self.requests += 1
+                self._in_flight += 1
+                self.wait_seconds += waited
+            try:
+                return func()
+            except (requests.HTTPError, requests.ConnectionError, requests.Timeout) as e:
+                status = _status_code(e)
+                retryable = status in RETRY_ALWAYS or (
+                    method.upper() in IDEMPOTENT_METHODS
+                    and (status is None or status in RETRY_IDEMPOTENT)
+                )
+                with self._cond:
+                    if status == 429:
+                        self.throttled += 1
+                    if not retryable or attempt >= AIRTABLE_MAX_RETRIES:
+                        self.failures += 1
+                        raise
+                    self.retries += 1
+                delay = random.uniform(
+                    0, min(AIRTABLE_RETRY_MAX_DELAY, AIRTABLE_RETRY_BASE_DELAY * 2 ** attempt)
+                )
+                # Airtable сообщает, сколько ждать после 429: раньше повторять бессмысленно
+                retry_after = _retry_after(e)
+                if retry_after is not None:
+                    delay = max(delay, min(retry_after, AIRTABLE_RETRY_MAX_DELAY))
+                logger.warning(
+                    f"Airtable {method} failed ({status or type(e).__name__}), "
+                    f"retry {attempt + 1}/{AIRTABLE_MAX_RETRIES} in {delay:.2f}s"
+                )
+                attempt += 1
+                time.sleep(delay)
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "queue_depth": {p.name.lower(): self._depth[p] for p in Priority},
+                "max_queue_depth": {p.name.lower(): self._max_depth[p] for p in Priority},
+                "in_flight": self._in_flight,
+                "requests": self.requests,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "failures": self.failures,
+                "avg_wait_ms": round(self.wait_seconds / self.requests * 1000, 1) if self.requests else 0.0,
+            }
+
+
+_schedulers: Dict[str, AirtableScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(base_id: str) -> AirtableScheduler:
+    """Планировщик базы (общий для всех клиентов процесса)"""
+    with _schedulers_lock:
+        if base_id not in _schedulers:
+            _schedulers[base_id] = AirtableScheduler(get_rate_limiter(base_id))
+        return _schedulers[base_id]
+
+
+def scheduler_stats() -> Dict[str, Dict[str, Any]]:
+    """Метрики всех планировщиков по базам"""
+    with _schedulers_lock:
+        schedulers = dict(_schedulers)
+    return {base_id: scheduler.stats() for base_id, scheduler in schedulers.items()}
+
+
+def _register_scheduler_metric(name: str, kind: str, documentation: str, key: str) -> None:
+    """Метрика из scheduler.stats()[key] по базам (снимается при scrape)"""
+    def collect() -> Iterator[Tuple[str, Dict[str, str], float]]:
+        for base_id, stats in scheduler_stats().items():
+            value = stats[key]
+            if isinstance(value, dict):
+                for priority, depth in value.items():
+                    yield name, {"base": base_id, "priority": priority}, depth
+            else:
+                yield name, {"base": base_id}, value
+
+    metrics.register_collector(name, kind, documentation, collect)
+
+
+_register_scheduler_metric(
+    "airtable_scheduler_queue_depth", "gauge", "Requests waiting for a rate limit token", "queue_depth"
+)
+_register_scheduler_metric("airtable_scheduler_in_flight", "gauge", "Airtable requests in progress", "in_flight")
+_register_scheduler_metric(
+    "airtable_scheduler_retries_total", "counter", "Retried Airtable requests (429 / 5xx / network)", "retries"
+)
+_register_scheduler_metric("airtable_scheduler_throttled_total", "counter", "Airtable 429 responses", "throttled")
+
+
+def _base_id_from_url(url: str) -> str:
+    """https://api.airtable.com/v0/{base_id}/{table}... -> base_id"""
+    parts = url.split("/v0/", 1)[-1].split("/")
+    return parts[0] if parts else ""
+
+
+@lru_cache(maxsize=256)
+def _table_label(segment: str) -> str:
+    """Название таблицы для меток метрик (ID таблиц сервисов -> название)"""
+    from app.services.storage import table_schema  # storage импортирует этот модуль
+    return table_schema(unquote(segment)).name
+
+
+def _request_labels(method: str, url: str) -> Tuple[str, str]:
+    """
+    (таблица, операция) запроса по URL pyairtable
+
+    .../v0/{base}/{table} - list / create / update / delete (batch)
+    .../v0/{base}/{table}/listRecords - list (длинная формула через POST)
+    .../v0/{base}/{table}/{record_id} - get / update / delete
+    """
+    parts = urlsplit(url).path.split("/v0/", 1)[-1].split("/")
+    if len(parts) < 2 or parts[0] == "meta":
+        return "meta", method.lower()
+    table = _table_label(parts[1])
+    method = method.upper()
+    if method == "GET":
+        return table, "get" if len(parts) > 2 else "list"
+    if method == "POST":
+        return table, "list" if parts[-1] == "listRecords" else "create"
+    if method in ("PATCH", "PUT"):
+        return table, "update"
+    return table, method.lower()
+
+
+class ScheduledApi(Api):
+    """pyairtable Api, все запросы которого проходят через AirtableScheduler"""
+
+    def request(self, method: str, url: str, *args: Any, **kwargs: Any) -> Any:
+        # Вложенный вызов (pyairtable переключил длинный GET на POST) - уже в планировщике
+        if _scheduled.get():
+            return super().request(method, url, *args, **kwargs)
+
+        def send() -> Any:
+            token = _scheduled.set(True)
+            try:
+                return super(ScheduledApi, self).request(method, url, *args, **kwargs)
+            finally:
+                _scheduled.reset(token)
+
+        def measured_send() -> Any:
+            table, operation = _request_labels(method, url)
+            status = "error"
+            started = time.perf_counter()
+            try:
+                result = send()
+                status = "ok"
+                return result
+            except requests.RequestException as e:
+                status = str(_status_code(e) or type(e).__name__)
+                raise
+            finally:
+                metrics.airtable_request_seconds.observe(time.perf_counter() - started, table, operation)
+                metrics.airtable_requests_total.inc(table, operation, status)
+
+        return get_scheduler(_base_id_from_url(url)).call(method, measured_send if metrics.enabled else send)
+
+    # partialmethod в Api ссылается на Api.request - переопределяем
+    get = partialmethod(request, "GET")
+    post = partialmethod(request, "POST")
+    patch = partialmethod(request, "PATCH")
+    delete = partialmethod(request, "DELETE")
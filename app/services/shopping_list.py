@@ -2,16 +2,74 @@
 Shopping List Generation Service
 Генерирует списки покупок на основе планов питания
 """
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from datetime import datetime
-from pyairtable import Api
+import logging
 import os
-from collections import defaultdict
+import time
+
+import numpy as np
+from pyairtable import Api
+from pyairtable.formulas import AND, escape_quotes
+
+from app.config import (
+    MEAL_PLAN_MEALS_FIELD,
+    MEAL_PLAN_PRIMARY_FIELD,
+    RECIPE_INGREDIENTS_FIELD,
+    RECIPE_PRIMARY_FIELD,
+    SHOPPING_ITEM_COST_FIELD,
+    SHOPPING_LIST_PANTRY_FIELD,
+)
+from app.services.airtable import create_api
+from app.services.batch_writer import batch_writer
+from app.services.cache import ingredient_cache, meal_plan_responses, shopping_list_responses
+from app.services.catalog import INGREDIENTS, CatalogMirror, fresh_or_none
+from app.services.ingredient_vectors import IngredientVectors
+from app.services.pantry import Pantry, PantryResult, Reservations, format_reservations, parse_reservations
+from app.services.pricing import PriceTable, estimate_costs
+from app.services.progress import PipelineProgress, ProgressCallback
+from app.services.formulas import linked_to_any
+from app.services.queries import fetch_by_ids, fetch_linked_to
+from app.services.units import UnitConverter, default_units
+
+logger = logging.getLogger(__name__)
+
+# Поля, которые реально нужны генератору (остальные не загружаем)
+PLANNED_MEAL_FIELDS = ['Meal Plan', 'Recipe', 'Servings']
+RECIPE_INGREDIENT_FIELDS = ['Recipes 2', 'Ingredients', 'Количество', 'Единица измерения']
+# Поля Shopping_List_Items, которые обновляются при пересчёте списка (Purchased не трогаем)
+ITEM_DIFF_FIELDS = ['Item', 'Quantity'] + ([SHOPPING_ITEM_COST_FIELD] if SHOPPING_ITEM_COST_FIELD else [])
+
+
+def _cost_line(ing: Dict) -> Dict[str, Any]:
+    """Строка разбивки стоимости для ответа"""
+    return {
+        'ingredient_id': ing['ingredient_id'],
+        'ingredient_name': ing['ingredient_name'],
+        'quantity': ing['quantity'],
+        'unit': ing['unit'],
+        'unit_price': ing.get('unit_price'),
+        'estimated_cost': ing.get('estimated_cost')
+    }
+
+
+def _round_quantity(quantity: float):
+    """Округление до 0.1; целые значения - без дробной части ("200г", а не "200.0г")"""
+    quantity = round(float(quantity), 1)
+    return int(quantity) if quantity.is_integer() else quantity
 
 
 class ShoppingListService:
-    def __init__(self):
-        self.api = Api(os.getenv('AIRTABLE_API_KEY'))
+    def __init__(
+        self,
+        catalog: Optional[CatalogMirror] = None,
+        api: Optional[Api] = None,
+        pantry: Optional[Pantry] = None
+    ):
+        self.catalog = catalog
+        self.pantry = pantry  # None - таблица запасов не настроена
+        # Общий клиент (пул keep-alive соединений) или собственный
+        self.api = api or create_api(os.getenv('AIRTABLE_API_KEY'))
         self.base_id = 'appBgJb1hzG4vFT1b'
         
         # Table IDs
@@ -23,10 +81,27 @@ class ShoppingListService:
         self.shopping_lists_table = 'tblw3kjvCpD98webq'
         self.shopping_list_items_table = 'tblnEuDxnpWZ3gEIe'
 
+    def _get_catalog(self) -> Optional[CatalogMirror]:
+        """Зеркало каталога рецептов (None - читаем Airtable напрямую)"""
+        return fresh_or_none(self.catalog)
+
+    def _get_units(self) -> UnitConverter:
+        """Перевод единиц (с переопределениями по ингредиентам, если есть каталог)"""
+        catalog = self._get_catalog()
+        return catalog.units() if catalog else default_units
+
+    def _get_prices(self) -> PriceTable:
+        """Цены ингредиентов из каталога (без каталога цен нет - запросов не делаем)"""
+        catalog = self._get_catalog()
+        return catalog.prices() if catalog else PriceTable({}, default_units)
+
     def generate_shopping_list(
         self,
         meal_plan_id: str,
-        shopping_date: Optional[str] = None
+        shopping_date: Optional[str] = None,
+        use_pantry: bool = True,
+        reserve_pantry: bool = False,
+        on_progress: Optional[ProgressCallback] = None
     ) -> Dict[str, Any]:
         """
         Генерирует список покупок для плана питания
@@ -34,77 +109,403 @@ class ShoppingListService:
         Args:
             meal_plan_id: ID плана питания
             shopping_date: Дата покупок (опционально)
+            use_pantry: вычесть продукты, которые уже есть в запасах (Pantry)
+            reserve_pantry: зарезервировать использованные запасы под этот план
+            on_progress: колбэк о завершении каждого шага (опционально)
             
         Returns:
             Dict с информацией о созданном списке покупок
         """
+        progress = PipelineProgress("shopping_list", total_steps=8, callback=on_progress)
+        
         # 1. Получаем план питания
-        meal_plan = self._get_meal_plan(meal_plan_id)
+        with progress.step(1, "meal_plan"):
+            meal_plan = self._get_meal_plan(meal_plan_id)
         if not meal_plan:
             raise ValueError(f"Meal plan {meal_plan_id} not found")
         
-        # 2. Получаем все запланированные приёмы пищи
-        planned_meals = self._get_planned_meals(meal_plan_id)
+        return {
+            "meal_plan_id": meal_plan_id,
+            **self._generate_for_plans(
+                {meal_plan_id: meal_plan}, shopping_date, progress, use_pantry, reserve_pantry
+            )
+        }
+
+    def generate_consolidated_shopping_list(
+        self,
+        meal_plan_ids: Optional[List[str]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        user_id: Optional[str] = None,
+        shopping_date: Optional[str] = None,
+        use_pantry: bool = True,
+        reserve_pantry: bool = False,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Генерирует один общий список покупок для нескольких планов питания
+        
+        Планы задаются списком ID или диапазоном дат (Week Start в
+        [date_from, date_to], опционально только планы user_id).
+        Приёмы пищи всех планов загружаются одним набором запросов,
+        ингредиенты агрегируются за один проход - одинаковые продукты
+        разных планов попадают в одну строку.
+        
+        Returns:
+            Dict с информацией о созданном списке покупок
+        """
+        progress = PipelineProgress("shopping_list_consolidated", total_steps=8, callback=on_progress)
+        
+        # 1. Получаем планы питания
+        with progress.step(1, "meal_plans") as info:
+            if meal_plan_ids:
+                meal_plans = self._get_meal_plans(meal_plan_ids)
+            else:
+                meal_plans = self._find_meal_plans(date_from, date_to, user_id)
+            info["count"] = len(meal_plans)
+        if not meal_plans:
+            raise ValueError(f"No meal plans found between {date_from} and {date_to}")
+        
+        return {
+            "meal_plan_ids": list(meal_plans),
+            "total_plans": len(meal_plans),
+            **self._generate_for_plans(meal_plans, shopping_date, progress, use_pantry, reserve_pantry)
+        }
+
+    def _generate_for_plans(
+        self,
+        meal_plans: Dict[str, Dict],
+        shopping_date: Optional[str],
+        progress: PipelineProgress,
+        use_pantry: bool = True,
+        reserve_pantry: bool = False
+    ) -> Dict[str, Any]:
+        """Шаги 2-8: агрегация ингредиентов планов и создание списка с элементами"""
+        # 2-6. Приёмы пищи -> рецепты -> ингредиенты -> агрегация -> запасы
+        planned_meals, recipe_ids, aggregated_ingredients, pantry_result = self._aggregate_for_plans(
+            meal_plans, progress, use_pantry
+        )
+        # Стоимость того, что осталось купить (цены из каталога)
+        costs = estimate_costs(aggregated_ingredients)
+        
+        # 7. Создаём Shopping List
+        with progress.step(7, "create_list") as info:
+            shopping_list_id = self._create_shopping_list(
+                meal_plans=meal_plans,
+                shopping_date=shopping_date
+            )
+            info["shopping_list_id"] = shopping_list_id
+            # У планов появилась обратная ссылка на новый список
+            for meal_plan_id in meal_plans:
+                meal_plan_responses.invalidate(meal_plan_id)
+        
+        # 8. Создаём Shopping List Items (batch)
+        with progress.step(8, "create_items") as info:
+            items_created = self._create_shopping_list_items(
+                shopping_list_id=shopping_list_id,
+                ingredients=aggregated_ingredients,
+                on_chunk=lambda index, records: progress.emit(
+                    "items", {"chunk": index, "items": records}
+                )
+            )
+            info["count"] = len(items_created)
+        
+        # Резервируем запасы только после успешного создания списка
+        pantry_used = pantry_result.used if pantry_result else []
+        if reserve_pantry and pantry_result:
+            self._move_reservations(shopping_list_id, {}, pantry_result.reservations)
+        
+        return {
+            "shopping_list_id": shopping_list_id,
+            "items_count": len(items_created),
+            "total_recipes": len(recipe_ids),
+            "total_meals": len(planned_meals),
+            "items": items_created,
+            "pantry_used": pantry_used,
+            "pantry_reserved": bool(reserve_pantry and pantry_used),
+            "estimated_cost": costs["estimated_cost"],
+            "unpriced_items": costs["unpriced_items"],
+            "cost_breakdown": [_cost_line(ing) for ing in aggregated_ingredients]
+        }
+
+    def _aggregate_for_plans(
+        self,
+        meal_plans: Dict[str, Dict],
+        progress: PipelineProgress,
+        use_pantry: bool = True,
+        released: Optional[Reservations] = None
+    ) -> Tuple[List[Dict], List[str], List[Dict], Optional[PantryResult]]:
+        """
+        Шаги 2-6 пайплайна: приёмы пищи планов, рецепты, ингредиенты,
+        агрегация, вычитание запасов
+        
+        Args:
+            meal_plans: {meal_plan_id: запись Meal_Plans} - один или несколько планов
+            use_pantry: вычитать запасы (если таблица Pantry настроена)
+            released: собственные резервы пересчитываемого списка (доступны ему)
+        
+        Returns:
+            (planned_meals, recipe_ids, aggregated_ingredients, pantry_result)
+        """
+        # 2. Получаем все запланированные приёмы пищи (всех планов сразу)
+        with progress.step(2, "planned_meals") as info:
+            planned_meals = self._get_planned_meals(meal_plans)
+            info["count"] = len(planned_meals)
         if not planned_meals:
-            raise ValueError(f"No planned meals found for meal plan {meal_plan_id}")
+            raise ValueError(f"No planned meals found for meal plan {', '.join(meal_plans)}")
         
         # 3. Собираем все рецепты
-        recipe_ids = self._extract_recipe_ids(planned_meals)
+        with progress.step(3, "recipes") as info:
+            recipe_ids = self._extract_recipe_ids(planned_meals)
+            info["count"] = len(recipe_ids)
+        
+        # 4. Векторы ингредиентов рецептов и порции
+        with progress.step(4, "ingredients") as info:
+            vectors = self._get_ingredient_vectors(recipe_ids)
+            recipe_servings = self._recipe_servings(planned_meals)
+            info["count"] = vectors.nnz(recipe_ids)
+        
+        # 5. Агрегируем ингредиенты (взвешенная сумма векторов рецептов)
+        with progress.step(5, "aggregate") as info:
+            aggregated_ingredients = self._aggregate_ingredients(vectors, recipe_servings)
+            info["count"] = len(aggregated_ingredients)
+        
+        # 6. Вычитаем запасы (после перевода в канонические единицы)
+        pantry_result = None
+        with progress.step(6, "pantry") as info:
+            if use_pantry and self.pantry:
+                pantry_result = self._subtract_pantry(aggregated_ingredients, released)
+                aggregated_ingredients = pantry_result.ingredients
+                info["used"] = len(pantry_result.used)
+            info["count"] = len(aggregated_ingredients)
+        
+        return planned_meals, recipe_ids, aggregated_ingredients, pantry_result
+
+    def _subtract_pantry(self, ingredients: List[Dict], released: Optional[Reservations] = None) -> PantryResult:
+        """Вычитает свободные запасы Pantry (и released) из агрегированных ингредиентов"""
+        result = self.pantry.index(self._get_units(), released).subtract(ingredients)
+        for item in (*result.ingredients, *result.used):
+            item['quantity'] = _round_quantity(item['quantity'])
+        result.ingredients = [item for item in result.ingredients if item['quantity'] > 0]
+        return result
+
+    def _move_reservations(self, shopping_list_id: str, old: Reservations, new: Reservations) -> None:
+        """
+        Меняет резерв списка в Pantry с old на new (только разница)
+        и сохраняет new в поле SHOPPING_LIST_PANTRY_FIELD списка
+        """
+        deltas = {
+            record_id: new.get(record_id, 0.0) - old.get(record_id, 0.0)
+            for record_id in {*old, *new}
+        }
+        self.pantry.reserve(deltas)
+        if format_reservations(new) != format_reservations(old):
+            list_table = self.api.table(self.base_id, self.shopping_lists_table)
+            list_table.update(shopping_list_id, {SHOPPING_LIST_PANTRY_FIELD: format_reservations(new)})
+
+    def update_shopping_list(
+        self,
+        shopping_list_id: str,
+        use_pantry: bool = True,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Обновляет существующий список покупок после изменения плана питания
         
-        # 4. Получаем ингредиенты для всех рецептов
-        ingredients_data = self._get_ingredients_for_recipes(recipe_ids, planned_meals)
+        Запасы вычитаются из свободного остатка Pantry плюс собственный резерв
+        списка. Если список создан с reserve_pantry, его резерв переносится
+        на новые количества (в Pantry записывается только разница), иначе
+        запасы не резервируются
         
-        # 5. Агрегируем ингредиенты (группируем одинаковые)
-        aggregated_ingredients = self._aggregate_ingredients(ingredients_data)
+        Пересчитывает агрегированные ингредиенты плана и сравнивает их
+        с текущими Shopping List Items по (ingredient_id, unit):
+        - изменилось количество -> batch_update (флаг Purchased сохраняется)
+        - новый ингредиент -> batch_create
+        - ингредиент больше не нужен -> batch_delete
         
-        # 6. Создаём Shopping List
-        shopping_list_id = self._create_shopping_list(
-            meal_plan_id=meal_plan_id,
-            meal_plan=meal_plan,
-            shopping_date=shopping_date
+        Returns:
+            Dict со счётчиками created / updated / deleted / unchanged
+        """
+        progress = PipelineProgress("shopping_list_update", total_steps=8, callback=on_progress)
+        
+        # 1. Получаем список покупок и его планы питания
+        with progress.step(1, "shopping_list"):
+            list_table = self.api.table(self.base_id, self.shopping_lists_table)
+            shopping_list = list_table.get(shopping_list_id)
+            meal_plan_ids = shopping_list['fields'].get('Meal Plan', [])
+            if not meal_plan_ids:
+                raise ValueError(f"Shopping list {shopping_list_id} is not linked to a meal plan")
+            meal_plans = self._get_meal_plans(meal_plan_ids)
+            reserved = parse_reservations(shopping_list['fields'].get(SHOPPING_LIST_PANTRY_FIELD))
+        
+        # 2-6. Приёмы пищи -> рецепты -> ингредиенты -> агрегация -> запасы
+        planned_meals, recipe_ids, aggregated_ingredients, pantry_result = self._aggregate_for_plans(
+            meal_plans, progress, use_pantry, released=reserved
         )
+        costs = estimate_costs(aggregated_ingredients)
+        
+        # 7. Текущие элементы списка
+        with progress.step(7, "existing_items") as info:
+            existing_items = self._get_list_items(shopping_list_id, shopping_list)
+            info["count"] = len(existing_items)
+        
+        # 8. Применяем разницу (только изменившиеся записи)
+        with progress.step(8, "apply_diff") as info:
+            diff = self._diff_items(shopping_list_id, existing_items, aggregated_ingredients)
+            table = self.api.table(self.base_id, self.shopping_list_items_table)
+            if diff["update"]:
+                batch_writer.batch_update(table, diff["update"])
+            if diff["create"]:
+                batch_writer.batch_create(table, diff["create"])
+            if diff["delete"]:
+                batch_writer.batch_delete(table, diff["delete"])
+            info.update({
+                "created": len(diff["create"]),
+                "updated": len(diff["update"]),
+                "deleted": len(diff["delete"])
+            })
         
-        # 7. Создаём Shopping List Items (batch)
-        items_created = self._create_shopping_list_items(
-            shopping_list_id=shopping_list_id,
-            ingredients=aggregated_ingredients
-        )
+        # Резерв списка следует за новыми количествами (без запасов - освобождается)
+        if reserved and self.pantry:
+            self._move_reservations(
+                shopping_list_id, reserved, pantry_result.reservations if pantry_result else {}
+            )
+        
+        shopping_list_responses.invalidate(shopping_list_id)
         
         return {
             "shopping_list_id": shopping_list_id,
-            "meal_plan_id": meal_plan_id,
-            "items_count": len(items_created),
+            "meal_plan_id": meal_plan_ids[0],
+            "items_count": len(aggregated_ingredients),
             "total_recipes": len(recipe_ids),
             "total_meals": len(planned_meals),
-            "items": items_created
+            "created": len(diff["create"]),
+            "updated": len(diff["update"]),
+            "deleted": len(diff["delete"]),
+            "unchanged": diff["unchanged"],
+            "estimated_cost": costs["estimated_cost"],
+            "unpriced_items": costs["unpriced_items"]
         }
 
+    def _diff_items(
+        self,
+        shopping_list_id: str,
+        existing_items: List[Dict],
+        ingredients: List[Dict]
+    ) -> Dict[str, Any]:
+        """
+        Разница между текущими элементами списка и пересчитанными ингредиентами
+        
+        Returns:
+            {"create": [fields], "update": [{"id", "fields"}], "delete": [ids], "unchanged": int}
+        """
+        current = {}
+        duplicates = []
+        for item in existing_items:
+            fields = item['fields']
+            # Airtable не возвращает пустые поля: нет Unit == '' (как в _item_fields)
+            key = (next(iter(fields.get('Ingredient', [])), None), fields.get('Unit') or '')
+            if key in current:
+                duplicates.append(item['id'])
+            else:
+                current[key] = item
+        
+        diff = {"create": [], "update": [], "delete": duplicates, "unchanged": 0}
+        for ing in ingredients:
+            wanted = self._item_fields(shopping_list_id, ing)
+            item = current.pop((ing['ingredient_id'], wanted['Unit']), None)
+            if item is None:
+                diff["create"].append({**wanted, 'Purchased': False})
+            elif any(item['fields'].get(name) != wanted.get(name) for name in ITEM_DIFF_FIELDS):
+                diff["update"].append({
+                    'id': item['id'],
+                    'fields': {name: wanted.get(name) for name in ITEM_DIFF_FIELDS}
+                })
+            else:
+                diff["unchanged"] += 1
+        diff["delete"].extend(item['id'] for item in current.values())
+        return diff
+
     def _get_meal_plan(self, meal_plan_id: str) -> Optional[Dict]:
         """Получает план питания по ID"""
         table = self.api.table(self.base_id, self.meal_plans_table)
         try:
             record = table.get(meal_plan_id)
             return record
-        except Exception as e:
-            print(f"Error getting meal plan: {e}")
+        except Exception:
+            logger.warning(f"Error getting meal plan {meal_plan_id}", exc_info=True)
             return None
 
-    def _get_planned_meals(self, meal_plan_id: str) -> List[Dict]:
-        """Получает все запланированные приёмы пищи для плана"""
-        table = self.api.table(self.base_id, self.planned_meals_table)
+    def _get_meal_plans(self, meal_plan_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Получает планы питания по ID (страницами OR(RECORD_ID()=...))
         
-        # Получаем все records и фильтруем в Python
-        # Airtable формулы для linked records работают странно, поэтому фильтруем здесь
-        all_records = table.all()
+        Returns:
+            {meal_plan_id: запись} в порядке meal_plan_ids
+        """
+        table = self.api.table(self.base_id, self.meal_plans_table)
+        found = {record['id']: record for record in fetch_by_ids(table, meal_plan_ids)}
+        missing = [plan_id for plan_id in meal_plan_ids if plan_id not in found]
+        if missing:
+            raise ValueError(f"Meal plan {', '.join(missing)} not found")
+        return {plan_id: found[plan_id] for plan_id in dict.fromkeys(meal_plan_ids)}
+
+    def _find_meal_plans(
+        self,
+        date_from: str,
+        date_to: str,
+        user_id: Optional[str] = None
+    ) -> Dict[str, Dict]:
+        """
+        Планы питания, чья Week Start попадает в [date_from, date_to]
         
-        # Фильтруем по meal_plan_id
-        filtered_records = []
-        for record in all_records:
-            meal_plan_links = record['fields'].get('Meal Plan', [])
-            if meal_plan_id in meal_plan_links:
-                filtered_records.append(record)
+        Диапазон фильтруется в Airtable, пользователь - по ID на нашей стороне
+        (ARRAYJOIN({User}) вернул бы имена, а не ID)
+        """
+        table = self.api.table(self.base_id, self.meal_plans_table)
+        formula = (
+            f"AND(NOT(IS_BEFORE({{Week Start}}, '{date_from}')), "
+            f"NOT(IS_AFTER({{Week Start}}, '{date_to}')))"
+        )
+        records = table.all(formula=formula)
+        if user_id:
+            records = [r for r in records if user_id in r['fields'].get('User', [])]
+        records.sort(key=lambda r: r['fields'].get('Week Start', ''))
+        return {record['id']: record for record in records}
+
+    def _get_planned_meals(self, meal_plans: Dict[str, Optional[Dict]]) -> List[Dict]:
+        """
+        Получает все запланированные приёмы пищи для одного или нескольких планов
+        
+        Фильтрация выполняется в Airtable, одним набором запросов на все планы:
+        - по обратным ссылкам Meal_Plans -> Planned_Meals (RECORD_ID)
+        - иначе по названиям планов через FIND(ARRAYJOIN({Meal Plan}))
+        Полное сканирование - только если название плана неизвестно
+        """
+        table = self.api.table(self.base_id, self.planned_meals_table)
+        plan_fields = {
+            plan_id: meal_plan['fields'] if meal_plan else {}
+            for plan_id, meal_plan in meal_plans.items()
+        }
         
-        return filtered_records
+        planned_meal_ids = [fields.get(MEAL_PLAN_MEALS_FIELD) for fields in plan_fields.values()]
+        if all(planned_meal_ids):
+            records = fetch_by_ids(
+                table,
+                [meal_id for ids in planned_meal_ids for meal_id in ids],
+                fields=PLANNED_MEAL_FIELDS
+            )
+            return [
+                r for r in records
+                if any(plan_id in meal_plans for plan_id in r['fields'].get('Meal Plan', []))
+            ]
+        
+        return fetch_linked_to(
+            table,
+            'Meal Plan',
+            {plan_id: fields.get(MEAL_PLAN_PRIMARY_FIELD) for plan_id, fields in plan_fields.items()},
+            fields=PLANNED_MEAL_FIELDS
+        )
 
     def _extract_recipe_ids(self, planned_meals: List[Dict]) -> List[str]:
         """Извлекает уникальные ID рецептов из запланированных приёмов"""
@@ -115,122 +516,140 @@ class ShoppingListService:
                 recipe_ids.update(recipe)
         return list(recipe_ids)
 
-    def _get_ingredients_for_recipes(
-        self,
-        recipe_ids: List[str],
-        planned_meals: List[Dict]
-    ) -> List[Dict]:
+    def _recipe_servings(self, planned_meals: List[Dict]) -> Dict[str, float]:
+        """Суммарное количество порций каждого рецепта в плане"""
+        recipe_servings = {}
+        for meal in planned_meals:
+            recipe = meal['fields'].get('Recipe', [])
+            servings = meal['fields'].get('Servings', 1)
+            for recipe_id in recipe:
+                recipe_servings[recipe_id] = recipe_servings.get(recipe_id, 0) + servings
+        return recipe_servings
+
+    def _get_ingredient_vectors(self, recipe_ids: List[str]) -> IngredientVectors:
         """
-        Получает ингредиенты для всех рецептов с учётом порций
+        Векторы ингредиентов рецептов
         
-        Returns:
-            List of dicts: {
-                'ingredient_id': str,
-                'ingredient_name': str,
-                'quantity': float,
-                'unit': str,
-                'recipe_name': str
-            }
+        С зеркалом каталога - общие для всех запросов (пересчитываются только
+        при изменении каталога), без него - строятся из загруженных строк
+        Recipe_Ingredients только для нужных рецептов
         """
-        # Получаем Recipe_Ingredients для всех рецептов
-        table = self.api.table(self.base_id, self.recipe_ingredients_table)
-        
-        # Получаем ВСЕ Recipe_Ingredients и фильтруем в Python
-        # (формулы Airtable для linked records работают странно)
-        all_recipe_ingredients = table.all()
-        
-        # Фильтруем только те, которые относятся к нашим рецептам
-        recipe_ingredients = []
-        recipe_ids_set = set(recipe_ids)
+        catalog = self._get_catalog()
+        if catalog:
+            return catalog.ingredient_vectors()
+        return IngredientVectors.from_rows(self._get_recipe_ingredients(recipe_ids))
+
+    def _get_recipe_ingredients(self, recipe_ids: List[str]) -> List[Dict]:
+        """
+        Получает строки Recipe_Ingredients для указанных рецептов
         
-        for record in all_recipe_ingredients:
-            # Проверяем есть ли recipe_id в поле Recipes 2
-            recipes_links = record['fields'].get('Recipes 2', [])
-            if any(rid in recipe_ids_set for rid in recipes_links):
-                recipe_ingredients.append(record)
+        Загружает только нужные рецепты (по RECORD_ID), затем строки
+        Recipe_Ingredients - по обратной ссылке из рецептов, а если её нет -
+        по названиям рецептов через FIND(ARRAYJOIN({Recipes 2}))
+        """
+        if not recipe_ids:
+            return []
         
-        # Создаём мапу рецепт -> количество порций
-        recipe_servings = {}
-        for meal in planned_meals:
-            recipe = meal['fields'].get('Recipe', [])
-            servings = meal['fields'].get('Servings', 1)
-            if recipe:
-                for recipe_id in recipe:
-                    recipe_servings[recipe_id] = recipe_servings.get(recipe_id, 0) + servings
+        catalog = self._get_catalog()
+        if catalog:
+            return catalog.recipe_ingredients_for(recipe_ids)
         
-        # Собираем данные об ингредиентах
-        ingredients_data = []
-        for ri in recipe_ingredients:
-            fields = ri['fields']
-            
-            recipe_id = fields.get('Recipes 2', [None])[0]
-            if not recipe_id:
-                continue
-            
-            ingredient = fields.get('Ingredients', [])
-            quantity = fields.get('Количество', 0)
-            unit = fields.get('Единица измерения')
-            
-            if not ingredient:
-                continue
-            
-            ingredient_id = ingredient[0]
-            
-            # Умножаем на количество порций
-            total_servings = recipe_servings.get(recipe_id, 1)
-            total_quantity = quantity * total_servings
-            
-            ingredients_data.append({
-                'ingredient_id': ingredient_id,
-                'quantity': total_quantity,
-                'unit': unit,
-                'recipe_id': recipe_id
+        recipes_table = self.api.table(self.base_id, self.recipes_table)
+        table = self.api.table(self.base_id, self.recipe_ingredients_table)
+        recipes = fetch_by_ids(recipes_table, recipe_ids)
+        
+        recipe_ingredient_ids = [
+            ri_id
+            for recipe in recipes
+            for ri_id in recipe['fields'].get(RECIPE_INGREDIENTS_FIELD, [])
+        ]
+        if recipe_ingredient_ids:
+            records = fetch_by_ids(table, recipe_ingredient_ids, fields=RECIPE_INGREDIENT_FIELDS)
+        else:
+            recipe_names = {rid: None for rid in recipe_ids}
+            recipe_names.update({
+                recipe['id']: recipe['fields'].get(RECIPE_PRIMARY_FIELD)
+                for recipe in recipes
             })
+            records = fetch_linked_to(table, 'Recipes 2', recipe_names, fields=RECIPE_INGREDIENT_FIELDS)
         
-        # Получаем названия ингредиентов
-        ingredient_ids = list(set([item['ingredient_id'] for item in ingredients_data]))
-        ingredients_table = self.api.table(self.base_id, self.ingredients_table)
+        # Оставляем только строки наших рецептов
+        recipe_ids_set = set(recipe_ids)
+        return [
+            record for record in records
+            if any(rid in recipe_ids_set for rid in record['fields'].get('Recipes 2', []))
+        ]
+
+    def _get_ingredient_names(self, ingredient_ids: List[str]) -> Dict[str, str]:
+        """
+        Получает названия ингредиентов по ID
         
-        ingredient_names = {}
-        for ing_id in ingredient_ids:
-            try:
-                ing_record = ingredients_table.get(ing_id)
-                ingredient_names[ing_id] = ing_record['fields'].get('Ingredient Name', 'Unknown')
-            except:
-                ingredient_names[ing_id] = 'Unknown'
+        Сначала смотрит в зеркало каталога и общий кэш процесса, недостающие
+        запрашивает у Airtable страницами через формулу OR(RECORD_ID()=...)
+        вместо отдельного GET на каждый ингредиент
+        """
+        catalog = self._get_catalog()
+        if catalog:
+            known = catalog.get_many(INGREDIENTS, ingredient_ids)
+            ingredient_ids = [ing_id for ing_id in ingredient_ids if ing_id not in known]
+        else:
+            known = {}
+        
+        ingredient_names, missing = ingredient_cache.get_many(ingredient_ids)
+        ingredient_names.update({
+            ing_id: record['fields'].get('Ingredient Name', 'Unknown')
+            for ing_id, record in known.items()
+        })
+        if not missing:
+            return ingredient_names
         
-        # Добавляем названия
-        for item in ingredients_data:
-            item['ingredient_name'] = ingredient_names.get(item['ingredient_id'], 'Unknown')
+        table = self.api.table(self.base_id, self.ingredients_table)
+        try:
+            records = fetch_by_ids(table, missing, fields=['Ingredient Name'])
+        except Exception:
+            logger.warning(f"Error getting {len(missing)} ingredient names", exc_info=True)
+            records = []
+        fetched = {
+            record['id']: record['fields'].get('Ingredient Name', 'Unknown')
+            for record in records
+        }
         
-        return ingredients_data
+        ingredient_cache.set_many(fetched)
+        ingredient_names.update(fetched)
+        return ingredient_names
 
-    def _aggregate_ingredients(self, ingredients_data: List[Dict]) -> List[Dict]:
+    def _aggregate_ingredients(
+        self,
+        vectors: IngredientVectors,
+        recipe_servings: Dict[str, float]
+    ) -> List[Dict]:
         """
         Агрегирует ингредиенты (суммирует одинаковые)
         
-        Группирует по: ingredient_id + unit
+        Группирует по: ingredient_id + каноническая единица (г / мл / шт).
+        Цена за единицу (unit_price) берётся из того же вектора - без запросов
         """
-        aggregated = defaultdict(lambda: {'quantity': 0, 'recipes': set()})
-        
-        for item in ingredients_data:
-            key = (item['ingredient_id'], item['unit'])
-            aggregated[key]['ingredient_id'] = item['ingredient_id']
-            aggregated[key]['ingredient_name'] = item['ingredient_name']
-            aggregated[key]['unit'] = item['unit']
-            aggregated[key]['quantity'] += item['quantity']
-            aggregated[key]['recipes'].add(item.get('recipe_id', ''))
-        
-        # Конвертируем в список
-        result = []
-        for key, data in aggregated.items():
-            result.append({
-                'ingredient_id': data['ingredient_id'],
-                'ingredient_name': data['ingredient_name'],
-                'quantity': round(data['quantity'], 1),
-                'unit': data['unit'],
-                'recipe_count': len(data['recipes'])
-            })
+        lines = vectors.aggregate(recipe_servings)
+        keys = [vectors.keys[column] for column in lines.columns.tolist()]
+        ingredient_names = self._get_ingredient_names(list({ing_id for ing_id, _ in keys}))
+        if lines.unit_prices is not None:
+            unit_prices = [None if np.isnan(price) else price for price in lines.unit_prices.tolist()]
+        else:
+            unit_prices = [None] * len(keys)
+        
+        result = [
+            {
+                'ingredient_id': ingredient_id,
+                'ingredient_name': ingredient_names.get(ingredient_id, 'Unknown'),
+                'quantity': _round_quantity(quantity),
+                'unit': unit,
+                'recipe_count': recipe_count,
+                'unit_price': unit_price
+            }
+            for (ingredient_id, unit), quantity, recipe_count, unit_price in zip(
+                keys, lines.quantities.tolist(), lines.recipe_counts.tolist(), unit_prices
+            )
+        ]
         
         # Сортируем по названию
         result.sort(key=lambda x: x['ingredient_name'])
@@ -239,26 +658,27 @@ class ShoppingListService:
 
     def _create_shopping_list(
         self,
-        meal_plan_id: str,
-        meal_plan: Dict,
+        meal_plans: Dict[str, Dict],
         shopping_date: Optional[str] = None
     ) -> str:
-        """Создаёт запись Shopping List"""
+        """Создаёт запись Shopping List (связанную с одним или несколькими планами)"""
         table = self.api.table(self.base_id, self.shopping_lists_table)
         
         # Формируем название
-        plan_name = meal_plan['fields'].get('Plan Name', 'Meal Plan')
-        week_start = meal_plan['fields'].get('Week Start', '')
-        list_name = f"Shopping List - {plan_name} ({week_start})"
+        plan_names = " + ".join(
+            meal_plan['fields'].get('Plan Name', 'Meal Plan') for meal_plan in meal_plans.values()
+        )
+        week_start = min(meal_plan['fields'].get('Week Start', '') for meal_plan in meal_plans.values())
+        list_name = f"Shopping List - {plan_names} ({week_start})"
         
-        # Дата покупок (если не указана - используем Week Start)
+        # Дата покупок (если не указана - используем самую раннюю Week Start)
         if not shopping_date:
             shopping_date = week_start
         
         # Создаём запись
         record = table.create({
             'List Name': list_name,
-            'Meal Plan': [meal_plan_id],
+            'Meal Plan': list(meal_plans),
             'Shopping Date': shopping_date,
             'Status': 'Pending'
         })
@@ -268,42 +688,58 @@ class ShoppingListService:
     def _create_shopping_list_items(
         self,
         shopping_list_id: str,
-        ingredients: List[Dict]
+        ingredients: List[Dict],
+        on_chunk: Optional[Callable[[int, List[Dict]], None]] = None
     ) -> List[Dict]:
-        """Создаёт Shopping List Items (batch)"""
+        """
+        Создаёт Shopping List Items (batch)
+        
+        on_chunk вызывается после каждого созданного батча (для потоковой отдачи)
+        """
         table = self.api.table(self.base_id, self.shopping_list_items_table)
         
         # Формируем записи для batch create
-        records_to_create = []
-        for ing in ingredients:
-            # Конвертируем единицы из Recipe_Ingredients в Shopping_List_Items
-            # Recipe_Ingredients использует "гр", Shopping_List_Items использует "г"
-            unit = ing['unit']
-            if unit == 'гр':
-                unit = 'г'
-            
-            item_name = f"{ing['ingredient_name']} ({ing['quantity']}{unit})"
-            
-            record = {
-                'Item': item_name,
-                'Shopping List': [shopping_list_id],
-                'Ingredient': [ing['ingredient_id']],
-                'Quantity': ing['quantity'],
-                'Unit': unit,
-                'Purchased': False
-            }
-            records_to_create.append(record)
-        
-        # Batch create (по 10 записей)
-        created_records = []
-        batch_size = 10
+        records_to_create = [
+            {**self._item_fields(shopping_list_id, ing), 'Purchased': False}
+            for ing in ingredients
+        ]
+        
+        # Batch create (по 10 записей, чанки отправляются параллельно)
+        result = batch_writer.batch_create(table, records_to_create, on_chunk=on_chunk)
+        return result.records
+
+    def _item_fields(self, shopping_list_id: str, ing: Dict) -> Dict[str, Any]:
+        """
+        Поля Shopping List Item для агрегированного ингредиента (без Purchased)
         
-        for i in range(0, len(records_to_create), batch_size):
-            batch = records_to_create[i:i + batch_size]
-            created = table.batch_create(batch)
-            created_records.extend(created)
+        Единица уже каноническая ("г", "мл", "шт"), см. app.services.units
+        """
+        unit = ing['unit'] or ''
+        
+        fields = {
+            'Item': f"{ing['ingredient_name']} ({ing['quantity']}{unit})",
+            'Shopping List': [shopping_list_id],
+            'Ingredient': [ing['ingredient_id']],
+            'Quantity': ing['quantity'],
+            'Unit': unit
+        }
+        if SHOPPING_ITEM_COST_FIELD:
+            fields[SHOPPING_ITEM_COST_FIELD] = ing.get('estimated_cost')
+        return fields
+
+    def _get_list_items(self, shopping_list_id: str, shopping_list: Dict) -> List[Dict]:
+        """
+        Элементы списка покупок
         
-        return created_records
+        Фильтр по названию списка через FIND(ARRAYJOIN({Shopping List})),
+        затем проверка ID (названия списков могут совпадать)
+        """
+        table = self.api.table(self.base_id, self.shopping_list_items_table)
+        return fetch_linked_to(
+            table,
+            'Shopping List',
+            {shopping_list_id: shopping_list['fields'].get('List Name')}
+        )
 
     def get_shopping_list(self, shopping_list_id: str) -> Dict[str, Any]:
         """Получает информацию о списке покупок"""
@@ -312,12 +748,174 @@ class ShoppingListService:
         shopping_list = list_table.get(shopping_list_id)
         
         # Получаем items
-        items_table = self.api.table(self.base_id, self.shopping_list_items_table)
-        formula = f"{{Shopping List}} = '{shopping_list_id}'"
-        items = items_table.all(formula=formula)
+        items = self._get_list_items(shopping_list_id, shopping_list)
         
         return {
             'shopping_list': shopping_list,
             'items': items,
-            'items_count': len(items)
+            'items_count': len(items),
+            **self._price_items(items, self._get_prices())
+        }
+
+    def price_shopping_lists(self, shopping_list_ids: List[str]) -> Dict[str, Any]:
+        """
+        Оценка стоимости нескольких списков покупок (для бюджетных отчётов)
+        
+        Списки загружаются одним fetch_by_ids, элементы всех списков - одним
+        fetch_linked_to; цены берутся из кэшированного каталога
+        """
+        list_table = self.api.table(self.base_id, self.shopping_lists_table)
+        lists = {
+            record['id']: record
+            for record in fetch_by_ids(list_table, shopping_list_ids, fields=['List Name'])
+        }
+        missing = [list_id for list_id in shopping_list_ids if list_id not in lists]
+        if missing:
+            raise ValueError(f"Shopping lists not found: {', '.join(missing)}")
+        
+        items_table = self.api.table(self.base_id, self.shopping_list_items_table)
+        items = fetch_linked_to(
+            items_table,
+            'Shopping List',
+            {list_id: record['fields'].get('List Name') for list_id, record in lists.items()},
+            fields=['Ingredient', 'Quantity', 'Unit', 'Purchased']
+        )
+        items_by_list: Dict[str, List[Dict]] = {list_id: [] for list_id in lists}
+        for item in items:
+            for list_id in item['fields'].get('Shopping List', []):
+                if list_id in items_by_list:
+                    items_by_list[list_id].append(item)
+        
+        prices = self._get_prices()
+        result = []
+        for list_id in dict.fromkeys(shopping_list_ids):
+            result.append({
+                'shopping_list_id': list_id,
+                'list_name': lists[list_id]['fields'].get('List Name', ''),
+                'items_count': len(items_by_list[list_id]),
+                **self._price_items(items_by_list[list_id], prices)
+            })
+        
+        priced = [entry['estimated_cost'] for entry in result if entry['estimated_cost'] is not None]
+        return {
+            'lists': result,
+            'total_cost': round(sum(priced), 2) if priced else None,
+            'remaining_cost': round(sum(entry['remaining_cost'] or 0 for entry in result), 2) if priced else None
+        }
+
+    def _price_items(self, items: List[Dict], prices: PriceTable) -> Dict[str, Any]:
+        """Стоимость элементов списка: всего и ещё не купленного"""
+        total = remaining = 0.0
+        unpriced = 0
+        for item in items:
+            fields = item['fields']
+            ingredient = fields.get('Ingredient')
+            cost = prices.cost(ingredient[0], float(fields.get('Quantity') or 0), fields.get('Unit')) if ingredient else None
+            if cost is None:
+                unpriced += 1
+                continue
+            total += cost
+            if not fields.get('Purchased'):
+                remaining += cost
+        has_prices = unpriced < len(items)
+        return {
+            'estimated_cost': round(total, 2) if has_prices else None,
+            'remaining_cost': round(remaining, 2) if has_prices else None,
+            'unpriced_items': unpriced
+        }
+
+    def delete_shopping_list(self, shopping_list_id: str) -> Dict[str, Any]:
+        """Удаляет список покупок и все его элементы"""
+        list_table = self.api.table(self.base_id, self.shopping_lists_table)
+        lists = fetch_by_ids(list_table, [shopping_list_id], fields=self._list_fields('List Name'))
+        if not lists:
+            raise ValueError(f"Shopping list {shopping_list_id} not found")
+        return self._delete_lists(lists)
+
+    def purge_shopping_lists(
+        self,
+        older_than_days: Optional[int] = None,
+        status: Optional[str] = None,
+        meal_plan_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Удаляет списки покупок по фильтрам (условия объединяются через AND)
+        
+        Args:
+            older_than_days: созданные больше N дней назад (CREATED_TIME)
+            status: со статусом Status (например "Completed")
+            meal_plan_id: связанные с планом питания
+        """
+        if older_than_days is None and not status and not meal_plan_id:
+            raise ValueError("At least one purge filter is required")
+        
+        conditions = []
+        if older_than_days is not None:
+            conditions.append(f"IS_BEFORE(CREATED_TIME(), DATEADD(TODAY(), -{int(older_than_days)}, 'days'))")
+        if status:
+            conditions.append(f"{{Status}}='{escape_quotes(status)}'")
+        if meal_plan_id:
+            # ARRAYJOIN({Meal Plan}) возвращает названия планов - ID проверяем ниже
+            meal_plan = self._get_meal_plans([meal_plan_id])[meal_plan_id]
+            plan_name = meal_plan['fields'].get(MEAL_PLAN_PRIMARY_FIELD)
+            if plan_name:
+                conditions.append(linked_to_any('Meal Plan', [plan_name]))
+        
+        list_table = self.api.table(self.base_id, self.shopping_lists_table)
+        lists = list_table.all(
+            formula=AND(*conditions) if conditions else None,
+            fields=self._list_fields('List Name', 'Meal Plan')
+        )
+        if meal_plan_id:
+            lists = [record for record in lists if meal_plan_id in record['fields'].get('Meal Plan', [])]
+        return self._delete_lists(lists)
+
+    def _list_fields(self, *fields: str) -> List[str]:
+        """
+        Поля списка для удаления: поле резервов запрашивается только с Pantry -
+        в базе без этого поля Airtable отвечает 422 UNKNOWN_FIELD_NAME
+        """
+        return list(fields) + ([SHOPPING_LIST_PANTRY_FIELD] if self.pantry else [])
+
+    def _delete_lists(self, lists: List[Dict]) -> Dict[str, Any]:
+        """
+        Удаляет списки и их элементы
+        
+        Элементы всех списков находятся одним fetch_linked_to, удаляются
+        параллельными batch_delete по 10 записей; сами списки - после
+        элементов, чтобы при ошибке не оставалось элементов-сирот.
+        Резервы Pantry удалённых списков освобождаются
+        """
+        started = time.perf_counter()
+        if not lists:
+            return {'shopping_list_ids': [], 'lists_deleted': 0, 'items_deleted': 0, 'elapsed_ms': 0.0}
+        
+        items_table = self.api.table(self.base_id, self.shopping_list_items_table)
+        items = fetch_linked_to(
+            items_table,
+            'Shopping List',
+            {record['id']: record['fields'].get('List Name') for record in lists},
+            fields=[]
+        )
+        items_result = batch_writer.batch_delete(items_table, [item['id'] for item in items])
+        
+        list_ids = [record['id'] for record in lists]
+        list_table = self.api.table(self.base_id, self.shopping_lists_table)
+        batch_writer.batch_delete(list_table, list_ids)
+        for list_id in list_ids:
+            shopping_list_responses.invalidate(list_id)
+        
+        # Запасы, зарезервированные удалёнными списками, снова свободны
+        released: Reservations = {}
+        for record in lists:
+            for record_id, quantity in parse_reservations(record['fields'].get(SHOPPING_LIST_PANTRY_FIELD)).items():
+                released[record_id] = released.get(record_id, 0.0) - quantity
+        if released and self.pantry:
+            self.pantry.reserve(released)
+        
+        return {
+            'shopping_list_ids': list_ids,
+            'lists_deleted': len(list_ids),
+            'items_deleted': len(items_result.records),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
         }
@@ -0,0 +1,514 @@
+"""
+SQLite Storage Backend
+Локальное хранилище таблиц Airtable в SQLite (STORAGE_BACKEND=sqlite)
+
+Записи хранятся в формате Airtable ({"id", "createdTime", "fields"}),
+поэтому сервисы работают без изменений. Linked record поля из
+TABLE_SCHEMAS дополнительно раскладываются в индексированную таблицу
+links: выборки "элементы списка X" и "приёмы пищи плана Y" идут по
+индексу, а не сканированием. Обратные ссылки (Meal_Plans.Planned_Meals,
+Recipes.Recipe_Ingredients) поддерживаются так же, как в Airtable.
+
+Формула filterByFormula разбирается formula_eval: условия по ID,
+linked record полям, primary полю и времени создания/изменения
+переводятся в SQL (надмножество результата), затем формула
+проверяется точно для каждой найденной записи.
+"""
+import json
+import logging
+import secrets
+import sqlite3
+import string
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.services.formula_eval import FormulaRecord, Node, matches, parse_datetime, parse_formula
+from app.services.storage import TABLE_SCHEMAS, TableSchema, table_schema
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS records ("
+    " table_name TEXT NOT NULL, id TEXT NOT NULL, primary_value TEXT,"
+    " created_time TEXT NOT NULL, modified_time TEXT NOT NULL, fields TEXT NOT NULL,"
+    " PRIMARY KEY (table_name, id))",
+    "CREATE INDEX IF NOT EXISTS records_primary ON records (table_name, primary_value)",
+    "CREATE INDEX IF NOT EXISTS records_modified ON records (table_name, modified_time)",
+    "CREATE INDEX IF NOT EXISTS records_created ON records (table_name, created_time)",
+    "CREATE TABLE IF NOT EXISTS links ("
+    " table_name TEXT NOT NULL, field TEXT NOT NULL, record_id TEXT NOT NULL, target_id TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS links_by_target ON links (table_name, field, target_id)",
+    "CREATE INDEX IF NOT EXISTS links_by_record ON links (record_id)",
+    "CREATE INDEX IF NOT EXISTS links_target ON links (target_id)",
+)
+
+_ID_ALPHABET = string.ascii_letters + string.digits
+
+# Условие "запись ссылается через field на запись с primary значением ?"
+_LINKED_SQL = (
+    "id IN (SELECT l.record_id FROM links l JOIN records t"
+    " ON t.table_name = ? AND t.id = l.target_id"
+    " WHERE l.table_name = ? AND l.field = ? AND t.primary_value = ?)"
+)
+
+
+class RecordNotFoundError(LookupError):
+    """Записи с таким ID нет в таблице"""
+
+
+def new_record_id(prefix: str = "rec") -> str:
+    """ID в формате Airtable: префикс + 14 символов"""
+    return prefix + "".join(secrets.choice(_ID_ALPHABET) for _ in range(14))
+
+
+def _timestamp(moment: Optional[datetime] = None) -> str:
+    """Время в формате Airtable (UTC, миллисекунды) - строки сравнимы лексикографически"""
+    moment = (moment or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}Z"
+
+
+def _is_empty(value: Any) -> bool:
+    """Пустое значение поля; 0 и 0.0 не пустые (== False, но Airtable их хранит)"""
+    return value is None or value is False or (isinstance(value, (str, list)) and not value)
+
+
+def _compact(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Airtable не возвращает пустые поля (None, "", [], False)"""
+    return {name: value for name, value in fields.items() if not _is_empty(value)}
+
+
+class _Row(FormulaRecord):
+    """Запись для вычисления формулы (linked record поля -> primary значения)"""
+
+    def __init__(self, table: "SQLiteTable", row: Tuple, names: Dict[str, Optional[str]]):
+        self.record_id, self.created_time, self.modified_time = row[0], row[1], row[2]
+        self.fields = json.loads(row[3])
+        self._table = table
+        self._names = names
+
+    def field(self, name: str) -> Any:
+        value = self.fields.get(name)
+        link = self._table.schema.links.get(name)
+        if link is None or not value:
+            return value
+        return self._table.store._primary_values(link.target, value, self._names)
+
+    def to_record(self, fields: Optional[Sequence[str]] = None) -> Dict:
+        values = self.fields if fields is None else {
+            name: self.fields[name] for name in fields if name in self.fields
+        }
+        return {"id": self.record_id, "createdTime": self.created_time, "fields": values}
+
+
+class SQLiteTable:
+    """Таблица SQLiteStore с интерфейсом pyairtable.Table"""
+
+    def __init__(self, store: "SQLiteStore", schema: TableSchema):
+        self.store = store
+        self.schema = schema
+        self.name = schema.name
+
+    def __repr__(self) -> str:
+        return f"<SQLiteTable {self.name}>"
+
+    # Чтение
+
+    def get(self, record_id: str, **options: Any) -> Dict:
+        records = self.store._select(self, "id = ?", [record_id])
+        if not records:
+            raise RecordNotFoundError(f"{self.name}: record {record_id} not found")
+        return _Row(self, records[0], {}).to_record()
+
+    def all(
+        self,
+        formula: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        max_records: Optional[int] = None,
+        sort: Optional[Sequence[str]] = None,
+        **options: Any
+    ) -> List[Dict]:
+        """
+        Записи таблицы (view, page_size и прочие опции Airtable игнорируются)
+
+        sort: названия полей, "-Поле" - по убыванию
+        """
+        node = parse_formula(formula) if formula else None
+        where, params = self._plan(node) if node is not None else (None, [])
+        rows = self.store._select(self, where, params)
+
+        names: Dict[str, Optional[str]] = {}
+        candidates = [_Row(self, row, names) for row in rows]
+        if node is not None:
+            candidates = [row for row in candidates if matches(node, row)]
+        for key in reversed(sort or []):
+            descending = key.startswith("-")
+            name = key.lstrip("-")
+            candidates.sort(
+                key=lambda row: (row.fields.get(name) is None, str(row.fields.get(name, ""))),
+                reverse=descending
+            )
+        if max_records is not None:
+            candidates = candidates[:max_records]
+        return [row.to_record(fields) for row in candidates]
+
+    def first(self, **options: Any) -> Optional[Dict]:
+        records = self.all(**{**options, "max_records": 1})
+        return records[0] if records else None
+
+    # Запись
+
+    def create(self, fields: Dict, **options: Any) -> Dict:
+        return self.batch_create([fields])[0]
+
+    def batch_create(self, records: Iterable[Dict], **options: Any) -> List[Dict]:
+        return self.store._write(self, [(None, dict(fields)) for fields in records], replace=True)
+
+    def update(self, record_id: str, fields: Dict, replace: bool = False, **options: Any) -> Dict:
+        return self.batch_update([{"id": record_id, "fields": fields}], replace=replace)[0]
+
+    def batch_update(self, records: Iterable[Dict], replace: bool = False, **options: Any) -> List[Dict]:
+        return self.store._write(
+            self, [(record["id"], dict(record["fields"])) for record in records], replace=replace
+        )
+
+    def delete(self, record_id: str) -> Dict:
+        return self.batch_delete([record_id])[0]
+
+    def batch_delete(self, record_ids: Iterable[str]) -> List[Dict]:
+        return self.store._delete(self, list(record_ids))
+
+    # Формула -> SQL
+
+    def _plan(self, node: Node) -> Tuple[Optional[str], List[Any]]:
+        """
+        SQL условие, которому удовлетворяют все записи, проходящие формулу
+
+        None - сузить выборку нельзя (сканирование таблицы)
+        """
+        kind = node[0]
+        if kind == "call" and node[1] in ("AND", "OR"):
+            parts = [self._plan(arg) for arg in node[2]]
+            usable = [part for part in parts if part[0] is not None]
+            if not usable or (node[1] == "OR" and len(usable) != len(parts)):
+                return None, []
+            sql = f" {node[1]} ".join(f"({where})" for where, _ in usable)
+            return sql, [param for _, params in usable for param in params]
+
+        if kind == "op" and node[1] == "=":
+            left, right = node[2], node[3]
+            if right[0] != "lit":
+                left, right = right, left
+            if right[0] != "lit":
+                return None, []
+            if left == ("call", "RECORD_ID", ()):
+                return "id = ?", [str(right[1])]
+            if left[0] == "field":
+                return self._field_equals(left[1], str(right[1]))
+            return None, []
+
+        if kind == "call" and node[1] == "FIND" and len(node[2]) == 2 and node[2][0][0] == "lit":
+            return self._linked_find(str(node[2][0][1]), node[2][1])
+
+        if kind == "call" and node[1] in ("IS_AFTER", "IS_BEFORE") and len(node[2]) == 2:
+            column = {
+                ("call", "LAST_MODIFIED_TIME", ()): "modified_time",
+                ("call", "CREATED_TIME", ()): "created_time",
+            }.get(node[2][0])
+            if column and node[2][1][0] == "lit":
+                moment = _timestamp(parse_datetime(node[2][1][1]))
+                return f"{column} {'>' if node[1] == 'IS_AFTER' else '<'} ?", [moment]
+        return None, []
+
+    def _field_equals(self, field: str, value: str) -> Tuple[Optional[str], List[Any]]:
+        if field == self.schema.primary_field:
+            return "primary_value = ?", [value]
+        link = self.schema.links.get(field)
+        if link is not None:
+            return _LINKED_SQL, [link.target, self.name, field, value]
+        return None, []
+
+    def _linked_find(self, needle: str, haystack: Node) -> Tuple[Optional[str], List[Any]]:
+        """FIND('|v|', '|'&ARRAYJOIN({Link},'|')&'|') - связь с записью, у которой primary = v"""
+        join = _find_arrayjoin(haystack)
+        if join is None:
+            return None, []
+        field, separator = join
+        link = self.schema.links.get(field)
+        if link is None or not separator or not (needle.startswith(separator) and needle.endswith(separator)):
+            return None, []
+        value = needle[len(separator):-len(separator)]
+        if not value or separator in value:
+            return None, []
+        return _LINKED_SQL, [link.target, self.name, field, value]
+
+
+def _find_arrayjoin(node: Node) -> Optional[Tuple[str, str]]:
+    """(поле, разделитель) из ARRAYJOIN({Поле}, 'sep') внутри конкатенации"""
+    if node[0] == "op" and node[1] == "&":
+        return _find_arrayjoin(node[2]) or _find_arrayjoin(node[3])
+    if node[0] == "call" and node[1] == "ARRAYJOIN" and node[2] and node[2][0][0] == "field":
+        separator = node[2][1] if len(node[2]) > 1 else ("lit", ", ")
+        if separator[0] == "lit":
+            return node[2][0][1], str(separator[1])
+    return None
+
+
+class _SQLiteBase:
+    """base(base_id).table(name) - как pyairtable.Base"""
+
+    def __init__(self, store: "SQLiteStore", base_id: str):
+        self._store = store
+        self.id = base_id
+
+    def table(self, table_name: str) -> SQLiteTable:
+        return self._store.table(self.id, table_name)
+
+
+class SQLiteStore:
+    """
+    Хранилище всех таблиц базы в одном SQLite файле
+
+    Одно соединение на процесс под блокировкой: batch-запросы BatchWriter
+    из разных потоков выполняются по очереди, каждый - одной транзакцией
+    """
+
+    def __init__(self, path: str = ":memory:", id_prefix: str = "rec"):
+        self.path = path
+        self.id_prefix = id_prefix
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._depth = 0
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+        self._tables: Dict[str, SQLiteTable] = {}
+
+    def table(self, base_id: str, table_name: str) -> SQLiteTable:
+        """Таблица по названию или ID (base_id не используется - база одна)"""
+        table = self._tables.get(table_name)
+        if table is None:
+            table = SQLiteTable(self, table_schema(table_name))
+            self._tables[table_name] = table
+        return table
+
+    def base(self, base_id: str) -> _SQLiteBase:
+        return _SQLiteBase(self, base_id)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Транзакция, объединяющая несколько операций хранилища
+
+        Вложенные вызовы (batch_create внутри transaction()) не фиксируют
+        изменения сами - commit / rollback выполняет внешний блок
+        """
+        with self._lock:
+            self._depth += 1
+            try:
+                yield self._conn
+            except BaseException:
+                self._depth -= 1
+                if not self._depth:
+                    self._conn.rollback()
+                raise
+            self._depth -= 1
+            if not self._depth:
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Количество записей по таблицам"""
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT table_name, COUNT(*) FROM records GROUP BY table_name"
+            ))
+
+    def import_records(self, table_name: str, records: Iterable[Dict]) -> int:
+        """
+        Загружает записи Airtable как есть (ID и createdTime сохраняются)
+
+        Обратные ссылки не пересчитываются - в выгрузке Airtable они уже есть
+        """
+        table = self.table("", table_name)
+        now = _timestamp()
+        rows, links = [], []
+        for record in records:
+            fields = _compact(record["fields"])
+            rows.append(self._row_values(table, record["id"], record.get("createdTime") or now, now, fields))
+            links.extend(self._link_rows(table, record["id"], fields))
+        with self.transaction():
+            self._conn.executemany(
+                "DELETE FROM links WHERE table_name = ? AND record_id = ?",
+                [(table.name, row[1]) for row in rows]
+            )
+            self._conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._conn.executemany("INSERT INTO links VALUES (?, ?, ?, ?)", links)
+        return len(rows)
+
+    def copy_from(self, source: Any, base_id: str, tables: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Копирует таблицы из другого хранилища (например, снимок базы Airtable)
+
+        >>> SQLiteStore("camper.db").copy_from(registry.api, "appBgJb1hzG4vFT1b")
+        """
+        counts = {}
+        for name in tables or TABLE_SCHEMAS:
+            schema = table_schema(name)
+            records = source.table(base_id, schema.table_id or schema.name).all()
+            counts[schema.name] = self.import_records(schema.name, records)
+        logger.info(f"SQLite store loaded: {counts}")
+        return counts
+
+    # Внутреннее (вызывается из SQLiteTable)
+
+    def _select(self, table: SQLiteTable, where: Optional[str], params: List[Any]) -> List[Tuple]:
+        sql = "SELECT id, created_time, modified_time, fields FROM records WHERE table_name = ?"
+        if where:
+            sql += f" AND ({where})"
+        with self._lock:
+            return self._conn.execute(sql, [table.name, *params]).fetchall()
+
+    def _primary_values(
+        self,
+        table_name: str,
+        record_ids: List[str],
+        cache: Dict[str, Optional[str]]
+    ) -> List[Optional[str]]:
+        """Primary значения связанных записей (с кэшем на время одного запроса)"""
+        missing = [record_id for record_id in record_ids if record_id not in cache]
+        if missing:
+            placeholders = ",".join("?" * len(missing))
+            with self._lock:
+                found = dict(self._conn.execute(
+                    f"SELECT id, primary_value FROM records WHERE table_name = ? AND id IN ({placeholders})",
+                    [table_name, *missing]
+                ))
+            for record_id in missing:
+                cache[record_id] = found.get(record_id)
+        return [cache[record_id] for record_id in record_ids]
+
+    def _row_values(self, table: SQLiteTable, record_id: str, created: str, modified: str, fields: Dict) -> Tuple:
+        primary = fields.get(table.schema.primary_field)
+        return (
+            table.name, record_id, str(primary) if primary is not None else None,
+            created, modified, json.dumps(fields, ensure_ascii=False)
+        )
+
+    def _link_rows(self, table: SQLiteTable, record_id: str, fields: Dict) -> List[Tuple]:
+        return [
+            (table.name, field, record_id, target_id)
+            for field in table.schema.links
+            for target_id in fields.get(field) or []
+        ]
+
+    def _load_fields(self, table_name: str, record_id: str) -> Optional[Tuple[str, Dict]]:
+        row = self._conn.execute(
+            "SELECT created_time, fields FROM records WHERE table_name = ? AND id = ?",
+            (table_name, record_id)
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def _store_fields(
+        self,
+        table: SQLiteTable,
+        record_id: str,
+        created: str,
+        fields: Dict,
+        now: str
+    ) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)",
+            self._row_values(table, record_id, created, now, fields)
+        )
+        self._conn.execute(
+            "DELETE FROM links WHERE table_name = ? AND record_id = ?", (table.name, record_id)
+        )
+        self._conn.executemany("INSERT INTO links VALUES (?, ?, ?, ?)", self._link_rows(table, record_id, fields))
+
+    def _write(
+        self,
+        table: SQLiteTable,
+        changes: List[Tuple[Optional[str], Dict]],
+        replace: bool
+    ) -> List[Dict]:
+        """Создаёт (record_id=None) или обновляет записи одной транзакцией"""
+        now = _timestamp()
+        result = []
+        with self.transaction():
+            for record_id, fields in changes:
+                if record_id is None:
+                    record_id, created, old_fields = new_record_id(self.id_prefix), now, {}
+                else:
+                    loaded = self._load_fields(table.name, record_id)
+                    if loaded is None:
+                        raise RecordNotFoundError(f"{table.name}: record {record_id} not found")
+                    created, old_fields = loaded
+                new_fields = _compact(fields if replace else {**old_fields, **fields})
+                self._store_fields(table, record_id, created, new_fields, now)
+                self._sync_inverse(table, record_id, old_fields, new_fields, now)
+                result.append({"id": record_id, "createdTime": created, "fields": new_fields})
+        return result
+
+    def _delete(self, table: SQLiteTable, record_ids: List[str]) -> List[Dict]:
+        """Удаляет записи и ссылки на них из linked record полей других записей"""
+        if not record_ids:
+            return []
+        now = _timestamp()
+        with self.transaction():
+            for record_id in record_ids:
+                if self._load_fields(table.name, record_id) is None:
+                    raise RecordNotFoundError(f"{table.name}: record {record_id} not found")
+            placeholders = ",".join("?" * len(record_ids))
+            referencing = self._conn.execute(
+                f"SELECT DISTINCT table_name, record_id FROM links WHERE target_id IN ({placeholders})",
+                record_ids
+            ).fetchall()
+            self._conn.execute(
+                f"DELETE FROM records WHERE table_name = ? AND id IN ({placeholders})",
+                [table.name, *record_ids]
+            )
+            self._conn.execute(f"DELETE FROM links WHERE record_id IN ({placeholders})", record_ids)
+
+            deleted = set(record_ids)
+            for table_name, record_id in referencing:
+                if record_id in deleted:
+                    continue
+                referencing_table = self.table("", table_name)
+                created, fields = self._load_fields(table_name, record_id)
+                for field in referencing_table.schema.links:
+                    if field in fields:
+                        fields[field] = [target for target in fields[field] if target not in deleted]
+                self._store_fields(referencing_table, record_id, created, _compact(fields), now)
+        return [{"id": record_id, "deleted": True} for record_id in record_ids]
+
+    def _sync_inverse(
+        self,
+        table: SQLiteTable,
+        record_id: str,
+        old_fields: Dict,
+        new_fields: Dict,
+        now: str
+    ) -> None:
+        """Обновляет обратные linked record поля связанных записей"""
+        for field, link in table.schema.links.items():
+            if not link.inverse:
+                continue
+            old_targets = set(old_fields.get(field) or [])
+            new_targets = set(new_fields.get(field) or [])
+            for target_id in old_targets ^ new_targets:
+                loaded = self._load_fields(link.target, target_id)
+                if loaded is None:
+                    continue
+                created, target_fields = loaded
+                linked = [linked_id for linked_id in target_fields.get(link.inverse) or [] if linked_id != record_id]
+                if target_id in new_targets:
+                    linked.append(record_id)
+                target_fields[link.inverse] = linked
+                self._store_fields(self.table("", link.target), target_id, created, _compact(target_fields), now)
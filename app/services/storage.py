@@ -0,0 +1,131 @@
+"""
+Storage Backends
+Интерфейс хранилища таблиц: Airtable (pyairtable) или локальный SQLite
+
+Сервисы работают с хранилищем так же, как с pyairtable:
+backend.table(base_id, table) -> таблица с get / all / first / create /
+update / delete и batch_create / batch_update / batch_delete.
+ScheduledApi реализует интерфейс как есть, SQLiteStore - локально
+(нагрузочные тесты, бенчмарки, работа без сети).
+
+STORAGE_BACKEND=airtable | sqlite | writebehind выбирает реализацию для
+реестра сервисов (writebehind - локальный журнал записи, см. write_behind.py).
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Protocol
+
+from app.config import (
+    MEAL_PLAN_MEALS_FIELD,
+    MEAL_PLAN_PRIMARY_FIELD,
+    RECIPE_INGREDIENTS_FIELD,
+    RECIPE_PRIMARY_FIELD,
+    SQLITE_STORE_PATH,
+    STORAGE_BACKEND,
+)
+from app.services.airtable import create_api
+
+
+class StorageTable(Protocol):
+    """Таблица хранилища (подмножество pyairtable.Table, которое использует приложение)"""
+
+    def get(self, record_id: str) -> Dict: ...
+
+    def all(self, **options: Any) -> List[Dict]: ...
+
+    def first(self, **options: Any) -> Optional[Dict]: ...
+
+    def create(self, fields: Dict) -> Dict: ...
+
+    def update(self, record_id: str, fields: Dict) -> Dict: ...
+
+    def delete(self, record_id: str) -> Dict: ...
+
+    def batch_create(self, records: Iterable[Dict]) -> List[Dict]: ...
+
+    def batch_update(self, records: Iterable[Dict]) -> List[Dict]: ...
+
+    def batch_delete(self, record_ids: Iterable[str]) -> List[Dict]: ...
+
+
+class StorageBackend(Protocol):
+    """Хранилище таблиц (pyairtable.Api, SQLiteStore или WriteBehindStore)"""
+
+    def table(self, base_id: str, table_name: str) -> StorageTable: ...
+
+    def base(self, base_id: str) -> Any: ...
+
+
+@dataclass(frozen=True)
+class LinkField:
+    """Linked record поле: таблица-цель и обратное поле в ней (если есть)"""
+    target: str
+    inverse: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class TableSchema:
+    """Схема таблицы для локального хранилища"""
+    name: str
+    table_id: Optional[str]
+    primary_field: str
+    links: Dict[str, LinkField] = field(default_factory=dict)
+
+
+# Таблицы базы (ID совпадают с теми, что используют сервисы)
+TABLE_SCHEMAS: Dict[str, TableSchema] = {
+    schema.name: schema for schema in (
+        TableSchema("Meal_Plans", "tblupjJEeV2Cg4eum", MEAL_PLAN_PRIMARY_FIELD, {
+            MEAL_PLAN_MEALS_FIELD: LinkField("Planned_Meals", inverse="Meal Plan"),
+        }),
+        TableSchema("Planned_Meals", "tblurMbEfbKrRtGzy", "Meal Name", {
+            "Meal Plan": LinkField("Meal_Plans", inverse=MEAL_PLAN_MEALS_FIELD),
+            "Recipe": LinkField("Recipes"),
+        }),
+        TableSchema("Recipes", "tblgge1WnUvQSnMCh", RECIPE_PRIMARY_FIELD, {
+            RECIPE_INGREDIENTS_FIELD: LinkField("Recipe_Ingredients", inverse="Recipes 2"),
+        }),
+        TableSchema("Recipe_Ingredients", "tblfavu2FgY4QesHq", "Name", {
+            "Recipes 2": LinkField("Recipes", inverse=RECIPE_INGREDIENTS_FIELD),
+            "Ingredients": LinkField("Ingredients"),
+        }),
+        TableSchema("Ingredients", "tblrLuTY8hX8HqEfE", "Ingredient Name"),
+        TableSchema("Shopping_Lists", "tblw3kjvCpD98webq", "List Name", {
+            "Meal Plan": LinkField("Meal_Plans"),
+        }),
+        TableSchema("Shopping_List_Items", "tblnEuDxnpWZ3gEIe", "Item", {
+            "Shopping List": LinkField("Shopping_Lists"),
+            "Ingredient": LinkField("Ingredients"),
+        }),
+    )
+}
+
+_TABLE_IDS = {schema.table_id: name for name, schema in TABLE_SCHEMAS.items() if schema.table_id}
+
+
+def table_schema(table_name: str) -> TableSchema:
+    """
+    Схема по названию или ID таблицы
+
+    Неизвестные таблицы (например Pantry) - без linked record полей
+    """
+    name = _TABLE_IDS.get(table_name, table_name)
+    return TABLE_SCHEMAS.get(name) or TableSchema(name, None, "Name")
+
+
+def create_storage(api_key: Optional[str], backend: str = STORAGE_BACKEND) -> StorageBackend:
+    """Хранилище для реестра сервисов"""
+    if backend == "sqlite":
+        from app.services.sqlite_store import SQLiteStore
+        return SQLiteStore(SQLITE_STORE_PATH)
+    if backend == "writebehind":
+        from app.services.write_behind import WriteBehindStore
+        return WriteBehindStore(create_api(api_key))
+    if backend != "airtable":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    return create_api(api_key)
+
+
+def close_storage(storage: StorageBackend) -> None:
+    """Закрыть HTTP сессию (Airtable) или соединение (SQLite)"""
+    session = getattr(storage, "session", None)
+    (session or storage).close()
@@ -0,0 +1,83 @@
+"""
+Server-Sent Events
+Потоковая отдача прогресса пайплайнов (text/event-stream)
+"""
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from app.services.executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # nginx не должен буферизовать поток
+}
+
+# Закрытие очереди событий
+_DONE = object()
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Одно SSE-сообщение"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def stream_pipeline(
+    func: Callable[..., Dict[str, Any]],
+    *args: Any,
+    result_formatter: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    error_formatter: Optional[Callable[[Exception], Dict[str, Any]]] = None,
+    **kwargs: Any
+) -> AsyncIterator[str]:
+    """
+    Запускает пайплайн в пуле потоков и отдаёт его события как SSE
+
+    func вызывается с on_progress=...; каждое событие колбэка (stage,
+    items, ...) сразу уходит клиенту. В конце - событие result или error.
+
+    Если клиент отключился, пайплайн дорабатывает до конца (как и обычный
+    запрос), его события просто отбрасываются.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def on_progress(event: str, data: Dict[str, Any]) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    async def run() -> Dict[str, Any]:
+        try:
+            return await run_blocking(func, *args, on_progress=on_progress, **kwargs)
+        finally:
+            queue.put_nowait(_DONE)
+
+    task = asyncio.ensure_future(run())
+    # Первый байт - сразу, не дожидаясь первого шага
+    yield ": stream started\n\n"
+
+    try:
+        while True:
+            message = await queue.get()
+            if message is _DONE:
+                break
+            yield format_sse(*message)
+
+        try:
+            result = task.result()
+        except Exception as e:
+            logger.error(f"Streaming pipeline failed: {e}")
+            data = error_formatter(e) if error_formatter else {"detail": str(e)}
+            yield format_sse("error", data)
+        else:
+            yield format_sse("result", result_formatter(result) if result_formatter else result)
+    finally:
+        if not task.done():
+            task.add_done_callback(_log_orphaned_failure)
+
+
+def _log_orphaned_failure(task: "asyncio.Future") -> None:
+    if not task.cancelled() and task.exception():
+        logger.error(f"Pipeline failed after client disconnected: {task.exception()}")
@@ -0,0 +1,126 @@
+"""
+Units of Measure
+Реестр единиц измерения и перевод в канонические единицы
+
+Каждая единица относится к измерению (масса / объём / штуки) и
+переводится в каноническую единицу измерения множителем:
+"кг" -> 1000 "г", "ст.л." -> 15 "мл". Для отдельных ингредиентов
+плотность (г/мл) и вес штуки (г) позволяют перевести объём и штуки
+в граммы, чтобы "200 мл" и "100 г" молока попали в одну строку.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.config import INGREDIENT_DENSITY_FIELD, INGREDIENT_PIECE_WEIGHT_FIELD
+
+MASS = "mass"
+VOLUME = "volume"
+COUNT = "count"
+
+# Каноническая единица каждого измерения (так пишутся Shopping_List_Items)
+CANONICAL_UNITS = {MASS: "г", VOLUME: "мл", COUNT: "шт"}
+
+# Единица -> (измерение, множитель к канонической единице)
+# Написания сравниваются без регистра и пробелов
+UNIT_TABLE: Dict[str, Tuple[str, float]] = {
+    # масса
+    "г": (MASS, 1), "гр": (MASS, 1), "грамм": (MASS, 1), "g": (MASS, 1),
+    "кг": (MASS, 1000), "kg": (MASS, 1000),
+    "мг": (MASS, 0.001), "mg": (MASS, 0.001),
+    # объём
+    "мл": (VOLUME, 1), "ml": (VOLUME, 1),
+    "л": (VOLUME, 1000), "l": (VOLUME, 1000),
+    "ч.л.": (VOLUME, 5), "tsp": (VOLUME, 5),
+    "ст.л.": (VOLUME, 15), "tbsp": (VOLUME, 15),
+    "стакан": (VOLUME, 250), "cup": (VOLUME, 250),
+    # штуки
+    "шт": (COUNT, 1), "шт.": (COUNT, 1), "pcs": (COUNT, 1),
+}
+
+
+def _unit_key(unit: str) -> str:
+    return "".join(unit.split()).lower()
+
+
+@dataclass(frozen=True)
+class IngredientUnits:
+    """Переопределения для ингредиента: плотность (г/мл) и вес одной штуки (г)"""
+    density: Optional[float] = None
+    piece_weight: Optional[float] = None
+
+
+class UnitConverter:
+    """
+    Перевод количеств в канонические единицы
+
+    Реестр компилируется в таблицы поиска: написание единицы -> индекс,
+    индекс -> (множитель, каноническая единица), поэтому перевод строки
+    Recipe_Ingredients - один поиск в dict и одно умножение
+
+    >>> units = UnitConverter()
+    >>> units.convert("rec...", 1.5, "кг")
+    (1500.0, 'г')
+    """
+
+    def __init__(
+        self,
+        overrides: Optional[Dict[str, IngredientUnits]] = None,
+        table: Dict[str, Tuple[str, float]] = UNIT_TABLE
+    ):
+        self.overrides = overrides or {}
+        self._index: Dict[str, int] = {}
+        dimensions: List[str] = []
+        factors: List[float] = []
+        for spelling, (dimension, factor) in table.items():
+            self._index[_unit_key(spelling)] = len(factors)
+            dimensions.append(dimension)
+            factors.append(factor)
+        self.dimensions = dimensions
+        self.factors = factors
+        self.canonical = [CANONICAL_UNITS[dimension] for dimension in dimensions]
+
+    @classmethod
+    def from_ingredients(cls, ingredients: Iterable[Dict]) -> "UnitConverter":
+        """Переопределения из записей таблицы Ingredients (поля плотности и веса штуки)"""
+        overrides = {}
+        for record in ingredients:
+            fields = record["fields"]
+            density = fields.get(INGREDIENT_DENSITY_FIELD)
+            piece_weight = fields.get(INGREDIENT_PIECE_WEIGHT_FIELD)
+            if density or piece_weight:
+                overrides[record["id"]] = IngredientUnits(
+                    density=float(density) if density else None,
+                    piece_weight=float(piece_weight) if piece_weight else None
+                )
+        return cls(overrides)
+
+    def convert(
+        self,
+        ingredient_id: str,
+        quantity: float,
+        unit: Optional[str]
+    ) -> Tuple[float, Optional[str]]:
+        """
+        Количество в канонической единице
+
+        Неизвестные единицы возвращаются как есть (без пробелов по краям)
+        """
+        if unit is None:
+            return quantity, None
+        index = self._index.get(_unit_key(unit))
+        if index is None:
+            return quantity, unit.strip()
+
+        quantity = quantity * self.factors[index]
+        dimension = self.dimensions[index]
+        override = self.overrides.get(ingredient_id)
+        if override:
+            if dimension == VOLUME and override.density:
+                return quantity * override.density, CANONICAL_UNITS[MASS]
+            if dimension == COUNT and override.piece_weight:
+                return quantity * override.piece_weight, CANONICAL_UNITS[MASS]
+        return quantity, self.canonical[index]
+
+
+# Реестр без переопределений по ингредиентам
+default_units = UnitConverter()
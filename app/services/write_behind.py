@@ -0,0 +1,445 @@
+"""
+Write-Behind Store
+Локальная запись с фоновой синхронизацией в Airtable (STORAGE_BACKEND=writebehind)
+
+Запись (create / update / delete) фиксируется в локальном SQLite вместе
+с журналом операций одной транзакцией и сразу возвращается, поэтому
+время ответа не зависит от сети. Новые записи получают временные ID
+(tmp...). Фоновый поток отправляет журнал в Airtable по порядку, батчами
+по 10 записей; после создания записи временный ID сопоставляется с
+настоящим, и ссылки на него в следующих операциях заменяются при отправке.
+
+Чтение идёт в Airtable, поверх добавляются ещё не отправленные записи.
+Временные ID остаются действительными и после синхронизации: в запросах
+они заменяются на настоящие, в ответах настоящие - обратно на временные.
+Выборка только по ID ещё не отправленных записей работает без сети.
+
+Повторы: сетевые ошибки и 5xx - с экспоненциальной задержкой, пока не
+пройдут (очередь ждёт, порядок сохраняется); 4xx кроме 429 - операция
+помечается failed и остаётся в журнале для разбора.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.config import (
+    AIRTABLE_BATCH_SIZE,
+    WRITE_BEHIND_BATCH,
+    WRITE_BEHIND_DB_PATH,
+    WRITE_BEHIND_POLL_INTERVAL,
+    WRITE_BEHIND_RETRY_BASE_DELAY,
+    WRITE_BEHIND_RETRY_MAX_DELAY,
+)
+from app.services.formula_eval import FormulaError, parse_formula, record_ids
+from app.services.formulas import chunked
+from app.services.scheduler import Priority, airtable_priority
+from app.services.sqlite_store import RecordNotFoundError, SQLiteStore
+from app.services.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+PROVISIONAL_PREFIX = "tmp"
+
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+
+_JOURNAL_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS journal ("
+    " seq INTEGER PRIMARY KEY AUTOINCREMENT, base_id TEXT NOT NULL, table_name TEXT NOT NULL,"
+    " op TEXT NOT NULL, record_id TEXT NOT NULL, fields TEXT,"
+    " status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,"
+    " next_attempt_at REAL NOT NULL DEFAULT 0, last_error TEXT, created_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS journal_status ON journal (status, seq)",
+    "CREATE TABLE IF NOT EXISTS id_map ("
+    " provisional_id TEXT PRIMARY KEY, real_id TEXT NOT NULL UNIQUE,"
+    " table_name TEXT NOT NULL, synced_at REAL NOT NULL)",
+)
+
+_PROVISIONAL_RE = re.compile(PROVISIONAL_PREFIX + r"[A-Za-z0-9]{14}")
+
+
+def is_provisional(record_id: Any) -> bool:
+    """Временный ID (запись создана локально)"""
+    return isinstance(record_id, str) and _PROVISIONAL_RE.fullmatch(record_id) is not None
+
+
+def _is_permanent(error: Exception) -> bool:
+    """4xx кроме 429: повтор не поможет (неверные поля, нет доступа)"""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status is not None and 400 <= status < 500 and status != 429
+
+
+def _map_fields(fields: Dict[str, Any], mapping: Dict[str, str]) -> Dict[str, Any]:
+    """Заменяет ID в linked record полях (списках ID) по mapping"""
+    return {
+        name: [mapping.get(item, item) if isinstance(item, str) else item for item in value]
+        if isinstance(value, list) else value
+        for name, value in fields.items()
+    }
+
+
+@dataclass
+class _Operation:
+    """Операция для отправки (подряд идущие update / delete одной записи объединяются)"""
+    record_id: str
+    fields: Dict[str, Any]
+    seqs: List[int] = field(default_factory=list)
+
+
+class WriteBehindTable:
+    """Таблица WriteBehindStore с интерфейсом pyairtable.Table"""
+
+    def __init__(self, store: "WriteBehindStore", base_id: str, table_name: str):
+        self.store = store
+        self.base_id = base_id
+        self.table_name = table_name
+        self.local = store.local.table(base_id, table_name)
+        self.name = self.local.name
+
+    def _remote(self):
+        return self.store.remote.table(self.base_id, self.table_name)
+
+    # Чтение
+
+    def get(self, record_id: str, **options: Any) -> Dict:
+        real_id = self.store.real_ids.get(record_id)
+        if is_provisional(record_id) and real_id is None:
+            return self.local.get(record_id)
+        return self.store._from_remote(self._remote().get(real_id or record_id, **options))
+
+    def all(self, **options: Any) -> List[Dict]:
+        """Записи Airtable + ещё не отправленные локальные записи"""
+        pending = self._pending(**options)
+        formula = options.get("formula")
+        if formula:
+            try:
+                ids = record_ids(parse_formula(formula))
+            except FormulaError:
+                ids = None
+            if ids and all(is_provisional(i) and i not in self.store.real_ids for i in ids):
+                return pending
+            options = {**options, "formula": self.store._to_remote_formula(formula)}
+
+        records = [self.store._from_remote(record) for record in self._remote().all(**options)]
+        records.extend(pending)
+        max_records = options.get("max_records")
+        return records[:max_records] if max_records else records
+
+    def first(self, **options: Any) -> Optional[Dict]:
+        records = self.all(**{**options, "max_records": 1})
+        return records[0] if records else None
+
+    def _pending(self, **options: Any) -> List[Dict]:
+        try:
+            records = self.local.all(**options)
+        except FormulaError as e:
+            logger.warning(f"{self.name}: pending records skipped, formula not supported locally: {e}")
+            return []
+        return [record for record in records if record["id"] not in self.store.real_ids]
+
+    # Запись
+
+    def create(self, fields: Dict, **options: Any) -> Dict:
+        return self.batch_create([fields])[0]
+
+    def batch_create(self, records: Iterable[Dict], **options: Any) -> List[Dict]:
+        records = [dict(fields) for fields in records]
+        with self.store.local.transaction():
+            created = self.local.batch_create(records)
+            self.store._journal(self, CREATE, [
+                (record["id"], fields) for record, fields in zip(created, records)
+            ])
+        self.store.wake()
+        return created
+
+    def update(self, record_id: str, fields: Dict, **options: Any) -> Dict:
+        return self.batch_update([{"id": record_id, "fields": fields}])[0]
+
+    def batch_update(self, records: Iterable[Dict], **options: Any) -> List[Dict]:
+        """Обновляет локальную копию (если есть); запись из Airtable - только через журнал"""
+        records = [{"id": record["id"], "fields": dict(record["fields"])} for record in records]
+        result = []
+        with self.store.local.transaction():
+            for record in records:
+                try:
+                    result.append(self.local.update(record["id"], record["fields"]))
+                except RecordNotFoundError:
+                    result.append({"id": record["id"], "createdTime": None, "fields": record["fields"]})
+            self.store._journal(self, UPDATE, [(record["id"], record["fields"]) for record in records])
+        self.store.wake()
+        return result
+
+    def delete(self, record_id: str) -> Dict:
+        return self.batch_delete([record_id])[0]
+
+    def batch_delete(self, record_ids: Iterable[str]) -> List[Dict]:
+        record_ids = list(record_ids)
+        with self.store.local.transaction():
+            for record_id in record_ids:
+                try:
+                    self.local.delete(record_id)
+                except RecordNotFoundError:
+                    pass
+            self.store._journal(self, DELETE, [(record_id, None) for record_id in record_ids])
+        self.store.wake()
+        return [{"id": record_id, "deleted": True} for record_id in record_ids]
+
+
+class _WriteBehindBase:
+    """base(base_id).table(name) - как pyairtable.Base"""
+
+    def __init__(self, store: "WriteBehindStore", base_id: str):
+        self._store = store
+        self.id = base_id
+
+    def table(self, table_name: str) -> WriteBehindTable:
+        return self._store.table(self.id, table_name)
+
+
+class WriteBehindStore:
+    """
+    Хранилище: локальный журнал записи + Airtable для чтения
+
+    >>> store = WriteBehindStore(create_api(api_key))
+    >>> plan = store.table(base_id, "Meal_Plans").create({...})  # без сети, ID "tmp..."
+    """
+
+    def __init__(self, remote: StorageBackend, path: str = WRITE_BEHIND_DB_PATH, start: bool = True):
+        self.remote = remote
+        self.local = SQLiteStore(path, id_prefix=PROVISIONAL_PREFIX)
+        with self.local.transaction() as conn:
+            for statement in _JOURNAL_SCHEMA:
+                conn.execute(statement)
+            pairs = conn.execute("SELECT provisional_id, real_id FROM id_map").fetchall()
+        self.real_ids: Dict[str, str] = dict(pairs)  # временный -> настоящий
+        self.provisional_ids: Dict[str, str] = {real: provisional for provisional, real in pairs}
+        self.last_error: Optional[str] = None
+        self.last_sync_at: Optional[datetime] = None
+        self._synced_since_compact = bool(pairs)
+        self._tables: Dict[Tuple[str, str], WriteBehindTable] = {}
+        self._sync_lock = threading.Lock()  # фоновый поток и flush() не отправляют одно и то же
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if start:
+            self.start()
+
+    def table(self, base_id: str, table_name: str) -> WriteBehindTable:
+        table = self._tables.get((base_id, table_name))
+        if table is None:
+            table = WriteBehindTable(self, base_id, table_name)
+            self._tables[(base_id, table_name)] = table
+        return table
+
+    def base(self, base_id: str) -> _WriteBehindBase:
+        return _WriteBehindBase(self, base_id)
+
+    # Фоновая синхронизация
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-behind-sync", daemon=True)
+            self._thread.start()
+
+    def wake(self) -> None:
+        """Разбудить синхронизацию (после новой записи в журнал)"""
+        self._wake.set()
+
+    def close(self) -> None:
+        """Остановить синхронизацию (журнал сохраняется и отправится после рестарта)"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.local.close()
+        session = getattr(self.remote, "session", None)
+        if session is not None:
+            session.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = self.sync_once()
+            except Exception as e:
+                logger.error(f"Write-behind sync failed: {e}")
+                processed = 0
+            if not processed:
+                self._wake.wait(WRITE_BEHIND_POLL_INTERVAL)
+                self._wake.clear()
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Отправить журнал сейчас (True - ожидающих операций не осталось)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self._count_pending():
+                self.sync_once()  # пустой проход удаляет локальные копии отправленных записей
+                return True
+            if not self.sync_once():
+                time.sleep(0.1)  # первая операция ждёт повтора
+        return not self._count_pending()
+
+    def sync_once(self) -> int:
+        """
+        Отправляет следующую группу операций журнала
+
+        Группа - подряд идущие операции одного типа над одной таблицей
+        (не больше WRITE_BEHIND_BATCH), отправляются чанками по 10.
+
+        Returns:
+            сколько операций журнала обработано (0 - нечего отправлять сейчас)
+        """
+        with self._sync_lock:
+            return self._sync_group()
+
+    def _sync_group(self) -> int:
+        with self.local.transaction() as conn:
+            rows = conn.execute(
+                "SELECT seq, base_id, table_name, op, record_id, fields, next_attempt_at"
+                " FROM journal WHERE status = 'pending' ORDER BY seq LIMIT ?",
+                (WRITE_BEHIND_BATCH,)
+            ).fetchall()
+        if not rows:
+            self._compact()
+            return 0
+        base_id, table_name, op, next_attempt_at = rows[0][1], rows[0][2], rows[0][3], rows[0][6]
+        if next_attempt_at > time.time():
+            return 0
+
+        operations: List[_Operation] = []
+        for seq, row_base, row_table, row_op, record_id, fields, _ in rows:
+            if (row_base, row_table, row_op) != (base_id, table_name, op):
+                break
+            fields = json.loads(fields) if fields else {}
+            if op != CREATE and operations and operations[-1].record_id == record_id:
+                operations[-1].fields.update(fields)
+                operations[-1].seqs.append(seq)
+            else:
+                operations.append(_Operation(record_id, fields, [seq]))
+
+        table = self.remote.table(base_id, table_name)
+        processed = 0
+        for chunk in chunked(operations, AIRTABLE_BATCH_SIZE):
+            try:
+                with airtable_priority(Priority.BULK):
+                    results = self._send(table, op, chunk)
+            except Exception as e:
+                self._failed(table_name, op, chunk, e)
+                if not _is_permanent(e):
+                    return processed
+            else:
+                self._synced(table_name, op, chunk, results)
+            processed += sum(len(operation.seqs) for operation in chunk)
+        return processed
+
+    def _send(self, table, op: str, chunk: List[_Operation]) -> List[Dict]:
+        real_ids = self.real_ids
+        if op == CREATE:
+            return table.batch_create([_map_fields(item.fields, real_ids) for item in chunk])
+        if op == UPDATE:
+            return table.batch_update([
+                {"id": real_ids.get(item.record_id, item.record_id), "fields": _map_fields(item.fields, real_ids)}
+                for item in chunk
+            ])
+        return table.batch_delete([real_ids.get(item.record_id, item.record_id) for item in chunk])
+
+    def _synced(self, table_name: str, op: str, chunk: List[_Operation], results: List[Dict]) -> None:
+        now = time.time()
+        with self.local.transaction() as conn:
+            if op == CREATE:
+                pairs = [(item.record_id, record["id"]) for item, record in zip(chunk, results)]
+                conn.executemany(
+                    "INSERT OR REPLACE INTO id_map VALUES (?, ?, ?, ?)",
+                    [(provisional, real, table_name, now) for provisional, real in pairs]
+                )
+                for provisional, real in pairs:
+                    self.real_ids[provisional] = real
+                    self.provisional_ids[real] = provisional
+                self._synced_since_compact = True
+            conn.executemany(
+                "DELETE FROM journal WHERE seq = ?",
+                [(seq,) for item in chunk for seq in item.seqs]
+            )
+        self.last_sync_at = datetime.now(timezone.utc)
+        logger.info(f"Write-behind: {op} {table_name} x{len(chunk)} synced")
+
+    def _failed(self, table_name: str, op: str, chunk: List[_Operation], error: Exception) -> None:
+        self.last_error = f"{op} {table_name}: {type(error).__name__}: {error}"
+        permanent = _is_permanent(error)
+        seqs = [seq for item in chunk for seq in item.seqs]
+        with self.local.transaction() as conn:
+            attempts = conn.execute(
+                f"SELECT MAX(attempts) FROM journal WHERE seq IN ({','.join('?' * len(seqs))})", seqs
+            ).fetchone()[0] + 1
+            delay = min(WRITE_BEHIND_RETRY_BASE_DELAY * 2 ** (attempts - 1), WRITE_BEHIND_RETRY_MAX_DELAY)
+            conn.executemany(
+                "UPDATE journal SET attempts = ?, last_error = ?, next_attempt_at = ?, status = ? WHERE seq = ?",
+                [
+                    (attempts, str(error), time.time() + delay, "failed" if permanent else "pending", seq)
+                    for seq in seqs
+                ]
+            )
+        if permanent:
+            logger.error(f"Write-behind: {self.last_error} (marked failed)")
+        else:
+            logger.warning(f"Write-behind: {self.last_error} (attempt {attempts}, retry in {delay:.0f}s)")
+
+    def _compact(self) -> None:
+        """Журнал пуст - локальные копии отправленных записей больше не нужны"""
+        if not self._synced_since_compact:
+            return
+        with self.local.transaction() as conn:
+            conn.execute("DELETE FROM records WHERE id IN (SELECT provisional_id FROM id_map)")
+            conn.execute("DELETE FROM links WHERE record_id IN (SELECT provisional_id FROM id_map)")
+        self._synced_since_compact = False
+
+    # Журнал и ID
+
+    def _journal(self, table: WriteBehindTable, op: str, entries: List[Tuple[str, Optional[Dict]]]) -> None:
+        """Добавляет операции в журнал (вызывать внутри local.transaction())"""
+        now = time.time()
+        self.local._conn.executemany(
+            "INSERT INTO journal (base_id, table_name, op, record_id, fields, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (table.base_id, table.table_name, op, record_id,
+                 json.dumps(fields, ensure_ascii=False) if fields is not None else None, now)
+                for record_id, fields in entries
+            ]
+        )
+
+    def _count_pending(self) -> int:
+        with self.local.transaction() as conn:
+            return conn.execute("SELECT COUNT(*) FROM journal WHERE status = 'pending'").fetchone()[0]
+
+    def _to_remote_formula(self, formula: str) -> str:
+        return _PROVISIONAL_RE.sub(lambda match: self.real_ids.get(match.group(0), match.group(0)), formula)
+
+    def _from_remote(self, record: Dict) -> Dict:
+        """Настоящие ID записей, созданных через журнал, -> их временные ID"""
+        if not self.provisional_ids:
+            return record
+        return {
+            **record,
+            "id": self.provisional_ids.get(record["id"], record["id"]),
+            "fields": _map_fields(record.get("fields", {}), self.provisional_ids),
+        }
+
+    def sync_stats(self) -> Dict[str, Any]:
+        """Состояние журнала для /health"""
+        with self.local.transaction() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM journal GROUP BY status"))
+            oldest = conn.execute("SELECT MIN(created_at) FROM journal WHERE status = 'pending'").fetchone()[0]
+        return {
+            "pending": counts.get("pending", 0),
+            "failed": counts.get("failed", 0),
+            "synced_records": len(self.real_ids),
+            "oldest_pending_age_s": round(time.time() - oldest, 1) if oldest else None,
+            "last_sync_at": self.last_sync_at.isoformat() if self.last_sync_at else None,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,93 @@
+"""
+Benchmark: общий ShoppingListService vs новый сервис на каждый запрос
+
+Поднимает локальный keep-alive HTTP сервер, отвечающий как Airtable,
+и сравнивает стоимость запроса, когда клиент создаётся заново
+(новая сессия и TCP соединение) и когда используется общий клиент.
+
+Запуск:
+    python -m benchmarks.bench_connection_reuse [--requests 200]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _AirtableHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def setup(self):
+        super().setup()
+        # Без Nagle: иначе keep-alive ответы упираются в delayed ACK
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        record_id = self.path.rstrip("/").split("/")[-1].split("?")[0]
+        body = json.dumps({"id": record_id, "createdTime": "", "fields": {}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _AirtableHandler)
+    server.connections = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _run(label, get_service, requests_count, server):
+    server.connections = 0
+    latencies = []
+    for i in range(requests_count):
+        started = time.perf_counter()
+        service = get_service()
+        service._get_meal_plan(f"rec{i:014d}")
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        "mode": label,
+        "requests": requests_count,
+        "tcp_connections": server.connections,
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    server = _start_server()
+    os.environ["AIRTABLE_ENDPOINT_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ.setdefault("AIRTABLE_API_KEY", "bench")
+    os.environ["AIRTABLE_RATE_LIMIT"] = "100000"
+
+    from app.services.shopping_list import ShoppingListService
+
+    shared = ShoppingListService()
+    results = [
+        _run("per_request", ShoppingListService, args.requests, server),
+        _run("shared", lambda: shared, args.requests, server),
+    ]
+    print(json.dumps(results, indent=2))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
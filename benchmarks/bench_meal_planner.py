@@ -0,0 +1,89 @@
+"""
+Benchmark: подбор плана питания MealPlanOptimizer
+
+Генерирует случайные каталоги рецептов (100 / 1k / 10k) и измеряет
+время построения матрицы макросов и подбора плана на 7 дней,
+а также долю приёмов пищи, попавших в целевые диапазоны.
+
+Запуск:
+    python -m benchmarks.bench_meal_planner [--sizes 100 1000 10000] [--repeat 20]
+"""
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+from app.services.optimizer import (
+    CALORIES,
+    MEAL_SLOTS,
+    PROTEIN,
+    MealPlanOptimizer,
+    recipes_to_matrix,
+)
+
+
+def make_recipes(count: int, seed: int = 0):
+    """Случайный каталог: примерно половина - основные блюда, половина - перекусы"""
+    rng = np.random.default_rng(seed)
+    calories = np.where(rng.random(count) < 0.5, rng.normal(650, 120, count), rng.normal(280, 70, count))
+    protein = np.clip(calories * rng.normal(0.075, 0.015, count), 5, None)
+    return [
+        {
+            "id": f"rec{i:014d}",
+            "name": f"Recipe {i}",
+            "calories": float(calories[i]),
+            "protein": float(protein[i]),
+            "fat": float(rng.uniform(5, 40)),
+            "carbs": float(rng.uniform(10, 90)),
+            "prep_time": float(rng.integers(5, 60)),
+        }
+        for i in range(count)
+    ]
+
+
+def hit_rate(macros: np.ndarray, plan: np.ndarray) -> float:
+    """Доля слотов, где калории и белок в целевом диапазоне"""
+    hits = 0
+    for s, slot in enumerate(MEAL_SLOTS):
+        chosen = macros[plan[:, s]]
+        hits += np.sum(
+            (chosen[:, CALORIES] >= slot.calories[0]) & (chosen[:, CALORIES] <= slot.calories[1])
+            & (chosen[:, PROTEIN] >= slot.protein[0]) & (chosen[:, PROTEIN] <= slot.protein[1])
+        )
+    return hits / plan.size
+
+
+def bench(size: int, repeat: int):
+    recipes = make_recipes(size)
+    started = time.perf_counter()
+    macros = recipes_to_matrix(recipes)
+    matrix_ms = (time.perf_counter() - started) * 1000
+
+    timings = []
+    for week in range(repeat):
+        started = time.perf_counter()
+        plan = MealPlanOptimizer(macros, seed=week).plan(days=7)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "recipes": size,
+        "matrix_ms": round(matrix_ms, 2),
+        "plan_p50_ms": round(statistics.median(timings), 2),
+        "plan_max_ms": round(max(timings), 2),
+        "unique_recipes": int(len(np.unique(plan))),
+        "slot_hit_rate": round(float(hit_rate(macros, plan)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps([bench(size, args.repeat) for size in args.sizes], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Benchmark: пайплайны плана питания и списка покупок на фейковом Airtable
+
+Запускает MealPlannerService.create_weekly_meal_plan и
+ShoppingListService.generate_shopping_list против локального SQLiteStore
+с искусственной задержкой каждого запроса (как у HTTP запроса к Airtable):
+all() стоит задержку на каждую страницу из 100 записей, batch_* - на запрос.
+Размер каталога задаётся числом строк Recipe_Ingredients (1k - 1M),
+рецептов в 10 раз меньше.
+
+Результат (JSON): время загрузки каталога, p50 / p99 пайплайнов и каждого
+шага (события PipelineProgress), число запросов по таблицам и операциям,
+пиковая память (tracemalloc) и RSS процесса. Результаты разных версий
+сравниваются по файлам --output.
+
+Запуск:
+    python -m benchmarks.bench_pipelines [--sizes 1000 10000 100000] [--iterations 20]
+        [--latency-ms 20] [--jitter-ms 5] [--snapshot camper.db] [--output results.json]
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.config import INGREDIENT_PRICE_FIELD, INGREDIENT_PRICE_UNIT_FIELD, RECIPE_INGREDIENTS_FIELD
+from app.services.airtable import AirtableService
+from app.services.catalog import CatalogMirror
+from app.services.meal_planner import MealPlannerService
+from app.services.shopping_list import ShoppingListService
+from app.services.sqlite_store import SQLiteStore
+from app.services.storage import table_schema
+from benchmarks.bench_meal_planner import make_recipes
+from benchmarks.bench_shopping_aggregation import UNITS, make_recipe_ingredients
+
+PAGE_SIZE = 100  # записей на страницу ответа Airtable
+INGREDIENTS = 800  # как в make_recipe_ingredients
+PRICE_UNITS = {"г": "кг", "гр": "кг", "мл": "л", "шт": "шт"}
+
+
+class _LatencyTable:
+    """Таблица с задержкой и подсчётом запросов"""
+
+    def __init__(self, fake: "FakeAirtable", table: Any):
+        self._fake = fake
+        self._table = table
+        self._name = table_schema(table.name).name
+
+    def get(self, record_id: str, **options: Any) -> Dict:
+        self._fake.request(self._name, "get")
+        return self._table.get(record_id, **options)
+
+    def all(self, **options: Any) -> List[Dict]:
+        records = self._table.all(**options)
+        self._fake.request(self._name, "all", pages=max(math.ceil(len(records) / PAGE_SIZE), 1))
+        return records
+
+    def first(self, **options: Any) -> Optional[Dict]:
+        records = self.all(**{**options, "max_records": 1})
+        return records[0] if records else None
+
+    def create(self, fields: Dict, **options: Any) -> Dict:
+        self._fake.request(self._name, "create")
+        return self._table.create(fields, **options)
+
+    def update(self, record_id: str, fields: Dict, **options: Any) -> Dict:
+        self._fake.request(self._name, "update")
+        return self._table.update(record_id, fields, **options)
+
+    def delete(self, record_id: str) -> Dict:
+        self._fake.request(self._name, "delete")
+        return self._table.delete(record_id)
+
+    def batch_create(self, records: Iterable[Dict], **options: Any) -> List[Dict]:
+        records = list(records)
+        self._fake.request(self._name, "batch_create", pages=math.ceil(len(records) / 10))
+        return self._table.batch_create(records, **options)
+
+    def batch_update(self, records: Iterable[Dict], **options: Any) -> List[Dict]:
+        records = list(records)
+        self._fake.request(self._name, "batch_update", pages=math.ceil(len(records) / 10))
+        return self._table.batch_update(records, **options)
+
+    def batch_delete(self, record_ids: Iterable[str]) -> List[Dict]:
+        record_ids = list(record_ids)
+        self._fake.request(self._name, "batch_delete", pages=math.ceil(len(record_ids) / 10))
+        return self._table.batch_delete(record_ids)
+
+
+class _LatencyBase:
+    def __init__(self, fake: "FakeAirtable", base_id: str):
+        self._fake = fake
+        self._base_id = base_id
+
+    def table(self, table_name: str) -> _LatencyTable:
+        return self._fake.table(self._base_id, table_name)
+
+
+class FakeAirtable:
+    """
+    Хранилище (StorageBackend) поверх SQLiteStore с задержкой запросов
+
+    Каждый HTTP запрос, который сделал бы pyairtable, - sleep(latency ± jitter)
+    и +1 к счётчику (таблица, операция). Задержка снаружи блокировки
+    SQLiteStore, поэтому параллельные батчи BatchWriter ждут одновременно.
+    """
+
+    def __init__(self, store: SQLiteStore, latency_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 0):
+        self.store = store
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.calls: Counter = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def table(self, base_id: str, table_name: str) -> _LatencyTable:
+        return _LatencyTable(self, self.store.table(base_id, table_name))
+
+    def base(self, base_id: str) -> _LatencyBase:
+        return _LatencyBase(self, base_id)
+
+    def close(self) -> None:
+        self.store.close()
+
+    def request(self, table_name: str, operation: str, pages: int = 1) -> None:
+        with self._lock:
+            self.calls[(table_name, operation)] += pages
+            delays = [
+                max(self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms), 0.0)
+                for _ in range(pages)
+            ]
+        if self.latency_ms or self.jitter_ms:
+            time.sleep(sum(delays) / 1000)
+
+    def reset_calls(self) -> Counter:
+        with self._lock:
+            calls, self.calls = self.calls, Counter()
+        return calls
+
+
+def seed_store(store: SQLiteStore, size: int) -> Dict[str, int]:
+    """Каталог из size строк Recipe_Ingredients (size / 10 рецептов, 800 ингредиентов)"""
+    recipe_count = max(size // 10, 1)
+    rows = make_recipe_ingredients(recipe_count, ingredients=INGREDIENTS)
+
+    links = defaultdict(list)
+    for ri in rows:
+        links[ri["fields"]["Recipes 2"][0]].append(ri["id"])
+    recipes = [
+        {
+            "id": recipe["id"],
+            "fields": {
+                "Recipe Name": recipe["name"],
+                "Calories": recipe["calories"],
+                "Protein (g)": recipe["protein"],
+                "Fat (g)": recipe["fat"],
+                "Carbs (g)": recipe["carbs"],
+                "Prep Time (min)": recipe["prep_time"],
+                RECIPE_INGREDIENTS_FIELD: links[recipe["id"]],
+            },
+        }
+        for recipe in make_recipes(recipe_count)
+    ]
+    ingredients = [
+        {
+            "id": f"ing{i:013d}",
+            "fields": {
+                "Ingredient Name": f"Ingredient {i}",
+                INGREDIENT_PRICE_FIELD: round(1 + (i % 40) / 4, 2),
+                INGREDIENT_PRICE_UNIT_FIELD: PRICE_UNITS[UNITS[i % len(UNITS)]],
+            },
+        }
+        for i in range(INGREDIENTS)
+    ]
+    return {
+        "Recipes": store.import_records("Recipes", recipes),
+        "Recipe_Ingredients": store.import_records("Recipe_Ingredients", rows),
+        "Ingredients": store.import_records("Ingredients", ingredients),
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль по ближайшему рангу"""
+    ordered = sorted(values)
+    return ordered[min(max(math.ceil(q * len(ordered)) - 1, 0), len(ordered) - 1)]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(statistics.median(values), 2),
+        "p99_ms": round(percentile(values, 0.99), 2),
+        "mean_ms": round(statistics.mean(values), 2),
+        "max_ms": round(max(values), 2),
+    }
+
+
+def _timed(func: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) * 1000
+
+
+def bench(fake: FakeAirtable, size: Optional[int], iterations: int) -> Dict[str, Any]:
+    catalog_rows = fake.store.stats()
+    airtable = AirtableService(api=fake)
+    catalog = CatalogMirror(airtable.get_table, db_path=None)
+    planner = MealPlannerService(airtable, catalog)
+    shopping = ShoppingListService(catalog=catalog, api=fake)
+
+    fake.reset_calls()
+    catalog_load_ms = _timed(catalog.load)
+    catalog_calls = sum(fake.reset_calls().values())
+    warm_vectors_ms = _timed(catalog.ingredient_vectors)
+
+    stages: Dict[str, List[float]] = defaultdict(list)
+
+    def on_progress(event: str, data: Dict[str, Any]) -> None:
+        if event == "stage":
+            stages[f"{data['pipeline']}.{data['stage']}"].append(data["elapsed_ms"])
+
+    week_start = datetime(2026, 1, 5)
+
+    def run(i: int) -> Dict[str, float]:
+        start = week_start + timedelta(weeks=i)
+        timings = {}
+        started = time.perf_counter()
+        plan = planner.create_weekly_meal_plan(f"bench{i}", start, on_progress=on_progress)
+        timings["meal_plan"] = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        shopping.generate_shopping_list(plan["meal_plan_id"], on_progress=on_progress)
+        timings["shopping_list"] = (time.perf_counter() - started) * 1000
+        return timings
+
+    pipelines: Dict[str, List[float]] = defaultdict(list)
+    started = time.perf_counter()
+    for i in range(iterations):
+        for name, elapsed in run(i).items():
+            pipelines[name].append(elapsed)
+    wall_s = time.perf_counter() - started
+    calls = fake.reset_calls()
+
+    # Память - отдельным прогоном: tracemalloc замедляет выделения и исказил бы время
+    tracemalloc.start()
+    run(iterations)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    fake.reset_calls()
+
+    by_operation: Dict[str, Dict[str, int]] = defaultdict(dict)
+    for (table_name, operation), count in sorted(calls.items()):
+        by_operation[table_name][operation] = count
+    return {
+        "recipe_ingredient_rows": size,
+        "catalog_rows": catalog_rows,
+        "catalog_load_ms": round(catalog_load_ms, 1),
+        "catalog_load_requests": catalog_calls,
+        "vectors_build_ms": round(warm_vectors_ms, 1),
+        "iterations": iterations,
+        "plans_per_s": round(iterations / wall_s, 2),
+        "pipelines": {name: summarize(values) for name, values in pipelines.items()},
+        "stages": {name: summarize(values) for name, values in sorted(stages.items())},
+        "requests_per_iteration": round(sum(calls.values()) / iterations, 1),
+        "requests": by_operation,
+        "peak_traced_mb": round(peak / 2 ** 20, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="строк Recipe_Ingredients в сгенерированном каталоге")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="задержка одного запроса")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--snapshot", help="SQLite снимок базы (SQLiteStore.copy_from) вместо генерации")
+    parser.add_argument("--output", help="записать результаты в JSON файл")
+    args = parser.parse_args()
+
+    results = []
+    for size in [None] if args.snapshot else args.sizes:
+        # Снимок копируется в память: бенчмарк создаёт планы и списки покупок
+        store = SQLiteStore()
+        if args.snapshot:
+            snapshot = SQLiteStore(args.snapshot)
+            store.copy_from(snapshot, "")
+            snapshot.close()
+        else:
+            seed_store(store, size)
+        fake = FakeAirtable(store, args.latency_ms, args.jitter_ms)
+        results.append(bench(fake, size, args.iterations))
+        fake.close()
+
+    report = {
+        "benchmark": "pipelines",
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
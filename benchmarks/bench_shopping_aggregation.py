@@ -0,0 +1,119 @@
+"""
+Benchmark: агрегация ингредиентов списка покупок
+
+Сравнивает прежнюю агрегацию (строки Recipe_Ingredients -> dict по
+(ingredient_id, unit)) с взвешенной суммой векторов IngredientVectors
+для планов на 1 / 2 / 4 недели (5 приёмов пищи в день).
+
+Запуск:
+    python -m benchmarks.bench_shopping_aggregation [--recipes 2000] [--days 7 14 28] [--repeat 200]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+
+from app.services.ingredient_vectors import IngredientVectors
+
+UNITS = ["г", "гр", "мл", "шт"]
+
+
+def make_recipe_ingredients(recipes: int, ingredients: int = 800, per_recipe: int = 10, seed: int = 0):
+    """Случайные строки Recipe_Ingredients"""
+    rng = random.Random(seed)
+    rows = []
+    for r in range(recipes):
+        for i in rng.sample(range(ingredients), per_recipe):
+            rows.append({
+                "id": f"ri{len(rows):012d}",
+                "fields": {
+                    "Recipes 2": [f"rec{r:014d}"],
+                    "Ingredients": [f"ing{i:013d}"],
+                    "Количество": rng.choice([1, 2, 50, 100, 150, 200]),
+                    "Единица измерения": UNITS[i % len(UNITS)],
+                },
+            })
+    return rows
+
+
+def make_servings(recipes: int, days: int, seed: int = 0):
+    """Порции рецептов плана: days * 5 приёмов пищи"""
+    rng = random.Random(seed)
+    servings = {}
+    for _ in range(days * 5):
+        recipe_id = f"rec{rng.randrange(recipes):014d}"
+        servings[recipe_id] = servings.get(recipe_id, 0) + 1
+    return servings
+
+
+def legacy_aggregate(index, servings):
+    """Прежний путь: строки с количеством на план, затем группировка dict-ом"""
+    data = []
+    for recipe_id, total in servings.items():
+        for ri in index.get(recipe_id, []):
+            fields = ri["fields"]
+            data.append({
+                "ingredient_id": fields["Ingredients"][0],
+                "quantity": fields["Количество"] * total,
+                "unit": fields["Единица измерения"],
+                "recipe_id": recipe_id,
+            })
+    aggregated = defaultdict(lambda: {"quantity": 0, "recipes": set()})
+    for item in data:
+        key = (item["ingredient_id"], item["unit"])
+        aggregated[key]["quantity"] += item["quantity"]
+        aggregated[key]["recipes"].add(item["recipe_id"])
+    return [(key, round(v["quantity"], 1), len(v["recipes"])) for key, v in aggregated.items()]
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1e6)
+    return round(statistics.median(timings), 1), round(max(timings), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--recipes", type=int, default=2000)
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 14, 28])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rows = make_recipe_ingredients(args.recipes)
+    started = time.perf_counter()
+    vectors = IngredientVectors.from_rows(rows)
+    build_ms = (time.perf_counter() - started) * 1000
+    index = {}
+    for ri in rows:
+        index.setdefault(ri["fields"]["Recipes 2"][0], []).append(ri)
+
+    results = []
+    for days in args.days:
+        servings = make_servings(args.recipes, days, seed=days)
+        legacy_p50, legacy_max = timed(lambda: legacy_aggregate(index, servings), args.repeat)
+        vector_p50, vector_max = timed(lambda: vectors.aggregate(servings), args.repeat)
+        results.append({
+            "days": days,
+            "recipes_in_plan": len(servings),
+            "lines": len(vectors.aggregate(servings)),
+            "legacy_p50_us": legacy_p50,
+            "legacy_max_us": legacy_max,
+            "vectors_p50_us": vector_p50,
+            "vectors_max_us": vector_max,
+        })
+
+    print(json.dumps({
+        "catalog_recipes": args.recipes,
+        "recipe_ingredient_rows": len(rows),
+        "vectors_build_ms": round(build_ms, 1),
+        "plans": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
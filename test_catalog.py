@@ -0,0 +1,62 @@
+"""
+Test: зеркало каталога (CatalogMirror) при недоступном Airtable
+
+Запуск:
+    python -m pytest test_catalog.py
+"""
+import pytest
+import requests
+
+from app.services.catalog import CatalogMirror
+from app.services.sqlite_store import SQLiteStore
+
+BASE_ID = "appBgJb1hzG4vFT1b"
+
+
+class _Source:
+    """Таблицы каталога из SQLiteStore; offline - каждое чтение падает"""
+
+    def __init__(self):
+        self.store = SQLiteStore()
+        self.offline = False
+        self.calls = 0
+
+    def get_table(self, name):
+        source = self
+
+        class _Table:
+            def all(self, **options):
+                source.calls += 1
+                if source.offline:
+                    raise requests.ConnectionError("Airtable is down")
+                return source.store.table(BASE_ID, name).all(**options)
+        return _Table()
+
+
+def test_failed_load_backs_off():
+    source = _Source()
+    source.offline = True
+    catalog = CatalogMirror(source.get_table, db_path=None)
+
+    with pytest.raises(requests.ConnectionError):
+        catalog.ensure_fresh()
+    calls = source.calls
+    with pytest.raises(RuntimeError, match="next attempt"):
+        catalog.ensure_fresh()
+    assert source.calls == calls  # повтор не раньше CATALOG_RETRY_DELAY
+
+
+def test_failed_refresh_serves_stale_catalog():
+    source = _Source()
+    source.store.table(BASE_ID, "Recipes").create({"Recipe Name": "Soup"})
+    catalog = CatalogMirror(source.get_table, db_path=None)
+    catalog.ensure_fresh()
+
+    source.offline = True
+    catalog._checked_at = 0.0  # пора обновлять
+    catalog.ensure_fresh()
+    calls = source.calls
+    catalog.ensure_fresh()
+
+    assert source.calls == calls
+    assert [r["fields"]["Recipe Name"] for r in catalog.all("Recipes")] == ["Soup"]
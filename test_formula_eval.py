@@ -0,0 +1,60 @@
+"""
+Test: вычисление формул Airtable (formula_eval) для локального хранилища
+
+Запуск:
+    python -m pytest test_formula_eval.py
+"""
+import pytest
+
+from app.services.formula_eval import FormulaError, FormulaRecord, evaluate, matches, parse_formula, record_ids
+
+
+class _Record(FormulaRecord):
+    def __init__(self, fields, record_id="recA", created_time="2026-01-10T12:00:00.000Z"):
+        self.fields = fields
+        self.record_id = record_id
+        self.created_time = created_time
+        self.modified_time = created_time
+
+    def field(self, name):
+        return self.fields.get(name)
+
+
+def _eval(formula, **fields):
+    return evaluate(parse_formula(formula), _Record(fields))
+
+
+def test_operators_and_precedence():
+    assert _eval("1 + 2 * 3") == 7
+    assert _eval("{A} & '-' & {B}", A="x", B=2) == "x-2"
+    assert _eval("AND({Quantity} = 0, {Status} != 'Done')", Quantity=0, Status="Pending") is True
+    assert _eval("IF({Quantity} > 1, 'many', 'few')", Quantity=1) == "few"
+
+
+def test_find_over_arrayjoin_of_linked_values():
+    formula = "FIND('|Week 1|', '|'&ARRAYJOIN({Meal Plan},'|')&'|')"
+    assert matches(parse_formula(formula), _Record({"Meal Plan": ["Week 10", "Week 1"]}))
+    assert not matches(parse_formula(formula), _Record({"Meal Plan": ["Week 10"]}))
+
+
+def test_dates():
+    record = _Record({}, created_time="2026-01-10T12:00:00.000Z")
+    assert matches(parse_formula("IS_BEFORE(CREATED_TIME(), '2026-01-11')"), record)
+    assert not matches(parse_formula("IS_AFTER(CREATED_TIME(), DATEADD('2026-01-10', 1, 'days'))"), record)
+    assert matches(parse_formula("IS_SAME(CREATED_TIME(), '2026-01-10', 'day')"), record)
+
+
+def test_record_ids_only_for_id_lookups():
+    assert record_ids(parse_formula("OR(RECORD_ID()='recA', 'recB'=RECORD_ID())")) == {"recA", "recB"}
+    assert record_ids(parse_formula("OR(RECORD_ID()='recA', {Name}='x')")) is None
+
+
+def test_unsupported_function_raises():
+    with pytest.raises(FormulaError, match="REGEX_MATCH"):
+        _eval("REGEX_MATCH({Name}, 'x')", Name="x")
+
+
+def test_syntax_errors_raise():
+    for formula in ("AND(1, ", "{Name} = 'x' )", "1 ?? 2"):
+        with pytest.raises(FormulaError):
+            parse_formula(formula)
@@ -0,0 +1,44 @@
+"""
+Test: кэш ответов GET (get_or_load) и инвалидация во время загрузки
+
+Запуск:
+    python -m pytest test_http_cache.py
+"""
+import asyncio
+
+from app.services.cache import TTLCache
+from app.services.http_cache import CachedResponse, get_or_load
+
+
+def _load(cache, body, invalidate=False):
+    async def load():
+        if invalidate:
+            cache.invalidate("rec1")  # запись изменили, пока ответ загружался
+        return CachedResponse(body, f'"{body["v"]}"')
+    return load
+
+
+def test_response_cached():
+    cache = TTLCache(maxsize=10, ttl=60)
+    first = asyncio.run(get_or_load(cache, "rec1", _load(cache, {"v": 1})))
+    second = asyncio.run(get_or_load(cache, "rec1", _load(cache, {"v": 2})))
+    assert first is second
+
+
+def test_invalidated_during_load_not_cached():
+    cache = TTLCache(maxsize=10, ttl=60)
+    stale = asyncio.run(get_or_load(cache, "rec1", _load(cache, {"v": 1}, invalidate=True)))
+    assert stale.body == {"v": 1}  # отдаётся текущему запросу
+    assert cache.get("rec1") is None
+
+    fresh = asyncio.run(get_or_load(cache, "rec1", _load(cache, {"v": 2})))
+    assert fresh.body == {"v": 2} and cache.get("rec1") is fresh
+
+
+def test_generation_reset_is_bounded():
+    cache = TTLCache(maxsize=2, ttl=60)
+    generation = cache.generation("rec1")
+    for i in range(20):
+        cache.invalidate(f"other{i}")
+    assert len(cache._generations) <= 8
+    assert not cache.set_if_current("rec1", "stale", generation)
@@ -0,0 +1,78 @@
+"""
+Test: время холодного старта
+Проверяет, что импорт приложения и запуск lifespan укладываются в бюджет
+и не требуют credentials / сети (клиенты создаются лениво)
+
+Запуск:
+    python -m pytest test_import_time.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from app.config import IMPORT_TIME_BUDGET, STARTUP_TIME_BUDGET
+
+# Выполняется в чистом процессе, без AIRTABLE_API_KEY
+COLD_START_SCRIPT = """
+import asyncio, json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter() - started
+
+from app.services.registry import registry
+created_on_import = sorted(registry._instances)
+
+async def start_and_stop():
+    started = time.perf_counter()
+    async with app.main.app.router.lifespan_context(app.main.app):
+        elapsed = time.perf_counter() - started
+    return elapsed
+
+startup = asyncio.run(start_and_stop())
+print(json.dumps({"import": imported, "startup": startup, "created_on_import": created_on_import}))
+"""
+
+
+def _measure_cold_start():
+    with tempfile.TemporaryDirectory() as data_dir:
+        # Файлы SQLite (очередь задач, снимок каталога, журнал) - во временном каталоге, не в дереве исходников
+        env = {k: v for k, v in os.environ.items() if k != "AIRTABLE_API_KEY"}
+        env.update({
+            name: os.path.join(data_dir, filename)
+            for name, filename in [
+                ("JOBS_DB_PATH", "jobs.db"),
+                ("CATALOG_DB_PATH", "catalog.db"),
+                ("WRITE_BEHIND_DB_PATH", "writebehind.db"),
+                ("SQLITE_STORE_PATH", "airtable.db"),
+            ]
+        })
+        output = subprocess.run(
+            [sys.executable, "-c", COLD_START_SCRIPT],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_cold_start_budget():
+    """Импорт и старт без credentials укладываются в бюджет"""
+    result = _measure_cold_start()
+    print(f"⏱️ import: {result['import']:.3f}s, startup: {result['startup']:.3f}s")
+
+    assert result["created_on_import"] == [], "Сервисы не должны создаваться при импорте"
+    assert result["import"] < IMPORT_TIME_BUDGET, (
+        f"Импорт app.main занял {result['import']:.2f}s (бюджет {IMPORT_TIME_BUDGET}s)"
+    )
+    assert result["startup"] < STARTUP_TIME_BUDGET, (
+        f"Старт приложения занял {result['startup']:.2f}s (бюджет {STARTUP_TIME_BUDGET}s)"
+    )
+
+
+if __name__ == "__main__":
+    test_cold_start_budget()
+    print("✅ Cold start within budget")
@@ -0,0 +1,101 @@
+"""
+Test: вычитание и резервирование запасов (Pantry)
+Работает на локальном SQLiteStore - Airtable не нужен
+
+Запуск:
+    python -m pytest test_pantry.py
+"""
+import pytest
+
+from app.config import MEAL_PLAN_PRIMARY_FIELD, SHOPPING_LIST_PANTRY_FIELD
+from app.services.pantry import Pantry, PantryIndex, parse_reservations
+from app.services.shopping_list import ShoppingListService
+from app.services.sqlite_store import SQLiteStore
+from app.services.units import default_units
+
+BASE_ID = "appBgJb1hzG4vFT1b"
+
+
+def _pantry_record(record_id, quantity, unit, reserved=0):
+    return {"id": record_id, "fields": {
+        "Ingredient": ["ingChicken"], "Quantity": quantity, "Unit": unit, "Reserved": reserved,
+    }}
+
+
+def _need(quantity):
+    return {"ingredient_id": "ingChicken", "ingredient_name": "Chicken", "quantity": quantity, "unit": "г"}
+
+
+def test_subtract_converts_pantry_units():
+    index = PantryIndex([_pantry_record("recP1", 1, "кг", reserved=0.25)], default_units)
+
+    result = index.subtract([_need(1000)])
+
+    assert result.used[0]["quantity"] == pytest.approx(750)
+    assert result.ingredients[0]["quantity"] == pytest.approx(250)
+    assert result.reservations == {"recP1": pytest.approx(0.75)}  # в единицах записи (кг)
+
+
+def test_reserve_takes_rows_in_order_in_their_own_units():
+    index = PantryIndex([_pantry_record("recP1", 0.5, "кг"), _pantry_record("recP2", 300, "г")], default_units)
+
+    result = index.subtract([_need(600)])
+
+    assert result.ingredients == []
+    assert result.reservations == {"recP1": pytest.approx(0.5), "recP2": pytest.approx(100)}
+    # Остаток второй записи доступен следующей строке
+    assert index.subtract([_need(500)]).ingredients[0]["quantity"] == pytest.approx(300)
+
+
+def test_released_reservation_is_available_again():
+    records = [_pantry_record("recP1", 1, "кг", reserved=1)]
+
+    assert PantryIndex(records, default_units).subtract([_need(400)]).used == []
+    result = PantryIndex(records, default_units, released={"recP1": 0.5}).subtract([_need(400)])
+    assert result.used[0]["quantity"] == pytest.approx(400)
+
+
+def _seed(store):
+    """План: 1 порция рецепта на 200 г курицы; в запасах 1 кг курицы"""
+    table = lambda name: store.table(BASE_ID, name)
+    chicken = table("Ingredients").create({"Ingredient Name": "Chicken"})
+    recipe = table("Recipes").create({"Recipe Name": "Chicken soup"})
+    table("Recipe_Ingredients").create({
+        "Name": "chicken", "Recipes 2": [recipe["id"]], "Ingredients": [chicken["id"]],
+        "Количество": 200, "Единица измерения": "г",
+    })
+    plan = table("Meal_Plans").create({MEAL_PLAN_PRIMARY_FIELD: "Week 1"})
+    table("Planned_Meals").create({
+        "Meal Name": "Lunch", "Meal Plan": [plan["id"]], "Recipe": [recipe["id"]], "Servings": 1,
+    })
+    stock = table("Pantry").create({"Ingredient": [chicken["id"]], "Quantity": 1, "Unit": "кг"})
+    return plan["id"], recipe["id"], stock["id"]
+
+
+def test_reserve_then_update_keeps_own_reservation():
+    store = SQLiteStore()
+    meal_plan_id, recipe_id, stock_id = _seed(store)
+    pantry_table = store.table(BASE_ID, "Pantry")
+    service = ShoppingListService(api=store, pantry=Pantry(lambda: pantry_table, ttl=0))
+    reserved = lambda: pantry_table.get(stock_id)["fields"].get("Reserved", 0)
+
+    created = service.generate_shopping_list(meal_plan_id, reserve_pantry=True)
+    shopping_list_id = created["shopping_list_id"]
+    assert created["items_count"] == 0 and reserved() == pytest.approx(0.2)
+    shopping_list = store.table(BASE_ID, "Shopping_Lists").get(shopping_list_id)
+    assert parse_reservations(shopping_list["fields"][SHOPPING_LIST_PANTRY_FIELD]) == {stock_id: 0.2}
+
+    # Без изменений плана: курица по-прежнему из запасов, резерв не удваивается
+    updated = service.update_shopping_list(shopping_list_id)
+    assert (updated["created"], updated["items_count"]) == (0, 0)
+    assert reserved() == pytest.approx(0.2)
+
+    # План вырос: резерв переносится на новое количество
+    store.table(BASE_ID, "Planned_Meals").create({
+        "Meal Name": "Dinner", "Meal Plan": [meal_plan_id], "Recipe": [recipe_id], "Servings": 2,
+    })
+    service.update_shopping_list(shopping_list_id)
+    assert reserved() == pytest.approx(0.6)
+
+    service.delete_shopping_list(shopping_list_id)
+    assert reserved() == pytest.approx(0)
@@ -0,0 +1,125 @@
+"""
+Test: планировщик запросов Airtable (ScheduledApi / AirtableScheduler)
+HTTP сессия подменяется заглушкой - сеть не нужна
+
+Запуск:
+    python -m pytest test_scheduler.py
+"""
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from app.services import scheduler
+from app.services.rate_limit import TokenBucket
+from app.services.scheduler import AirtableScheduler, Priority, ScheduledApi, airtable_priority
+
+RECORD = {"id": "rec00000000000001", "createdTime": "2026-01-01T00:00:00.000Z", "fields": {}}
+
+
+def _response(status, body=None, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(body if body is not None else {"error": "x"}).encode()
+    response.headers.update(headers or {})
+    return response
+
+
+def _api(monkeypatch, base_id, responses, rate=1000.0):
+    """ScheduledApi со своим планировщиком и заглушкой session.send (ответы по очереди)"""
+    monkeypatch.setitem(scheduler._schedulers, base_id, AirtableScheduler(TokenBucket(rate)))
+    api = ScheduledApi("key")
+    sent = []
+
+    def send(prepared, **kwargs):
+        sent.append(prepared.method)
+        return responses.pop(0)
+
+    monkeypatch.setattr(api.session, "send", send)
+    return api, sent
+
+
+def test_429_retried_after_retry_after(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(scheduler.random, "uniform", lambda low, high: 0.0)
+    monkeypatch.setattr(scheduler.time, "sleep", sleeps.append)
+    api, sent = _api(monkeypatch, "appRetry429", [
+        _response(429, headers={"Retry-After": "2"}),
+        _response(200, RECORD),
+    ])
+
+    record = api.table("appRetry429", "Recipes").get(RECORD["id"])
+
+    assert record["id"] == RECORD["id"]
+    assert sent == ["GET", "GET"]
+    assert sleeps == [2.0]
+    stats = scheduler.get_scheduler("appRetry429").stats()
+    assert stats["throttled"] == 1 and stats["retries"] == 1
+
+
+def test_post_not_retried_on_5xx(monkeypatch):
+    monkeypatch.setattr(scheduler.time, "sleep", lambda delay: None)
+    api, sent = _api(monkeypatch, "appPost503", [_response(503), _response(200, RECORD)])
+
+    with pytest.raises(requests.HTTPError):
+        api.table("appPost503", "Recipes").create({"Recipe Name": "x"})
+    assert sent == ["POST"]
+    assert scheduler.get_scheduler("appPost503").stats()["failures"] == 1
+
+
+def test_get_retried_on_5xx(monkeypatch):
+    monkeypatch.setattr(scheduler.time, "sleep", lambda delay: None)
+    api, sent = _api(monkeypatch, "appGet503", [_response(503), _response(200, RECORD)])
+
+    assert api.table("appGet503", "Recipes").get(RECORD["id"])["id"] == RECORD["id"]
+    assert sent == ["GET", "GET"]
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_interactive_request_overtakes_queued_bulk():
+    bucket = TokenBucket(rate=5, capacity=1)
+    while bucket.try_acquire() == 0:
+        pass  # очередь ждёт пополнения
+    airtable = AirtableScheduler(bucket)
+    order = []
+
+    def call(priority, label):
+        with airtable_priority(priority):
+            airtable.call("GET", lambda: order.append(label))
+
+    threads = [threading.Thread(target=call, args=(Priority.BULK, f"bulk{i}")) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: airtable.stats()["queue_depth"]["bulk"] == 3)
+    interactive = threading.Thread(target=call, args=(Priority.INTERACTIVE, "interactive"))
+    interactive.start()
+    for thread in threads + [interactive]:
+        thread.join(5)
+
+    assert order[0] == "interactive"
+    assert sorted(order[1:]) == ["bulk0", "bulk1", "bulk2"]
+
+
+def test_bucket_holds_configured_rate():
+    rate, count = 50.0, 21
+    airtable = AirtableScheduler(TokenBucket(rate, capacity=1))
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=airtable.call, args=("GET", lambda: None)) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    elapsed = time.monotonic() - started
+
+    # Первый запрос - из запаса, остальные по одному на 1 / rate секунд
+    assert elapsed >= (count - 1) / rate * 0.9
+    assert airtable.stats()["requests"] == count
@@ -0,0 +1,85 @@
+"""
+Test: пересчёт списка покупок (update_shopping_list)
+Работает на локальном SQLiteStore - Airtable не нужен
+
+Запуск:
+    python -m pytest test_shopping_list_update.py
+"""
+from app.config import MEAL_PLAN_PRIMARY_FIELD, SHOPPING_LIST_PANTRY_FIELD
+from app.services.shopping_list import ShoppingListService
+from app.services.sqlite_store import SQLiteStore
+
+BASE_ID = "appBgJb1hzG4vFT1b"
+
+
+def _seed(store):
+    """План на один рецепт: курица в граммах и соль без единицы измерения"""
+    table = lambda name: store.table(BASE_ID, name)
+    chicken, salt = table("Ingredients").batch_create([
+        {"Ingredient Name": "Chicken"},
+        {"Ingredient Name": "Salt"},
+    ])
+    recipe = table("Recipes").create({"Recipe Name": "Chicken soup"})
+    table("Recipe_Ingredients").batch_create([
+        {"Name": "chicken", "Recipes 2": [recipe["id"]], "Ingredients": [chicken["id"]],
+         "Количество": 200, "Единица измерения": "г"},
+        {"Name": "salt", "Recipes 2": [recipe["id"]], "Ingredients": [salt["id"]], "Количество": 1},
+    ])
+    plan = table("Meal_Plans").create({MEAL_PLAN_PRIMARY_FIELD: "Week 1"})
+    table("Planned_Meals").create({
+        "Meal Name": "Lunch", "Meal Plan": [plan["id"]], "Recipe": [recipe["id"]], "Servings": 1,
+    })
+    return plan["id"], salt["id"]
+
+
+def test_update_keeps_purchased_item_without_unit():
+    store = SQLiteStore()
+    meal_plan_id, salt_id = _seed(store)
+    service = ShoppingListService(api=store)
+    shopping_list_id = service.generate_shopping_list(meal_plan_id, use_pantry=False)["shopping_list_id"]
+
+    items = store.table(BASE_ID, "Shopping_List_Items")
+    salt_item = next(item for item in items.all() if item["fields"]["Ingredient"] == [salt_id])
+    assert "Unit" not in salt_item["fields"]  # пустое поле не хранится, как в Airtable
+    items.update(salt_item["id"], {"Purchased": True})
+
+    result = service.update_shopping_list(shopping_list_id, use_pantry=False)
+
+    assert (result["created"], result["updated"], result["deleted"], result["unchanged"]) == (0, 0, 0, 2)
+    assert items.get(salt_item["id"])["fields"]["Purchased"] is True
+
+
+class _RecordingApi:
+    """SQLiteStore, запоминающий fields= каждого all() - SQLiteStore принимает любые поля"""
+
+    def __init__(self, store):
+        self.store = store
+        self.fields = []
+
+    def table(self, base_id, table_name):
+        table = self.store.table(base_id, table_name)
+        all_records = table.all
+
+        def all(**kwargs):
+            self.fields.append((table_name, kwargs.get("fields")))
+            return all_records(**kwargs)
+        table.all = all
+        return table
+
+
+def test_delete_without_pantry_skips_reservation_field():
+    store = SQLiteStore()
+    meal_plan_id, _ = _seed(store)
+    api = _RecordingApi(store)
+    service = ShoppingListService(api=api)
+    first = service.generate_shopping_list(meal_plan_id, use_pantry=False)["shopping_list_id"]
+    service.generate_shopping_list(meal_plan_id, use_pantry=False)
+    api.fields.clear()
+
+    service.delete_shopping_list(first)
+    service.purge_shopping_lists(meal_plan_id=meal_plan_id)
+
+    requested = [fields for table_name, fields in api.fields if table_name == service.shopping_lists_table]
+    assert ["List Name"] in requested and ["List Name", "Meal Plan"] in requested
+    assert all(SHOPPING_LIST_PANTRY_FIELD not in (fields or []) for _, fields in api.fields)
+    assert store.table(BASE_ID, "Shopping_Lists").all() == []
@@ -0,0 +1,96 @@
+"""
+Test: локальное хранилище SQLiteStore (интерфейс pyairtable на SQLite)
+
+Запуск:
+    python -m pytest test_sqlite_store.py
+"""
+import pytest
+
+from app.config import MEAL_PLAN_MEALS_FIELD, MEAL_PLAN_PRIMARY_FIELD
+from app.services.formula_eval import FormulaError, parse_formula
+from app.services.formulas import linked_to_any
+from app.services.sqlite_store import RecordNotFoundError, SQLiteStore
+
+BASE_ID = "appBgJb1hzG4vFT1b"
+
+
+@pytest.fixture
+def store():
+    store = SQLiteStore()
+    yield store
+    store.close()
+
+
+def _plan_with_meals(store, name, meals=2):
+    plan = store.table(BASE_ID, "Meal_Plans").create({MEAL_PLAN_PRIMARY_FIELD: name})
+    created = store.table(BASE_ID, "Planned_Meals").batch_create([
+        {"Meal Name": f"{name} meal {i}", "Meal Plan": [plan["id"]]} for i in range(meals)
+    ])
+    return plan["id"], [meal["id"] for meal in created]
+
+
+def test_zero_and_false_values(store):
+    table = store.table(BASE_ID, "Pantry")
+    record = table.create({"Name": "salt", "Quantity": 0, "Reserved": 0.0, "Opened": False, "Note": ""})
+
+    assert record["fields"] == {"Name": "salt", "Quantity": 0, "Reserved": 0.0}
+    assert [r["id"] for r in table.all(formula="{Quantity}=0")] == [record["id"]]
+
+
+def test_plan_narrows_record_id_lookup(store):
+    table = store.table(BASE_ID, "Meal_Plans")
+    plan_id, _ = _plan_with_meals(store, "Week 1")
+    _plan_with_meals(store, "Week 2")
+
+    where, params = table._plan(parse_formula(f"AND(RECORD_ID()='{plan_id}', LEN({{Notes}}) = 0)"))
+    assert (where, params) == ("(id = ?)", [plan_id])
+    assert table._plan(parse_formula("LEN({Notes}) = 0")) == (None, [])
+    assert [r["id"] for r in table.all(formula=f"RECORD_ID()='{plan_id}'")] == [plan_id]
+
+
+def test_find_arrayjoin_over_linked_field(store):
+    week1, meals1 = _plan_with_meals(store, "Week 1")
+    week10, meals10 = _plan_with_meals(store, "Week 10")
+    meals = store.table(BASE_ID, "Planned_Meals")
+
+    formula = linked_to_any("Meal Plan", ["Week 1"])
+    assert meals._plan(parse_formula(formula))[0] is not None  # выборка по таблице links, не скан
+    assert sorted(r["id"] for r in meals.all(formula=formula)) == sorted(meals1)
+    both = linked_to_any("Meal Plan", ["Week 1", "Week 10"])
+    assert len(meals.all(formula=both)) == len(meals1) + len(meals10)
+
+
+def test_inverse_links_follow_updates(store):
+    plans = store.table(BASE_ID, "Meal_Plans")
+    meals = store.table(BASE_ID, "Planned_Meals")
+    week1, (first, second) = _plan_with_meals(store, "Week 1")
+    week2, _ = _plan_with_meals(store, "Week 2", meals=0)
+
+    assert sorted(plans.get(week1)["fields"][MEAL_PLAN_MEALS_FIELD]) == sorted([first, second])
+    meals.update(second, {"Meal Plan": [week2]})
+
+    assert plans.get(week1)["fields"][MEAL_PLAN_MEALS_FIELD] == [first]
+    assert plans.get(week2)["fields"][MEAL_PLAN_MEALS_FIELD] == [second]
+
+
+def test_delete_removes_references(store):
+    plans = store.table(BASE_ID, "Meal_Plans")
+    meals = store.table(BASE_ID, "Planned_Meals")
+    week1, (first, second) = _plan_with_meals(store, "Week 1")
+
+    meals.delete(first)
+    assert plans.get(week1)["fields"][MEAL_PLAN_MEALS_FIELD] == [second]
+
+    plans.delete(week1)
+    assert "Meal Plan" not in meals.get(second)["fields"]
+    with pytest.raises(RecordNotFoundError):
+        plans.get(week1)
+    with pytest.raises(RecordNotFoundError):
+        meals.batch_delete([second, first])
+    assert meals.get(second)  # транзакция откатилась целиком
+
+
+def test_unsupported_formula_function(store):
+    _plan_with_meals(store, "Week 1")
+    with pytest.raises(FormulaError):
+        store.table(BASE_ID, "Meal_Plans").all(formula="REGEX_MATCH({Plan Name}, 'Week')")
@@ -0,0 +1,178 @@
+"""
+Test: write-behind журнал (WriteBehindStore) с SQLiteStore вместо Airtable
+
+Запуск:
+    python -m pytest test_write_behind.py
+"""
+import time
+
+import pytest
+import requests
+
+from app.config import MEAL_PLAN_MEALS_FIELD, MEAL_PLAN_PRIMARY_FIELD
+from app.services import write_behind
+from app.services.sqlite_store import SQLiteStore
+from app.services.write_behind import WriteBehindStore, is_provisional
+
+BASE_ID = "appBgJb1hzG4vFT1b"
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status} error", response=response)
+
+
+class _FlakyRemote:
+    """SQLiteStore, операции которого могут падать: fail(table, op) -> исключение"""
+
+    def __init__(self):
+        self.store = SQLiteStore()
+        self.errors = {}  # (таблица, операция) -> [исключения по очереди]
+        self.offline = False
+
+    def table(self, base_id, table_name):
+        return _FlakyTable(self, self.store.table(base_id, table_name))
+
+    def base(self, base_id):
+        return self.store.base(base_id)
+
+    def fail(self, table_name, operation, *errors):
+        self.errors[(table_name, operation)] = list(errors)
+
+
+class _FlakyTable:
+    def __init__(self, remote, table):
+        self._remote = remote
+        self._table = table
+
+    def __getattr__(self, operation):
+        method = getattr(self._table, operation)
+
+        def call(*args, **kwargs):
+            if self._remote.offline:
+                raise requests.ConnectionError("offline")
+            errors = self._remote.errors.get((self._table.name, operation))
+            if errors:
+                raise errors.pop(0)
+            return method(*args, **kwargs)
+        return call
+
+
+@pytest.fixture
+def remote():
+    return _FlakyRemote()
+
+
+@pytest.fixture
+def store(remote):
+    store = WriteBehindStore(remote, path=":memory:", start=False)
+    yield store
+    store.close()
+
+
+def test_create_update_delete_before_sync(store, remote):
+    plans = store.table(BASE_ID, "Meal_Plans")
+    kept = plans.create({MEAL_PLAN_PRIMARY_FIELD: "Week 1"})
+    dropped = plans.create({MEAL_PLAN_PRIMARY_FIELD: "Draft"})
+    assert is_provisional(kept["id"]) and is_provisional(dropped["id"])
+
+    plans.update(kept["id"], {"Notes": "first"})
+    plans.update(kept["id"], {"Notes": "second"})
+    plans.delete(dropped["id"])
+    assert store.sync_stats()["pending"] == 5
+
+    assert store.flush(timeout=5)
+    records = remote.store.table(BASE_ID, "Meal_Plans").all()
+    assert [record["fields"] for record in records] == [{MEAL_PLAN_PRIMARY_FIELD: "Week 1", "Notes": "second"}]
+    assert store.real_ids[kept["id"]] == records[0]["id"]
+
+
+def test_links_to_provisional_ids_rewritten(store, remote):
+    plan = store.table(BASE_ID, "Meal_Plans").create({MEAL_PLAN_PRIMARY_FIELD: "Week 1"})
+    meals = store.table(BASE_ID, "Planned_Meals").batch_create([
+        {"Meal Name": f"Meal {i}", "Meal Plan": [plan["id"]]} for i in range(12)
+    ])
+
+    assert store.flush(timeout=5)
+    real_plan_id = store.real_ids[plan["id"]]
+    remote_meals = remote.store.table(BASE_ID, "Planned_Meals").all()
+    assert len(remote_meals) == 12
+    assert all(meal["fields"]["Meal Plan"] == [real_plan_id] for meal in remote_meals)
+    remote_plan = remote.store.table(BASE_ID, "Meal_Plans").get(real_plan_id)
+    assert sorted(remote_plan["fields"][MEAL_PLAN_MEALS_FIELD]) == sorted(meal["id"] for meal in remote_meals)
+
+    # Временные ID остаются действительными: чтение из Airtable отдаёт их же
+    read = store.table(BASE_ID, "Meal_Plans").get(plan["id"])
+    assert read["id"] == plan["id"]
+    assert sorted(read["fields"][MEAL_PLAN_MEALS_FIELD]) == sorted(meal["id"] for meal in meals)
+
+
+def test_permanent_error_marks_failed_without_blocking(store, remote):
+    remote.fail("Meal_Plans", "batch_create", _http_error(422))
+    store.table(BASE_ID, "Meal_Plans").create({MEAL_PLAN_PRIMARY_FIELD: "Invalid"})
+    meal = store.table(BASE_ID, "Planned_Meals").create({"Meal Name": "Lunch"})
+
+    assert store.flush(timeout=5)
+    stats = store.sync_stats()
+    assert (stats["pending"], stats["failed"]) == (0, 1)
+    assert "422" in stats["last_error"]
+    assert remote.store.table(BASE_ID, "Meal_Plans").all() == []
+    assert remote.store.table(BASE_ID, "Planned_Meals").get(store.real_ids[meal["id"]])
+
+
+def test_transient_error_retried_in_order(store, remote, monkeypatch):
+    monkeypatch.setattr(write_behind, "WRITE_BEHIND_RETRY_BASE_DELAY", 0)
+    remote.fail("Meal_Plans", "batch_create", _http_error(503), requests.ConnectionError("reset"))
+    plan = store.table(BASE_ID, "Meal_Plans").create({MEAL_PLAN_PRIMARY_FIELD: "Week 1"})
+    store.table(BASE_ID, "Meal_Plans").update(plan["id"], {"Notes": "after create"})
+
+    assert store.sync_once() == 0  # 503: операция ждёт повтора, update за ней не уходит
+    assert store.sync_stats()["pending"] == 2
+    assert store.flush(timeout=5)
+    remote_plan = remote.store.table(BASE_ID, "Meal_Plans").get(store.real_ids[plan["id"]])
+    assert remote_plan["fields"]["Notes"] == "after create"
+    assert store.sync_stats()["failed"] == 0
+
+
+def test_reads_merge_pending_records(store, remote):
+    existing = remote.store.table(BASE_ID, "Meal_Plans").create({MEAL_PLAN_PRIMARY_FIELD: "Synced"})
+    plans = store.table(BASE_ID, "Meal_Plans")
+    pending = plans.create({MEAL_PLAN_PRIMARY_FIELD: "Pending"})
+
+    assert sorted(record["id"] for record in plans.all()) == sorted([existing["id"], pending["id"]])
+    assert [r["id"] for r in plans.all(formula=f"{{{MEAL_PLAN_PRIMARY_FIELD}}}='Pending'")] == [pending["id"]]
+
+    # Выборка по ID ещё не отправленной записи не ходит в сеть
+    remote.offline = True
+    assert plans.get(pending["id"])["fields"] == {MEAL_PLAN_PRIMARY_FIELD: "Pending"}
+    assert [r["id"] for r in plans.all(formula=f"RECORD_ID()='{pending['id']}'")] == [pending["id"]]
+    with pytest.raises(requests.ConnectionError):
+        plans.all()
+
+
+def test_journal_compacted_after_sync(store, remote):
+    plans = store.table(BASE_ID, "Meal_Plans")
+    plan = plans.create({MEAL_PLAN_PRIMARY_FIELD: "Week 1"})
+    assert store.local.stats() == {"Meal_Plans": 1}
+
+    assert store.flush(timeout=5)
+    with store.local.transaction() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM journal").fetchone()[0] == 0
+    assert store.local.stats() == {}
+    # Запись читается из Airtable по временному ID через id_map
+    assert plans.get(plan["id"])["fields"] == {MEAL_PLAN_PRIMARY_FIELD: "Week 1"}
+    assert plans.all() == [plans.get(plan["id"])]
+
+
+def test_background_thread_syncs(remote):
+    store = WriteBehindStore(remote, path=":memory:")
+    try:
+        plan = store.table(BASE_ID, "Meal_Plans").create({MEAL_PLAN_PRIMARY_FIELD: "Week 1"})
+        deadline = time.monotonic() + 5
+        while plan["id"] not in store.real_ids:
+            assert time.monotonic() < deadline, "not synced"
+            time.sleep(0.01)
+        assert remote.store.table(BASE_ID, "Meal_Plans").get(store.real_ids[plan["id"]])
+    finally:
+        store.close()